@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import List
+
+from aiohttp import web
+
+from main import APIGateway, PoolConfig, ResponseCache, ServiceRegistry
+
+
+# Бенчмарк шлюза против локального апстрима на aiohttp.
+# Сравниваем запросы/сек и p99 латентность с пулом соединений и без него,
+# а также горячий GET-путь через кеш ответов с объединением запросов.
+# Запуск: python api_gateway/benchmark.py
+
+
+REQUESTS = 3000
+CONCURRENCY = 50
+
+
+async def start_upstream():
+    async def handle(request):
+        return web.json_response({"id": request.match_info["user_id"], "name": "Alice"})
+
+    async def handle_cached(request):
+        await asyncio.sleep(0.005)  # дорогой запрос к БД на стороне апстрима
+        headers = {"Cache-Control": "max-age=1", "ETag": '"v1"'}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers=headers)
+        return web.json_response({"id": request.match_info["user_id"], "name": "Alice"}, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/users/{user_id}", handle)
+    app.router.add_get("/hot/{user_id}", handle_cached)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p))
+    return values[index]
+
+
+async def run(gateway: APIGateway, path: str = "/users/{}") -> dict:
+    latencies: List[float] = []
+    queue = asyncio.Queue()
+    for i in range(REQUESTS):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            started = time.perf_counter()
+            await gateway.handle_request("user_service", path.format(i))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": REQUESTS / elapsed,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def main():
+    runner, url = await start_upstream()
+    registry = ServiceRegistry()
+    registry.register("user_service", [url])
+
+    try:
+        unpooled = await run(APIGateway(registry, pooling=False))
+        print(f"without pool: {unpooled['rps']:8.0f} req/s  p99 {unpooled['p99_ms']:7.2f} ms")
+
+        async with APIGateway(registry, PoolConfig(limit_per_host=CONCURRENCY)) as gateway:
+            pooled = await run(gateway)
+            print(f"with pool:    {pooled['rps']:8.0f} req/s  p99 {pooled['p99_ms']:7.2f} ms")
+            print(f"pool stats:   {gateway.pool_stats()}")
+
+            hot = await run(gateway, "/hot/1")
+            print(f"hot, no cache:{hot['rps']:8.0f} req/s  p99 {hot['p99_ms']:7.2f} ms")
+
+        async with APIGateway(registry, PoolConfig(limit_per_host=CONCURRENCY), cache=ResponseCache()) as gateway:
+            cached = await run(gateway, "/hot/1")
+            print(f"hot, cached:  {cached['rps']:8.0f} req/s  p99 {cached['p99_ms']:7.2f} ms")
+            print(f"cache stats:  {gateway.cache.stats()}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+import asyncio
+import multiprocessing
+import resource
+import socket
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+from main import APIGateway, ServiceRegistry
+
+
+# Бенчмарк потокового проксирования больших тел.
+# Апстрим, шлюз и клиент работают в разных процессах, пиковый RSS снимается в процессе шлюза.
+# Сравниваем потоковый режим (proxy_handler) с буферизацией всего тела в памяти.
+# Запуск: python api_gateway/benchmark_streaming.py [размер в МБ]
+
+
+CHUNK = b"x" * (64 * 1024)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_upstream(port: int, size: int):
+    async def export(request):
+        response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+        response.content_length = size
+        await response.prepare(request)
+        sent = 0
+        while sent < size:
+            chunk = CHUNK[:size - sent]
+            await response.write(chunk)
+            sent += len(chunk)
+        await response.write_eof()
+        return response
+
+    async def upload(request):
+        received = 0
+        async for chunk in request.content.iter_chunked(len(CHUNK)):
+            received += len(chunk)
+        return web.json_response({"received": received})
+
+    app = web.Application()
+    app.router.add_get("/export", export)
+    app.router.add_post("/import", upload)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def run_gateway(port: int, upstream_port: int, mode: str):
+    registry = ServiceRegistry()
+    registry.register("export_service", [f"http://127.0.0.1:{upstream_port}"])
+    gateway = APIGateway(registry)
+
+    async def buffered(request):
+        # Поведение до потокового режима: тело целиком собирается в памяти шлюза
+        body = await request.read() if request.body_exists else None
+        async with gateway.stream_request("export_service", request.path_qs, request.method, body) as upstream:
+            data = b"".join([chunk async for chunk in upstream.iter_chunks()])
+            headers = {k: v for k, v in upstream.headers if k.lower() != "content-length"}
+            return web.Response(status=upstream.status, body=data, headers=headers)
+
+    async def rss(request):
+        return web.json_response({"peak_rss_mb": peak_rss_mb()})
+
+    async def on_cleanup(app):
+        await gateway.close()
+
+    app = web.Application(client_max_size=2 ** 40)
+    app.router.add_get("/__rss", rss)
+    handler = gateway.proxy_handler("export_service") if mode == "streaming" else buffered
+    app.router.add_route("*", "/{tail:.*}", handler)
+    app.on_cleanup.append(on_cleanup)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def wait_for_port(port: int):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"port {port} is not ready")
+
+
+async def client(port: int, size: int) -> dict:
+    base = f"http://127.0.0.1:{port}"
+
+    async def body():
+        sent = 0
+        while sent < size:
+            chunk = CHUNK[:size - sent]
+            yield chunk
+            sent += len(chunk)
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(f"{base}/__rss") as resp:
+            baseline = (await resp.json())["peak_rss_mb"]
+
+        started = time.perf_counter()
+        received = 0
+        async with session.get(f"{base}/export") as resp:
+            async for chunk in resp.content.iter_chunked(len(CHUNK)):
+                received += len(chunk)
+        download = time.perf_counter() - started
+        assert received == size, received
+
+        started = time.perf_counter()
+        async with session.post(f"{base}/import", data=body()) as resp:
+            assert (await resp.json())["received"] == size
+        upload = time.perf_counter() - started
+
+        async with session.get(f"{base}/__rss") as resp:
+            peak = (await resp.json())["peak_rss_mb"]
+    return {"download": download, "upload": upload, "baseline": baseline, "peak": peak}
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    size = size_mb * 1024 * 1024
+    upstream_port = free_port()
+    upstream = multiprocessing.Process(target=run_upstream, args=(upstream_port, size), daemon=True)
+    upstream.start()
+    wait_for_port(upstream_port)
+
+    print(f"payload: {size_mb} MB")
+    try:
+        for mode in ("buffered", "streaming"):
+            port = free_port()
+            gateway = multiprocessing.Process(target=run_gateway, args=(port, upstream_port, mode), daemon=True)
+            gateway.start()
+            wait_for_port(port)
+            try:
+                result = asyncio.run(client(port, size))
+            finally:
+                gateway.terminate()
+                gateway.join()
+            print(
+                f"{mode:>9}: download {size_mb / result['download']:7.1f} MB/s  "
+                f"upload {size_mb / result['upload']:7.1f} MB/s  "
+                f"gateway peak RSS {result['peak']:7.1f} MB (idle {result['baseline']:.1f} MB)"
+            )
+    finally:
+        upstream.terminate()
+        upstream.join()
+
+
+if __name__ == "__main__":
+    main()
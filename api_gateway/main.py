@@ -1,6 +1,13 @@
 import asyncio
+import random
+import time
 import aiohttp
-from typing import List
+from abc import ABC, abstractmethod
+from aiohttp import web
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 
 # Понимание роли API Gateway в микросервисной архитектуре.
@@ -8,51 +15,612 @@ from typing import List
 # Использование aiohttp, asyncio, proxy.
 
 # Простая реализация API Gateway с балансировкой.
+# Балансировщики: round-robin, least-outstanding, power-of-two-choices, peak-EWMA.
 # Подходит для начального понимания архитектуры микросервисов.
 # Можно расширить: аутентификация, кеширование, мониторинг.
+# Соединения к апстримам переиспользуются через пул (keep-alive).
+# GET-ответы можно кешировать, одинаковые запросы в полёте объединяются.
+# Большие тела проксируются потоково, без буферизации в памяти шлюза.
+
+
+# =============== Балансировка ===============
+class Instance:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0  # запросов в полёте
+        self.ewma = 0.0  # сглаженная латентность, секунды
+
+
+class LoadBalancer(ABC):
+    def __init__(self, urls: List[str] = ()):
+        self.instances: Dict[str, Instance] = {}
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str) -> Instance:
+        instance = self.instances.get(url)
+        if instance is None:
+            instance = Instance(url)
+            self.instances[url] = instance
+            self._added(instance)
+        return instance
+
+    def remove(self, url: str):
+        instance = self.instances.pop(url, None)
+        if instance is not None:
+            self._removed(instance)
+
+    def on_start(self, instance: Instance):
+        instance.outstanding += 1
+
+    def on_finish(self, instance: Instance, latency: float):
+        instance.outstanding -= 1
+
+    @abstractmethod
+    def _added(self, instance: Instance):
+        pass
+
+    @abstractmethod
+    def _removed(self, instance: Instance):
+        pass
+
+    @abstractmethod
+    def pick(self) -> Instance:
+        pass
+
+
+class _ArrayBalancer(LoadBalancer):
+    # Массив + индекс позиций: O(1) выбор по номеру, O(1) удаление через swap с последним
+    def __init__(self, urls: List[str] = ()):
+        self._items: List[Instance] = []
+        self._positions: Dict[str, int] = {}
+        super().__init__(urls)
+
+    def _added(self, instance: Instance):
+        self._positions[instance.url] = len(self._items)
+        self._items.append(instance)
+
+    def _removed(self, instance: Instance):
+        index = self._positions.pop(instance.url)
+        last = self._items.pop()
+        if last is not instance:
+            self._items[index] = last
+            self._positions[last.url] = index
+
+
+class RoundRobinBalancer(_ArrayBalancer):
+    def __init__(self, urls: List[str] = ()):
+        self._next = 0
+        super().__init__(urls)
+
+    def pick(self) -> Instance:
+        if not self._items:
+            raise LookupError("No instances")
+        index = self._next % len(self._items)
+        self._next = index + 1
+        return self._items[index]
+
+
+class LeastOutstandingBalancer(LoadBalancer):
+    # Корзины "число запросов в полёте -> инстансы" и указатель на минимальную корзину.
+    # Счётчики меняются на ±1, поэтому минимум поддерживается за O(1).
+    def __init__(self, urls: List[str] = ()):
+        self._buckets: Dict[int, Dict[str, Instance]] = {}
+        self._min = 0
+        super().__init__(urls)
+
+    def _put(self, instance: Instance):
+        self._buckets.setdefault(instance.outstanding, {})[instance.url] = instance
+
+    def _take(self, instance: Instance):
+        bucket = self._buckets[instance.outstanding]
+        del bucket[instance.url]
+        if not bucket:
+            del self._buckets[instance.outstanding]
+
+    def _added(self, instance: Instance):
+        self._put(instance)
+        self._min = 0  # новый инстанс приходит без нагрузки
+
+    def _removed(self, instance: Instance):
+        self._take(instance)
+        if self._buckets and self._min not in self._buckets:
+            self._min = min(self._buckets)  # редкая операция, число корзин мало
+
+    def on_start(self, instance: Instance):
+        if self.instances.get(instance.url) is not instance:  # инстанс уже удалён
+            return super().on_start(instance)
+        self._take(instance)
+        super().on_start(instance)
+        self._put(instance)
+        if self._min not in self._buckets:
+            self._min += 1
+
+    def on_finish(self, instance: Instance, latency: float):
+        if self.instances.get(instance.url) is not instance:  # инстанс уже удалён
+            return super().on_finish(instance, latency)
+        self._take(instance)
+        super().on_finish(instance, latency)
+        self._put(instance)
+        self._min = min(self._min, instance.outstanding)
+
+    def pick(self) -> Instance:
+        bucket = self._buckets.get(self._min)
+        if not bucket:
+            raise LookupError("No instances")
+        return next(iter(bucket.values()))
+
+
+class PowerOfTwoBalancer(_ArrayBalancer):
+    # Два случайных кандидата, выигрывает менее загруженный
+    def cost(self, instance: Instance) -> float:
+        return instance.outstanding
+
+    def pick(self) -> Instance:
+        count = len(self._items)
+        if count == 0:
+            raise LookupError("No instances")
+        if count == 1:
+            return self._items[0]
+        first, second = random.sample(range(count), 2)
+        a, b = self._items[first], self._items[second]
+        return a if self.cost(a) <= self.cost(b) else b
+
+
+class EWMABalancer(PowerOfTwoBalancer):
+    # Peak-EWMA: цена инстанса = сглаженная латентность * (запросов в полёте + 1).
+    # Медленные апстримы автоматически получают меньше трафика.
+    def __init__(self, urls: List[str] = (), alpha: float = 0.3):
+        self.alpha = alpha
+        super().__init__(urls)
+
+    def cost(self, instance: Instance) -> float:
+        return instance.ewma * (instance.outstanding + 1)
+
+    def on_finish(self, instance: Instance, latency: float):
+        super().on_finish(instance, latency)
+        if instance.ewma == 0.0:
+            instance.ewma = latency
+        else:
+            instance.ewma += self.alpha * (latency - instance.ewma)
 
 
 class ServiceRegistry:
-    def __init__(self):
-        self.services = {}
+    def __init__(self, balancer_factory: Callable[[List[str]], LoadBalancer] = RoundRobinBalancer):
+        self.balancer_factory = balancer_factory
+        self.services: Dict[str, LoadBalancer] = {}
+
+    def register(self, name: str, urls: List[str], balancer: LoadBalancer = None):
+        self.services[name] = balancer if balancer is not None else self.balancer_factory(urls)
+
+    def add_instance(self, name: str, url: str):
+        if name not in self.services:
+            self.register(name, [])
+        self.services[name].add(url)
+
+    def remove_instance(self, name: str, url: str):
+        if name in self.services:
+            self.services[name].remove(url)
 
-    def register(self, name: str, urls: List[str]):
-        self.services[name] = urls
+    def get_balancer(self, name: str) -> LoadBalancer:
+        balancer = self.services.get(name)
+        if balancer is None or not balancer.instances:
+            raise ValueError(f"No available instance for service: {name}")
+        return balancer
+
+    def get_instance(self, name: str) -> Instance:
+        return self.get_balancer(name).pick()
 
     def get_url(self, name: str) -> str:
-        urls = self.services.get(name)
-        if urls:
-            # Простой round-robin
-            return urls.pop(0)
-        raise ValueError(f"No available instance for service: {name}")
+        return self.get_instance(name).url
+
+
+# =============== Пул соединений ===============
+@dataclass
+class PoolConfig:
+    limit: int = 100  # всего соединений на апстрим
+    limit_per_host: int = 32  # соединений на один инстанс
+    keepalive_timeout: float = 30.0  # сколько держать простаивающее соединение
+    ttl_dns_cache: int = 300  # кеш DNS, секунды
+    connect_timeout: float = 5.0
+    total_timeout: float = 30.0
+
+
+class UpstreamPool:
+    # Долгоживущая сессия с собственным TCPConnector на каждый сервис:
+    # TCP/TLS рукопожатие выполняется один раз, дальше соединение переиспользуется.
+    def __init__(self, name: str, config: PoolConfig):
+        self.name = name
+        self.config = config
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.raw_session: Optional[aiohttp.ClientSession] = None  # для потоковой пересылки
+        self.in_use = 0
+        self.waiters = 0
+        self.created = 0
+        self.reused = 0
+
+    async def start(self):
+        if self.session is not None:
+            return
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_queued_start.append(self._on_queued_start)
+        trace.on_connection_queued_end.append(self._on_queued_end)
+        trace.on_connection_create_end.append(self._on_create)
+        trace.on_connection_reuseconn.append(self._on_reuse)
+        connector = aiohttp.TCPConnector(
+            limit=self.config.limit,
+            limit_per_host=self.config.limit_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+            ttl_dns_cache=self.config.ttl_dns_cache,
+        )
+        timeout = aiohttp.ClientTimeout(total=self.config.total_timeout, connect=self.config.connect_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[trace])
+        # Тот же коннектор, но без распаковки: байты тела пересылаются как есть
+        self.raw_session = aiohttp.ClientSession(
+            connector=connector, connector_owner=False, auto_decompress=False, trace_configs=[trace]
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.raw_session.close()
+            await self.session.close()
+            self.session = None
+            self.raw_session = None
+
+    async def _on_queued_start(self, session, ctx, params):
+        self.waiters += 1
+
+    async def _on_queued_end(self, session, ctx, params):
+        self.waiters -= 1
+
+    async def _on_create(self, session, ctx, params):
+        self.created += 1
+
+    async def _on_reuse(self, session, ctx, params):
+        self.reused += 1
+
+    def idle(self) -> int:
+        # В aiohttp нет публичного API для простаивающих соединений, читаем внутренний словарь коннектора
+        if self.session is None:
+            return 0
+        conns = getattr(self.session.connector, "_conns", {})
+        return sum(len(items) for items in conns.values())
+
+    def stats(self) -> dict:
+        return {
+            "in_use": self.in_use,
+            "idle": self.idle(),
+            "waiters": self.waiters,
+            "created": self.created,
+            "reused": self.reused,
+        }
+
+
+# =============== Кеш ответов ===============
+@dataclass
+class UpstreamResponse:
+    status: int
+    headers: Dict[str, str]
+    body: Any
+
+
+@dataclass
+class CachedResponse:
+    body: Any
+    etag: Optional[str]
+    expires_at: float  # по time.monotonic()
+
+
+class LRUStorage:
+    # Хранилище по умолчанию. Подходит любой объект с get/put,
+    # например стратегии из cache_manager (LRUCache, TTLCache). Каталоги репозитория — самостоятельные
+    # скрипты, поэтому cache_manager не импортируется, а здесь своя минимальная LRU.
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.cache = OrderedDict()
+
+    def get(self, key: str):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        return None
+
+    def put(self, key: str, value):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.capacity:
+            self.cache.popitem(last=False)
+        self.cache[key] = value
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+class _LeaderCancelled(Exception):
+    # Ждущим single-flight: запрос лидера отменён, нужно повторить самим
+    pass
+
+
+class ResponseCache:
+    # Кеш GET-ответов с учётом Cache-Control/ETag и single-flight:
+    # одновременные одинаковые запросы ждут один вызов апстрима.
+    def __init__(self, storage=None, vary_headers: Tuple[str, ...] = ("accept", "accept-language", "authorization"),
+                 default_ttl: float = 0.0):
+        self.storage = storage if storage is not None else LRUStorage()
+        self.vary_headers = tuple(h.lower() for h in vary_headers)
+        self.default_ttl = default_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+
+    def make_key(self, service_name: str, path: str, headers: Dict[str, str] = None) -> str:
+        lowered = {k.lower(): v for k, v in (headers or {}).items()}
+        varying = "|".join(lowered.get(h, "") for h in self.vary_headers)
+        return f"{service_name}|{path}|{varying}"
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "revalidated": self.revalidated,
+            "inflight": len(self._inflight),
+        }
+
+    def _ttl(self, directives: Dict[str, Optional[str]]) -> float:
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name):
+                try:
+                    return float(directives[name])
+                except ValueError:
+                    return 0.0
+        return self.default_ttl
+
+    def _store(self, key: str, response: UpstreamResponse, body):
+        directives = parse_cache_control(response.headers.get("Cache-Control", ""))
+        if "no-store" in directives or "private" in directives:
+            return
+        ttl = self._ttl(directives)
+        etag = response.headers.get("ETag")
+        if ttl > 0 or etag:
+            # Без TTL, но с ETag: запись хранится для условного запроса (If-None-Match)
+            self.storage.put(key, CachedResponse(body, etag, time.monotonic() + ttl))
+
+    async def fetch(self, key: str, proxy: Callable[[Dict[str, str]], Awaitable[UpstreamResponse]],
+                    headers: Dict[str, str] = None):
+        while True:
+            entry = self.storage.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self.hits += 1
+                return entry.body
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue  # отменили запрос лидера, а не наш: один из ждущих становится новым лидером
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            request_headers = dict(headers or {})
+            if entry is not None and entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            response = await proxy(request_headers)
+            if response.status == 304 and entry is not None:
+                self.revalidated += 1
+                body = entry.body
+            else:
+                body = response.body
+            if response.status in (200, 304):
+                self._store(key, response, body)
+            future.set_result(body)
+            return body
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # помечаем как прочитанное, если ждущих нет
+            raise
+        finally:
+            del self._inflight[key]
+
+
+# =============== Потоковое проксирование ===============
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Заголовки уровня соединения не пересылаются (RFC 9110, 7.6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+
+def forwardable_headers(headers, exclude=()) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in exclude]
+
+
+class StreamedResponse:
+    def __init__(self, response: aiohttp.ClientResponse, chunk_size: int):
+        self.status = response.status
+        self.headers = forwardable_headers(response.headers)
+        self._response = response
+        self.chunk_size = chunk_size
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        # Следующий кусок читается только после того, как потребитель обработал предыдущий
+        async for chunk in self._response.content.iter_chunked(self.chunk_size):
+            yield chunk
 
 
 class APIGateway:
-    def __init__(self, registry: ServiceRegistry):
+    def __init__(self, registry: ServiceRegistry, pool_config: PoolConfig = None, pooling: bool = True,
+                 cache: ResponseCache = None):
         self.registry = registry
+        self.pool_config = pool_config or PoolConfig()
+        self.pooling = pooling
+        self.cache = cache
+        self.pools: Dict[str, UpstreamPool] = {}
 
-    async def handle_request(self, service_name: str, path: str, method: str = "GET", data: dict = None):
-        url = self.registry.get_url(service_name)
-        full_url = f"{url}{path}"
+    async def start(self):
+        for name in self.registry.services:
+            await self._get_pool(name)
 
-        async with aiohttp.ClientSession() as session:
-            if method == "GET":
-                async with session.get(full_url) as resp:
-                    return await resp.json()
-            elif method == "POST":
-                async with session.post(full_url, json=data) as resp:
-                    return await resp.json()
+    async def close(self):
+        pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            await pool.close()
 
+    async def __aenter__(self):
+        await self.start()
+        return self
 
-# Использование
-registry = ServiceRegistry()
-registry.register("user_service", ["http://user1:8000", "http://user2:8000"])
-gateway = APIGateway(registry)
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_pool(self, service_name: str) -> UpstreamPool:
+        pool = self.pools.get(service_name)
+        if pool is None:
+            pool = UpstreamPool(service_name, self.pool_config)
+            self.pools[service_name] = pool
+            await pool.start()
+        return pool
+
+    def pool_stats(self) -> Dict[str, dict]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    async def handle_request(self, service_name: str, path: str, method: str = "GET", data: dict = None,
+                             headers: Dict[str, str] = None):
+        if method == "GET" and self.cache is not None:
+            key = self.cache.make_key(service_name, path, headers)
+
+            def proxy(request_headers: Dict[str, str]):
+                return self._proxy(service_name, path, method, data, request_headers)
+
+            return await self.cache.fetch(key, proxy, headers)
 
+        response = await self._proxy(service_name, path, method, data, headers)
+        return response.body
 
+    async def _proxy(self, service_name: str, path: str, method: str, data: dict,
+                     headers: Dict[str, str] = None) -> UpstreamResponse:
+        balancer = self.registry.get_balancer(service_name)
+        instance = balancer.pick()
+        full_url = f"{instance.url}{path}"
+
+        # Латентность каждого запроса уходит в балансировщик
+        balancer.on_start(instance)
+        started = time.monotonic()
+        try:
+            if not self.pooling:
+                # Режим без пула: новое соединение на каждый запрос
+                async with aiohttp.ClientSession() as session:
+                    return await self._send(session, full_url, method, data, headers)
+
+            pool = await self._get_pool(service_name)
+            pool.in_use += 1
+            try:
+                return await self._send(pool.session, full_url, method, data, headers)
+            finally:
+                pool.in_use -= 1
+        finally:
+            balancer.on_finish(instance, time.monotonic() - started)
+
+    async def _send(self, session: aiohttp.ClientSession, full_url: str, method: str, data: dict,
+                    headers: Dict[str, str] = None) -> UpstreamResponse:
+        if method == "GET":
+            request = session.get(full_url, headers=headers)
+        elif method == "POST":
+            request = session.post(full_url, json=data, headers=headers)
+        else:
+            raise ValueError(f"Unsupported method: {method}")
+        async with request as resp:
+            body = None if resp.status == 304 else await resp.json()
+            return UpstreamResponse(resp.status, dict(resp.headers), body)
+
+    @asynccontextmanager
+    async def stream_request(self, service_name: str, path: str, method: str = "GET",
+                             body: Union[bytes, AsyncIterable[bytes], None] = None, headers: Dict[str, str] = None,
+                             chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[StreamedResponse]:
+        balancer = self.registry.get_balancer(service_name)
+        instance = balancer.pick()
+        full_url = f"{instance.url}{path}"
+        request_headers = forwardable_headers(headers or {}, exclude=("host", "content-length"))
+
+        pool = None
+        if self.pooling:
+            pool = await self._get_pool(service_name)
+            pool.in_use += 1
+            session = pool.raw_session
+        else:
+            session = aiohttp.ClientSession(auto_decompress=False)
+
+        # Общий таймаут не ограничиваем: передача большого тела может идти долго
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.pool_config.connect_timeout,
+                                        sock_read=self.pool_config.total_timeout)
+        balancer.on_start(instance)
+        started = time.monotonic()
+        latency = None
+        try:
+            async with session.request(method, full_url, data=body, headers=request_headers,
+                                       timeout=timeout) as resp:
+                # В балансировщик уходит время до заголовков, а не длительность передачи
+                latency = time.monotonic() - started
+                yield StreamedResponse(resp, chunk_size)
+        finally:
+            if pool is not None:
+                pool.in_use -= 1
+            else:
+                await session.close()
+            balancer.on_finish(instance, latency if latency is not None else time.monotonic() - started)
+
+    def proxy_handler(self, service_name: str, prefix: str = "", chunk_size: int = STREAM_CHUNK_SIZE):
+        # aiohttp-хендлер: любой метод, тело в обе стороны идёт кусками.
+        # write() ждёт отправки данных клиенту, поэтому медленный клиент тормозит чтение из апстрима.
+        async def handler(request: web.Request) -> web.StreamResponse:
+            path = request.path_qs[len(prefix):] if request.path_qs.startswith(prefix) else request.path_qs
+            body = request.content.iter_chunked(chunk_size) if request.body_exists else None
+            async with self.stream_request(service_name, path, request.method, body, request.headers,
+                                           chunk_size) as upstream:
+                response = web.StreamResponse(status=upstream.status)
+                for name, value in upstream.headers:
+                    response.headers.add(name, value)
+                await response.prepare(request)
+                async for chunk in upstream.iter_chunks():
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+
+        return handler
+
+
+# Использование
 async def main():
-    result = await gateway.handle_request("user_service", "/users/1", "GET")
-    print(result)
+    registry = ServiceRegistry(balancer_factory=EWMABalancer)
+    registry.register("user_service", ["http://user1:8000", "http://user2:8000"])
+
+    async with APIGateway(registry, cache=ResponseCache()) as gateway:
+        result = await gateway.handle_request("user_service", "/users/1", "GET")
+        print(result)
+        print(gateway.pool_stats())
+        print(gateway.cache.stats())
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from main import LRUCache, SharedMemoryCache
+
+
+# Несколько воркер-процессов с общим кешем в mmap-файле против собственного LRU в каждом процессе.
+# Общий объём памяти одинаковый: у каждого процесса LRU на CAPACITY записей,
+# у общего кеша — CAPACITY * число процессов. Печатаем суммарный hit rate, CPU-время на операцию
+# и общую пропускную способность (по реальному времени, зависит от числа ядер).
+# Запуск: python cache_manager/benchmark_shared.py [число процессов]
+
+
+OPS_PER_WORKER = 100_000
+KEYS = 50_000
+CAPACITY = 5_000
+VALUE = b"v" * 256
+
+
+def trace(seed: int):
+    rnd = random.Random(seed)
+    weights = [1 / rank for rank in range(1, KEYS + 1)]
+    return rnd.choices([f"k{i}" for i in range(KEYS)], weights=weights, k=OPS_PER_WORKER)
+
+
+def replay(cache, keys):
+    hits = 0
+    started = time.process_time()
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, VALUE)
+    return hits, time.process_time() - started
+
+
+def local_worker(seed: int):
+    return replay(LRUCache(CAPACITY), trace(seed))
+
+
+def shared_worker(args):
+    path, seed = args
+    # Каждый процесс открывает файл сам: так же подключаются независимые воркеры gunicorn/uwsgi
+    cache = SharedMemoryCache(path)
+    try:
+        return replay(cache, trace(seed))
+    finally:
+        cache.close()
+
+
+def report(label: str, pool, func, args):
+    started = time.perf_counter()
+    results = pool.map(func, args)
+    wall = time.perf_counter() - started
+    hits = sum(h for h, _ in results)
+    cpu = sum(e for _, e in results)
+    ops = OPS_PER_WORKER * len(results)
+    print(f"{label:>12}: hit rate {hits / ops:6.2%}  {cpu / ops * 1e6:6.2f} us/op (cpu)  {ops / wall:9.0f} ops/s")
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"{workers} workers, {OPS_PER_WORKER} ops each, {KEYS} keys")
+    with multiprocessing.Pool(workers) as pool:
+        report("per-process", pool, local_worker, range(workers))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shared.cache")
+            SharedMemoryCache(path, capacity=CAPACITY * workers, value_size=len(VALUE)).close()
+            report("shared", pool, shared_worker, [(path, seed) for seed in range(workers)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+
+from main import LRUCache, ShardedCacheManager
+
+
+# Многопоточный бенчмарк: один глобальный lock (shards=1) против сегментированного кеша.
+# Печатаем суммарные операции/сек по числу потоков и долю захватов lock с ожиданием.
+# Запуск: python cache_manager/benchmark_threads.py
+
+
+OPS_PER_THREAD = 200_000
+KEYS = 50_000
+CAPACITY = 20_000
+BATCH = 32
+
+
+def make_keys(seed: int):
+    rnd = random.Random(seed)
+    return [f"k{int(rnd.paretovariate(1.2)) % KEYS}" for _ in range(OPS_PER_THREAD)]
+
+
+def worker(cache: ShardedCacheManager, keys, batched: bool):
+    if batched:
+        for i in range(0, len(keys), BATCH):
+            batch = keys[i:i + BATCH]
+            found = cache.get_many(batch)
+            cache.put_many({key: key for key, value in found.items() if value is None})
+        return
+    for key in keys:
+        if cache.get(key) is None:
+            cache.put(key, key)
+
+
+def run(shards: int, threads: int, batched: bool = False):
+    cache = ShardedCacheManager(lambda: LRUCache(CAPACITY // shards), shards=shards)
+    workloads = [make_keys(seed) for seed in range(threads)]
+    pool = [threading.Thread(target=worker, args=(cache, keys, batched)) for keys in workloads]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = cache.stats()
+    acquisitions = sum(s["acquisitions"] for s in stats)
+    contended = sum(s["contended"] for s in stats)
+    return threads * OPS_PER_THREAD / elapsed, contended / max(acquisitions, 1)
+
+
+def main():
+    print(f"{OPS_PER_THREAD} ops per thread, capacity {CAPACITY}")
+    for threads in (1, 2, 4, 8):
+        for label, shards, batched in (
+            ("global lock", 1, False),
+            ("16 shards", 16, False),
+            ("16 shards, batch", 16, True),
+        ):
+            ops, contention = run(shards, threads, batched)
+            print(f"threads {threads}  {label:>17}: {ops:10.0f} ops/s  contended {contention:6.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import itertools
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from main import BoundedTTLCache, CacheStrategy, LRUCache, TTLCache, WTinyLFUCache
+
+
+# Прогон синтетических трасс через все стратегии кеширования.
+# Трассы генерируются локально: zipf (горячее множество), scan (zipf + длинные одноразовые сканы),
+# loop (цикл по ключам, не влезающим в кеш). Для каждой стратегии печатаем hit ratio и операции/сек.
+# Запуск: python cache_manager/benchmark_traces.py [длина трассы]
+
+
+CAPACITY = 10_000
+KEYS = 100_000
+
+
+def zipf_trace(length: int, keys: int = KEYS, s: float = 0.99, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    weights = itertools.accumulate(1 / (rank ** s) for rank in range(1, keys + 1))
+    population = [f"k{rank}" for rank in range(keys)]
+    return rnd.choices(population, cum_weights=list(weights), k=length)
+
+
+def scan_trace(length: int, seed: int = 2) -> List[str]:
+    # Каждые 20% трассы — скан по уникальным ключам длиной в три ёмкости кеша
+    hot = zipf_trace(length, seed=seed)
+    trace = []
+    scan_id = 0
+    for i, key in enumerate(hot):
+        if i and i % (length // 5) == 0:
+            trace.extend(f"scan{scan_id}-{j}" for j in range(3 * CAPACITY))
+            scan_id += 1
+        trace.append(key)
+    return trace
+
+
+def loop_trace(length: int) -> List[str]:
+    loop = [f"l{i}" for i in range(int(CAPACITY * 1.5))]
+    return list(itertools.islice(itertools.cycle(loop), length))
+
+
+STRATEGIES: Dict[str, Callable[[], CacheStrategy]] = {
+    "LRUCache": lambda: LRUCache(CAPACITY),
+    "TTLCache": lambda: TTLCache(3600),  # без ограничения размера — верхняя граница hit ratio
+    "BoundedTTLCache": lambda: BoundedTTLCache(CAPACITY, 3600),
+    "WTinyLFUCache": lambda: WTinyLFUCache(CAPACITY),
+}
+
+
+def replay(cache: CacheStrategy, trace: List[str]):
+    hits = 0
+    started = time.perf_counter()
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, key)
+    elapsed = time.perf_counter() - started
+    return hits / len(trace), len(trace) / elapsed
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    traces = {
+        "zipf": zipf_trace(length),
+        "scan": scan_trace(length),
+        "loop": loop_trace(length),
+    }
+    print(f"capacity {CAPACITY}, keys {KEYS}")
+    for trace_name, trace in traces.items():
+        print(f"--- {trace_name} ({len(trace)} requests)")
+        for name, factory in STRATEGIES.items():
+            hit_ratio, ops = replay(factory(), trace)
+            print(f"{name:>16}: hit ratio {hit_ratio:6.2%}  {ops:10.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
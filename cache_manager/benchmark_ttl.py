@@ -0,0 +1,66 @@
+import random
+import time
+import tracemalloc
+
+from main import BoundedTTLCache, TTLCache
+
+
+# Бенчмарк TTL-кешей при постоянном обновлении ключей.
+# Сравниваем TTLCache и BoundedTTLCache: операции/сек, число записей и память после прогона.
+# Запуск: python cache_manager/benchmark_ttl.py
+
+
+OPERATIONS = 1_000_000
+KEYSPACE = 5_000_000  # почти каждый ключ новый
+TTL = 0.5
+CAPACITY = 100_000
+
+
+def workload(seed: int = 42):
+    rnd = random.Random(seed)
+    # 70% чтений недавних ключей, 30% записей новых
+    recent = []
+    for i in range(OPERATIONS):
+        if recent and rnd.random() < 0.7:
+            yield "get", recent[rnd.randrange(len(recent))]
+        else:
+            key = f"user:{rnd.randrange(KEYSPACE)}"
+            recent.append(key)
+            if len(recent) > 10_000:
+                recent.pop(0)
+            yield "put", key
+
+
+def run(cache, operations) -> float:
+    started = time.perf_counter()
+    for op, key in operations:
+        if op == "get":
+            cache.get(key)
+        else:
+            cache.put(key, key)
+    return time.perf_counter() - started
+
+
+def main():
+    operations = list(workload())
+    print(f"{OPERATIONS} ops, ttl {TTL}s, capacity {CAPACITY}")
+    for name, factory in (
+        ("TTLCache", lambda: TTLCache(TTL)),
+        ("BoundedTTLCache", lambda: BoundedTTLCache(CAPACITY, TTL, resolution=0.05)),
+    ):
+        elapsed = run(factory(), operations)
+
+        cache = factory()
+        tracemalloc.start()
+        run(cache, operations)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{name:>16}: {OPERATIONS / elapsed:10.0f} ops/s  entries {len(cache.cache):8d}  "
+            f"memory {current / 2 ** 20:7.1f} MB (peak {peak / 2 ** 20:7.1f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
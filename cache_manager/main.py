@@ -1,5 +1,20 @@
 from abc import ABC, abstractmethod
+from bisect import bisect_left
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from heapq import heappop, heappush
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+import asyncio
+import fcntl
+import hashlib
+import itertools
+import math
+import mmap
+import os
+import random
+import struct
+import threading
 import time
 
 
@@ -10,6 +25,11 @@ import time
 # Архитектура позволяет легко переключаться между стратегиями кеширования.
 # Подходит для высоконагруженных систем.
 # Используется паттерн "Стратегия".
+# BoundedTTLCache ограничен по размеру и удаляет просроченные записи без полного обхода.
+# WTinyLFUCache устойчив к сканированию: новые ключи допускаются по оценке частоты.
+# SharedMemoryCache — общий для процессов кеш в mmap-файле.
+# ShardedCacheManager — потокобезопасный вариант с независимо блокируемыми сегментами.
+# CacheManager.get_or_load защищает источник данных от одновременных перезагрузок одного ключа.
 
 
 class CacheStrategy(ABC):
@@ -60,21 +80,709 @@ class TTLCache(CacheStrategy):
         self.cache[key] = (value, time.time())
 
 
+class BoundedTTLCache(CacheStrategy):
+    # Ограниченный по размеру TTL-кеш с активным истечением.
+    # Ключи раскладываются по корзинам времени истечения (шаг resolution),
+    # номера корзин лежат в куче: истёкшие корзины снимаются целиком, без обхода словаря.
+    # При переполнении вытесняется давно не использованная запись (LRU).
+    def __init__(self, capacity: int, ttl: float, resolution: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.resolution = resolution
+        self.clock = clock
+        self.cache = OrderedDict()  # key -> (value, expires_at, tick)
+        self._buckets: Dict[int, Set[str]] = {}
+        self._ticks: List[int] = []
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get(self, key: str):
+        item = self.cache.get(key)
+        if item is None:
+            return None
+        value, expires_at, _ = item
+        if expires_at <= self.clock():
+            self._delete(key)
+            return None
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key: str, value, ttl: float = None):
+        now = self.clock()
+        if self._ticks and self._ticks[0] * self.resolution <= now:
+            self.expire(now)
+        if key in self.cache:
+            self._delete(key)
+        elif len(self.cache) >= self.capacity:
+            self._delete(next(iter(self.cache)))
+
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        # Корзина tick истекает целиком, когда now >= tick * resolution
+        tick = math.ceil(expires_at / self.resolution)
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            bucket = self._buckets[tick] = set()
+            heappush(self._ticks, tick)
+        bucket.add(key)
+        self.cache[key] = (value, expires_at, tick)
+
+    def expire(self, now: float = None) -> int:
+        # Можно вызывать и по таймеру, чтобы освобождать память без записей в кеш
+        now = self.clock() if now is None else now
+        removed = 0
+        while self._ticks and self._ticks[0] * self.resolution <= now:
+            for key in self._buckets.pop(heappop(self._ticks)):
+                del self.cache[key]
+                removed += 1
+        return removed
+
+    def _delete(self, key: str):
+        _, _, tick = self.cache.pop(key)
+        self._buckets[tick].discard(key)
+
+
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+class CountMinSketch:
+    # Приблизительные частоты ключей в фиксированной памяти: depth строк счётчиков, каждый счётчик —
+    # отдельный байт bytearray с насыщением на 15 (диапазон 4-битного, но без упаковки двух в байт).
+    # После sample_size инкрементов все счётчики делятся пополам — старая популярность затухает.
+    def __init__(self, capacity: int, depth: int = 4):
+        width = 1
+        while width < max(capacity, 16):
+            width <<= 1
+        self.width = width
+        self.mask = width - 1
+        self.depth = depth
+        self.table = bytearray(width * depth)
+        self.offsets = [(row, row * width) for row in range(depth)]
+        self.sample_size = 10 * max(capacity, 1)
+        self.additions = 0
+
+    def _indexes(self, key: str):
+        h = hash(key)
+        step = (h >> 16) | 1  # двойное хеширование: строки сдвинуты на разный шаг
+        mask = self.mask
+        return [offset + ((h + row * step) & mask) for row, offset in self.offsets]
+
+    def frequency(self, key: str) -> int:
+        table = self.table
+        return min(table[i] for i in self._indexes(key))
+
+    def increment(self, key: str):
+        table = self.table
+        added = False
+        for i in self._indexes(key):
+            if table[i] < 15:
+                table[i] += 1
+                added = True
+        if added:
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self.reset()
+
+    def reset(self):
+        self.table = bytearray(self.table.translate(_HALVE))
+        self.additions //= 2
+
+
+class WTinyLFUCache(CacheStrategy):
+    # W-TinyLFU: маленькое LRU-окно для новых ключей и сегментированный LRU (probation/protected) для основной части.
+    # Кандидат из окна попадает в основную часть, только если по скетчу он популярнее жертвы,
+    # поэтому однократный скан не вымывает горячие ключи.
+    def __init__(self, capacity: int, window_ratio: float = 0.01, protected_ratio: float = 0.8):
+        self.capacity = capacity
+        self.window_capacity = max(1, int(capacity * window_ratio))
+        self.main_capacity = max(0, capacity - self.window_capacity)
+        self.protected_capacity = int(self.main_capacity * protected_ratio)
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.sketch = CountMinSketch(capacity)
+
+    def __len__(self):
+        return len(self.window) + len(self.probation) + len(self.protected)
+
+    def get(self, key: str):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+            return self.window[key]
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return self.protected[key]
+        if key in self.probation:
+            value = self.probation.pop(key)
+            self._protect(key, value)
+            return value
+        return None
+
+    def put(self, key: str, value):
+        if key in self.window:
+            self.window[key] = value
+            self.window.move_to_end(key)
+            return
+        if key in self.protected:
+            self.protected[key] = value
+            self.protected.move_to_end(key)
+            return
+        if key in self.probation:
+            del self.probation[key]
+            self._protect(key, value)
+            return
+
+        self.sketch.increment(key)
+        self.window[key] = value
+        if len(self.window) > self.window_capacity:
+            self._admit(*self.window.popitem(last=False))
+
+    def _protect(self, key: str, value):
+        self.protected[key] = value
+        if len(self.protected) > self.protected_capacity:
+            # Вытесненный из protected получает ещё один шанс в probation
+            demoted_key, demoted_value = self.protected.popitem(last=False)
+            self.probation[demoted_key] = demoted_value
+
+    def _admit(self, key: str, value):
+        if len(self.probation) + len(self.protected) < self.main_capacity:
+            self.probation[key] = value
+            return
+        victims = self.probation or self.protected
+        if not victims:
+            return
+        victim = next(iter(victims))
+        if self.sketch.frequency(key) > self.sketch.frequency(victim):
+            del victims[victim]
+            self.probation[key] = value
+
+
+class SharedMemoryCache(CacheStrategy):
+    # Кеш в mmap-файле, общий для всех процессов узла (Linux/macOS: нужен fcntl).
+    # Фиксированная хеш-таблица с открытой адресацией, разбитая на сегменты.
+    # У каждого сегмента своя блокировка: fcntl-lock на байт с номером сегмента между процессами
+    # и threading.Lock между потоками одного процесса. Вытеснение — CLOCK внутри сегмента.
+    # Значения — bytes, bytearray или memoryview не длиннее value_size,
+    # ключи — строки не длиннее key_size байт в UTF-8.
+    MAGIC = b"PYACACHE"
+    _HEADER = struct.Struct("<8sIIIII")  # magic, segments, slots, max_entries, key_size, value_size
+    _HEADER_SIZE = 64
+    _SEGMENT = struct.Struct("<IIQQQ")  # clock hand, count, hits, misses, evictions
+    _SLOT = struct.Struct("<BBHIQ")  # state, ref bit, key_len, value_len, hash
+    _EMPTY, _USED = 0, 1
+
+    def __init__(self, path: str, capacity: int = 10_000, key_size: int = 64, value_size: int = 1024,
+                 segments: int = 16, load_factor: float = 0.7):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)  # первый процесс размечает файл, остальные ждут
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                max_entries = max(1, math.ceil(capacity / segments))
+                slots = max(max_entries + 1, math.ceil(max_entries / load_factor))
+                size = self._layout_size(segments, slots, key_size, value_size)
+                os.ftruncate(self._fd, size)
+                self._mm = mmap.mmap(self._fd, size)
+                self._HEADER.pack_into(self._mm, 0, self.MAGIC, segments, slots, max_entries, key_size, value_size)
+            else:
+                self._mm = mmap.mmap(self._fd, size)
+            # Параметры всегда берутся из файла: все процессы видят одну и ту же разметку
+            magic, segments, slots, max_entries, key_size, value_size = self._HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC:
+                raise ValueError(f"{path} is not a shared cache file")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self.segments = segments
+        self.slots = slots
+        self.max_entries = max_entries
+        self.key_size = key_size
+        self.value_size = value_size
+        self.slot_size = self._SLOT.size + key_size + value_size
+        self.segment_size = self._SEGMENT.size + slots * self.slot_size
+        self._thread_locks = [threading.Lock() for _ in range(segments)]
+
+    @classmethod
+    def _layout_size(cls, segments: int, slots: int, key_size: int, value_size: int) -> int:
+        slot_size = cls._SLOT.size + key_size + value_size
+        return cls._HEADER_SIZE + segments * (cls._SEGMENT.size + slots * slot_size)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # hash() у str рандомизирован в каждом процессе, нужен стабильный хеш
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def _acquire(self, segment: int):
+        self._thread_locks[segment].acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, segment)
+
+    def _release(self, segment: int):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, segment)
+        self._thread_locks[segment].release()
+
+    def _slot(self, base: int, index: int) -> int:
+        return base + self._SEGMENT.size + index * self.slot_size
+
+    def _home(self, h: int) -> int:
+        return (h // self.segments) % self.slots
+
+    def _find(self, base: int, key: bytes, h: int):
+        # Линейное пробирование до ключа или первого пустого слота
+        mm = self._mm
+        index = self._home(h)
+        while True:
+            offset = self._slot(base, index)
+            state, _, key_len, _, slot_hash = self._SLOT.unpack_from(mm, offset)
+            if state == self._EMPTY:
+                return index, False
+            if slot_hash == h and key_len == len(key):
+                start = offset + self._SLOT.size
+                if mm[start:start + key_len] == key:
+                    return index, True
+            index = (index + 1) % self.slots
+
+    def _count(self, base: int, field: int):
+        values = list(self._SEGMENT.unpack_from(self._mm, base))
+        values[field] += 1
+        self._SEGMENT.pack_into(self._mm, base, *values)
+
+    def get(self, key: str):
+        encoded = key.encode()
+        h = self._hash(encoded)
+        segment = h % self.segments
+        base = self._HEADER_SIZE + segment * self.segment_size
+        self._acquire(segment)
+        try:
+            index, found = self._find(base, encoded, h)
+            if not found:
+                self._count(base, 3)
+                return None
+            offset = self._slot(base, index)
+            self._mm[offset + 1] = 1  # бит обращения для CLOCK
+            _, _, key_len, value_len, _ = self._SLOT.unpack_from(self._mm, offset)
+            start = offset + self._SLOT.size + self.key_size
+            self._count(base, 2)
+            return self._mm[start:start + value_len]
+        finally:
+            self._release(segment)
+
+    def put(self, key: str, value):
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            # bytes(5) молча дал бы пять нулевых байт
+            raise TypeError(f"Value must be bytes-like, got {type(value).__name__}")
+        encoded = key.encode()
+        value = bytes(value)
+        if len(encoded) > self.key_size:
+            raise ValueError(f"Key is longer than {self.key_size} bytes")
+        if len(value) > self.value_size:
+            raise ValueError(f"Value is longer than {self.value_size} bytes")
+        h = self._hash(encoded)
+        segment = h % self.segments
+        base = self._HEADER_SIZE + segment * self.segment_size
+        self._acquire(segment)
+        try:
+            index, found = self._find(base, encoded, h)
+            if not found:
+                hand, count, hits, misses, evictions = self._SEGMENT.unpack_from(self._mm, base)
+                if count >= self.max_entries:
+                    self._evict(base)
+                    index, found = self._find(base, encoded, h)  # удаление могло сдвинуть слоты
+                hand, count, hits, misses, evictions = self._SEGMENT.unpack_from(self._mm, base)
+                self._SEGMENT.pack_into(self._mm, base, hand, count + 1, hits, misses, evictions)
+            offset = self._slot(base, index)
+            # Новый ключ без бита обращения: если его не прочитают, CLOCK вытеснит его первым
+            self._SLOT.pack_into(self._mm, offset, self._USED, int(found), len(encoded), len(value), h)
+            start = offset + self._SLOT.size
+            self._mm[start:start + len(encoded)] = encoded
+            start += self.key_size
+            self._mm[start:start + len(value)] = value
+        finally:
+            self._release(segment)
+
+    def _evict(self, base: int):
+        mm = self._mm
+        hand, count, hits, misses, evictions = self._SEGMENT.unpack_from(mm, base)
+        while True:
+            offset = self._slot(base, hand)
+            if mm[offset] == self._USED:
+                if mm[offset + 1]:
+                    mm[offset + 1] = 0  # второй шанс
+                else:
+                    self._delete_at(base, hand)
+                    self._SEGMENT.pack_into(mm, base, hand, count - 1, hits, misses, evictions + 1)
+                    return
+            hand = (hand + 1) % self.slots
+
+    def _delete_at(self, base: int, index: int):
+        # Удаление со сдвигом назад: без "надгробий", цепочки пробирования остаются короткими
+        mm = self._mm
+        size = self.slot_size
+        current = index
+        while True:
+            current = (current + 1) % self.slots
+            offset = self._slot(base, current)
+            if mm[offset] == self._EMPTY:
+                break
+            home = self._home(self._SLOT.unpack_from(mm, offset)[4])
+            # Слот можно перенести в дыру, если его домашняя позиция не лежит в (index, current]
+            if index < current:
+                movable = home <= index or home > current
+            else:
+                movable = current < home <= index
+            if movable:
+                target = self._slot(base, index)
+                mm[target:target + size] = mm[offset:offset + size]
+                index = current
+        mm[self._slot(base, index)] = self._EMPTY
+
+    def stats(self) -> dict:
+        totals = {"entries": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for segment in range(self.segments):
+            base = self._HEADER_SIZE + segment * self.segment_size
+            _, count, hits, misses, evictions = self._SEGMENT.unpack_from(self._mm, base)
+            totals["entries"] += count
+            totals["hits"] += hits
+            totals["misses"] += misses
+            totals["evictions"] += evictions
+        return totals
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        # Накопительные счётчики в духе Prometheus: le -> число наблюдений <= le
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "buckets": dict(zip(self.buckets, itertools.accumulate(self.counts))),
+        }
+
+
+@dataclass
+class LoadedEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+    delta: float  # сколько длилась загрузка, нужно для раннего обновления
+
+
+class _LoaderCancelled(Exception):
+    # Ждущим single-flight: загрузка лидера отменена, нужно повторить самим
+    pass
+
+
 class CacheManager:
+    # get_or_load защищает источник данных от "стада":
+    # - на промахе загрузчик по ключу выполняется один раз, остальные ждут результат (single-flight);
+    # - в окне stale_ttl отдаётся устаревшее значение, а обновление идёт в фоне;
+    # - незадолго до истечения ключ с вероятностью обновляется заранее (XFetch, параметр beta).
+    def __init__(self, strategy: CacheStrategy, clock: Callable[[], float] = time.monotonic,
+                 refresh_workers: int = 4):
+        self.strategy = strategy
+        self.clock = clock
+        self.refresh_workers = refresh_workers
+        self._lock = threading.Lock()  # стратегия и таблица загрузок из разных потоков
+        self._flights: Dict[str, Future] = {}
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._background: Set[asyncio.Task] = set()
+        self.loader_latency = LatencyHistogram()
+        self.load_stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "suppressed": 0,  # запросы, которые дождались чужой загрузки
+            "stale_served": 0,
+            "early_refreshes": 0,
+        }
+
+    def get(self, key: str):
+        # Под тем же lock, что и фоновые обновления: операции стратегий не атомарны
+        with self._lock:
+            value = self.strategy.get(key)
+        if isinstance(value, LoadedEntry):
+            return value.value if self.clock() < value.expires_at else None
+        return value
+
+    def put(self, key: str, value, ttl: float = None):
+        # TTL на запись поддерживают не все стратегии, передаём его только если задан
+        with self._lock:
+            if ttl is None:
+                self.strategy.put(key, value)
+            else:
+                self.strategy.put(key, value, ttl)
+
+    def stats(self) -> dict:
+        return {**self.load_stats, "loader_latency": self.loader_latency.snapshot()}
+
+    def _lookup(self, key: str, beta: float):
+        now = self.clock()
+        with self._lock:
+            entry = self.strategy.get(key)
+            state = self._classify(entry, now, beta)
+            self.load_stats[state] += 1
+        return entry, state
+
+    def _classify(self, entry, now: float, beta: float) -> str:
+        if not isinstance(entry, LoadedEntry) or now >= entry.stale_until:
+            return "misses"
+        if now >= entry.expires_at:
+            return "stale_served"
+        # XFetch: чем ближе истечение и чем дольше загрузка, тем выше шанс обновить заранее
+        if beta > 0 and now - entry.delta * beta * math.log(1.0 - random.random()) >= entry.expires_at:
+            return "early_refreshes"
+        return "hits"
+
+    def _store(self, key: str, value, ttl: float, stale_ttl: float, delta: float):
+        now = self.clock()
+        with self._lock:
+            self.loader_latency.observe(delta)
+            self.load_stats["loads"] += 1
+            self.strategy.put(key, LoadedEntry(value, now + ttl, now + ttl + stale_ttl, delta))
+
+    # --------------- sync ---------------
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float = 60.0, stale_ttl: float = 0.0,
+                    beta: float = 1.0):
+        entry, state = self._lookup(key, beta)
+        if state == "hits":
+            return entry.value
+        if state != "misses":
+            self._refresh(key, loader, ttl, stale_ttl)
+            return entry.value
+        return self._load(key, loader, ttl, stale_ttl)
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float):
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+            else:
+                self.load_stats["suppressed"] += 1
+        if not leader:
+            return future.result()
+
+        started = time.perf_counter()
+        try:
+            value = loader()
+            self._store(key, value, ttl, stale_ttl, time.perf_counter() - started)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                self.load_stats["load_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def _refresh(self, key: str, loader: Callable[[], Any], ttl: float, stale_ttl: float):
+        with self._lock:
+            if key in self._flights:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.refresh_workers, thread_name_prefix="cache-refresh")
+        # Ошибка фоновой загрузки учитывается в load_errors, старое значение остаётся в кеше
+        self._executor.submit(self._load, key, loader, ttl, stale_ttl)
+
+    # --------------- asyncio ---------------
+    async def get_or_load_async(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float = 60.0,
+                                stale_ttl: float = 0.0, beta: float = 1.0):
+        entry, state = self._lookup(key, beta)
+        if state == "hits":
+            return entry.value
+        if state != "misses":
+            if key not in self._async_flights:
+                task = asyncio.create_task(self._refresh_async(key, loader, ttl, stale_ttl))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return entry.value
+        return await self._load_async(key, loader, ttl, stale_ttl)
+
+    async def _load_async(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float):
+        while True:
+            future = self._async_flights.get(key)
+            if future is None:
+                break
+            self.load_stats["suppressed"] += 1
+            try:
+                return await asyncio.shield(future)
+            except _LoaderCancelled:
+                continue  # отменили загрузку лидера, а не нас: один из ждущих становится новым лидером
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = future
+        started = time.perf_counter()
+        try:
+            value = await loader()
+            self._store(key, value, ttl, stale_ttl, time.perf_counter() - started)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(_LoaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            self.load_stats["load_errors"] += 1
+            future.set_exception(e)
+            future.exception()  # помечаем как прочитанное, если ждущих нет
+            raise
+        finally:
+            del self._async_flights[key]
+
+    async def _refresh_async(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float):
+        try:
+            await self._load_async(key, loader, ttl, stale_ttl)
+        except Exception:
+            pass  # уже учтено в load_errors
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class CacheShard:
+    # Сегмент кеша: своя стратегия, свой lock и счётчики конкуренции.
+    # Счётчики меняются только под lock сегмента.
     def __init__(self, strategy: CacheStrategy):
         self.strategy = strategy
+        self.lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.0
+
+    def acquire(self):
+        if not self.lock.acquire(blocking=False):
+            started = time.perf_counter()
+            self.lock.acquire()
+            self.contended += 1
+            self.wait_time += time.perf_counter() - started
+        self.acquisitions += 1
+
+    def release(self):
+        self.lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_time": self.wait_time,
+        }
+
+
+class ShardedCacheManager:
+    # Потокобезопасный CacheManager: ключи распределяются по N независимым сегментам,
+    # поэтому потоки, работающие с разными сегментами, не ждут друг друга.
+    # shards=1 — то же самое, что один глобальный lock.
+    def __init__(self, strategy_factory: Callable[[], CacheStrategy], shards: int = 16):
+        self.shards = [CacheShard(strategy_factory()) for _ in range(shards)]
+
+    def _shard(self, key: str) -> CacheShard:
+        return self.shards[hash(key) % len(self.shards)]
 
     def get(self, key: str):
-        return self.strategy.get(key)
+        shard = self._shard(key)
+        shard.acquire()
+        try:
+            return shard.strategy.get(key)
+        finally:
+            shard.release()
 
-    def put(self, key: str, value):
-        self.strategy.put(key, value)
+    def put(self, key: str, value, ttl: float = None):
+        shard = self._shard(key)
+        shard.acquire()
+        try:
+            if ttl is None:
+                shard.strategy.put(key, value)
+            else:
+                shard.strategy.put(key, value, ttl)
+        finally:
+            shard.release()
+
+    def _group(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        count = len(self.shards)
+        for key in keys:
+            groups.setdefault(hash(key) % count, []).append(key)
+        return groups
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, object]:
+        # Один захват lock на сегмент вместо одного на ключ
+        keys = list(keys)
+        result = dict.fromkeys(keys)
+        for index, shard_keys in self._group(keys).items():
+            shard = self.shards[index]
+            shard.acquire()
+            try:
+                for key in shard_keys:
+                    result[key] = shard.strategy.get(key)
+            finally:
+                shard.release()
+        return result
+
+    def put_many(self, items: Dict[str, object]):
+        for index, shard_keys in self._group(items).items():
+            shard = self.shards[index]
+            shard.acquire()
+            try:
+                for key in shard_keys:
+                    shard.strategy.put(key, items[key])
+            finally:
+                shard.release()
+
+    def stats(self) -> List[dict]:
+        return [shard.stats() for shard in self.shards]
 
 
 # Использование
-cache = CacheManager(LRUCache(2))
-cache.put("a", 1)
-cache.put("b", 2)
-print(cache.get("a"))  # 1
-cache.put("c", 3)  # "b" вытесняется
-print(cache.get("b"))  # None
+if __name__ == "__main__":
+    cache = CacheManager(LRUCache(2))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    print(cache.get("a"))  # 1
+    cache.put("c", 3)  # "b" вытесняется
+    print(cache.get("b"))  # None
+
+    ttl_cache = CacheManager(BoundedTTLCache(capacity=1000, ttl=60))
+    ttl_cache.put("session", "token")
+    ttl_cache.put("otp", "1234", ttl=0.01)
+    time.sleep(0.02)
+    print(ttl_cache.get("session"), ttl_cache.get("otp"))  # token None
+
+    sharded = ShardedCacheManager(lambda: LRUCache(1000), shards=8)
+    sharded.put_many({"a": 1, "b": 2, "c": 3})
+    print(sharded.get_many(["a", "c", "x"]))  # {'a': 1, 'c': 3, 'x': None}
+
+    async def load_profile():
+        await asyncio.sleep(0.05)  # запрос к БД
+        return {"name": "Alice"}
+
+    async def herd():
+        manager = CacheManager(LRUCache(100))
+        profiles = await asyncio.gather(*(manager.get_or_load_async("user:1", load_profile, ttl=30) for _ in range(100)))
+        print(profiles[0], manager.stats()["loads"], manager.stats()["suppressed"])  # {'name': 'Alice'} 1 99
+
+    asyncio.run(herd())
@@ -0,0 +1,56 @@
+import asyncio
+import importlib.util
+import pathlib
+import sys
+import threading
+
+
+# main.py загружается по пути: в каждом каталоге репозитория свой модуль main
+_spec = importlib.util.spec_from_file_location("cache_manager_main", pathlib.Path(__file__).with_name("main.py"))
+cm = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = cm
+_spec.loader.exec_module(cm)
+
+
+def test_followers_take_over_when_async_leader_is_cancelled():
+    manager = cm.CacheManager(cm.LRUCache(16))
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def scenario():
+        leader = asyncio.create_task(manager.get_or_load_async("k", loader))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(manager.get_or_load_async("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(scenario()) == ["value"] * 3
+    assert len(calls) == 2  # отменённый лидер и один новый лидер из ждущих
+
+
+def test_get_and_put_are_safe_alongside_locked_writers():
+    manager = cm.CacheManager(cm.LRUCache(64))
+    errors = []
+
+    def worker(offset: int):
+        try:
+            for i in range(5000):
+                key = f"k{(i + offset) % 200}"
+                manager.put(key, i)
+                manager.get(key)
+                manager.get_or_load(f"l{i % 200}", lambda: i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n * 37,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(manager.strategy.cache) <= 64
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from main import CircuitBreaker
+
+
+# Накладные расходы CircuitBreaker в состоянии CLOSED на один вызов.
+# Сравниваем прямой вызов no-op функции с вызовом через breaker: sync, несколько потоков, asyncio.
+# Запуск: python circuit_breaker/benchmark.py
+
+
+CALLS = 500_000
+THREADS = 4
+
+
+def noop():
+    return None
+
+
+async def async_noop():
+    return None
+
+
+def measure_sync(call) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        call()
+    return (time.perf_counter() - started) / CALLS
+
+
+def measure_threaded(call) -> float:
+    calls = CALLS // THREADS
+
+    def worker():
+        for _ in range(calls):
+            call()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - started) / (calls * THREADS)
+
+
+def measure_async(call) -> float:
+    async def run():
+        started = time.perf_counter()
+        for _ in range(CALLS):
+            await call()
+        return (time.perf_counter() - started) / CALLS
+
+    return asyncio.run(run())
+
+
+def report(mode: str, direct: float, wrapped: float):
+    print(f"{mode:>8}: direct {direct * 1e9:7.1f} ns  breaker {wrapped * 1e9:7.1f} ns  "
+          f"overhead {(wrapped - direct) * 1e9:7.1f} ns/call")
+
+
+def main():
+    breaker = CircuitBreaker()
+    # Прямой вызов тоже через lambda, чтобы сравнивать только работу breaker
+    report("sync", measure_sync(lambda: noop()), measure_sync(lambda: breaker.call(noop)))
+    report("threaded", measure_threaded(lambda: noop()), measure_threaded(lambda: breaker.call(noop)))
+    report("async", measure_async(lambda: async_noop()), measure_async(lambda: breaker.call_async(async_noop)))
+
+
+if __name__ == "__main__":
+    main()
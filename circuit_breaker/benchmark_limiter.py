@@ -0,0 +1,105 @@
+import asyncio
+import random
+import sys
+import time
+from typing import List
+
+from main import AdaptiveConcurrencyLimiter, AIMDLimit, GradientLimit, LimitExceededError
+
+
+# Симуляция перегрузки: локальный сервис с ограниченным числом воркеров,
+# у которого время обработки растёт вместе с очередью (конкуренция за ресурсы).
+# Клиент шлёт запросы с постоянной частотой выше ёмкости сервиса и ждёт ответ не дольше DEADLINE.
+# Печатаем goodput (успешные ответы в срок в секунду) и p99 латентности успешных запросов.
+# Запуск: python circuit_breaker/benchmark_limiter.py [секунды]
+
+
+WORKERS = 10
+BASE_LATENCY = 0.02  # ёмкость сервиса: WORKERS / BASE_LATENCY = 500 запросов/сек
+DEGRADATION = 0.02  # +2% к времени обработки за каждый запрос в очереди
+ARRIVAL_RATE = 800
+DEADLINE = 0.25
+
+
+class DegradingService:
+    def __init__(self):
+        self.workers = asyncio.Semaphore(WORKERS)
+        self.queued = 0
+
+    async def handle(self):
+        self.queued += 1
+        try:
+            await self.workers.acquire()
+        finally:
+            self.queued -= 1
+        try:
+            await asyncio.sleep(BASE_LATENCY * (1 + DEGRADATION * self.queued))
+        finally:
+            self.workers.release()
+        return "ok"
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.timeouts = 0
+        self.shed = 0
+
+
+async def request(service: DegradingService, limiter, stats: Stats):
+    started = time.perf_counter()
+
+    async def call():
+        return await asyncio.wait_for(service.handle(), DEADLINE)
+
+    try:
+        if limiter is None:
+            await call()
+        else:
+            await limiter.call_async(call)
+    except LimitExceededError:
+        stats.shed += 1
+        return
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        return
+    stats.latencies.append(time.perf_counter() - started)
+
+
+async def simulate(limiter, duration: float) -> Stats:
+    service = DegradingService()
+    stats = Stats()
+    rnd = random.Random(7)
+    tasks = []
+    started = time.perf_counter()
+    next_arrival = started
+    while next_arrival - started < duration:
+        # Открытая нагрузка: пуассоновский поток запросов не ждёт ответов
+        next_arrival += rnd.expovariate(ARRIVAL_RATE)
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(service, limiter, stats)))
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def report(label: str, stats: Stats, duration: float):
+    latencies = sorted(stats.latencies)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+    line = (f"{label:>14}: goodput {len(latencies) / duration:6.0f} req/s  p99 {p99:6.1f} ms  "
+            f"timeouts {stats.timeouts:5d}  shed {stats.shed:5d}")
+    print(line)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print(f"capacity {WORKERS / BASE_LATENCY:.0f} req/s, arrival {ARRIVAL_RATE} req/s, deadline {DEADLINE * 1000:.0f} ms")
+    report("no limiter", asyncio.run(simulate(None, duration)), duration)
+    for label, strategy in (("AIMD", AIMDLimit(latency_threshold=DEADLINE / 2)), ("gradient", GradientLimit())):
+        limiter = AdaptiveConcurrencyLimiter(strategy, initial_limit=WORKERS)
+        report(label, asyncio.run(simulate(limiter, duration)), duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import time
+import tracemalloc
+
+from main import CircuitBreakerRegistry, SlidingWindowConfig
+
+
+# Память на один SlidingWindowCircuitBreaker и стоимость записи вызова.
+# Поток 100k вызовов/сек моделируется часами, которые сдвигаются на 10 мкс за вызов,
+# так что в замер попадает и прокрутка корзин окна.
+# Запуск: python circuit_breaker/benchmark_registry.py
+
+
+BREAKERS = 10_000
+CALLS = 1_000_000
+RATE = 100_000  # вызовов в секунду
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def noop():
+    return None
+
+
+def measure_memory():
+    config = SlidingWindowConfig()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    registry = CircuitBreakerRegistry(config)
+    for i in range(BREAKERS):
+        registry.get(f"GET /api/v1/items/{i}")
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    names = sum(len(f"GET /api/v1/items/{i}") + 49 for i in range(BREAKERS))  # сами строки ключей
+    print(f"memory: {allocated / BREAKERS:7.0f} bytes/breaker "
+          f"({(allocated - names) / BREAKERS:.0f} without endpoint names), {BREAKERS} breakers")
+
+
+def measure_updates():
+    clock = SimulatedClock()
+    registry = CircuitBreakerRegistry(SlidingWindowConfig(), clock=clock)
+    names = [f"GET /api/v1/items/{i}" for i in range(100)]
+    step = 1 / RATE
+
+    started = time.perf_counter()
+    for i in range(CALLS):
+        clock.now += step
+    loop_only = time.perf_counter() - started
+
+    clock.now = 0.0
+    started = time.perf_counter()
+    for i in range(CALLS):
+        clock.now += step
+        registry.call(names[i % 100], noop)
+    elapsed = time.perf_counter() - started - loop_only
+
+    per_call = elapsed / CALLS
+    print(f"update: {per_call * 1e9:7.0f} ns/call, at {RATE} calls/s that is {per_call * RATE:6.1%} of one core")
+
+
+def main():
+    measure_memory()
+    measure_updates()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
+import functools
+import inspect
+import math
+import threading
 import time
+from array import array
+from dataclasses import dataclass
 from enum import Enum
-from typing import Callable
+from typing import Callable, Dict, List
 
 
 # Понимание, зачем нужен Circuit Breaker.
@@ -10,6 +16,9 @@ from typing import Callable
 # Защищает систему от каскадных отказов.
 # Подходит для микросервисов, внешних API.
 # Улучшает надёжность и устойчивость системы.
+# Потокобезопасен, умеет оборачивать корутины, в HALF_OPEN пропускает ограниченное число пробных вызовов.
+# SlidingWindowCircuitBreaker размыкается по доле ошибок в скользящем окне, реестр держит breaker на endpoint.
+# AdaptiveConcurrencyLimiter срезает лишнюю нагрузку до того, как начнутся ошибки.
 
 
 class State(Enum):
@@ -18,38 +27,478 @@ class State(Enum):
     HALF_OPEN = "half-open"
 
 
+_CLOSED = State.CLOSED  # без поиска атрибута Enum на горячем пути
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
 class CircuitBreaker:
-    def __init__(self, failure_threshold: int = 5, timeout: int = 60):
+    __slots__ = ("failure_threshold", "timeout", "half_open_max_calls", "clock", "failure_count",
+                 "last_failure_time", "state", "_half_open_calls", "_lock")
+
+    def __init__(self, failure_threshold: int = 5, timeout: int = 60, half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
         self.failure_threshold = failure_threshold
         self.timeout = timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
         self.failure_count = 0
         self.last_failure_time = None
         self.state = State.CLOSED
+        self._half_open_calls = 0  # пробные вызовы в полёте
+        self._lock = threading.Lock()
+
+    def _before_call(self) -> bool:
+        # Возвращает True, если вызов пробный (HALF_OPEN)
+        if self.state is State.CLOSED:
+            return False
+        with self._lock:
+            if self.state is State.OPEN:
+                if self.clock() - self.last_failure_time > self.timeout:
+                    self._set_state(State.HALF_OPEN)
+                    self._half_open_calls = 0
+                else:
+                    raise CircuitOpenError("Circuit is OPEN")
+            if self.state is State.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError("Circuit is HALF_OPEN, probe limit reached")
+                self._half_open_calls += 1
+                return True
+            return False
 
     def call(self, func: Callable, *args, **kwargs):
-        if self.state == State.OPEN:
-            if time.time() - self.last_failure_time > self.timeout:
-                self.state = State.HALF_OPEN
-            else:
-                raise Exception("Circuit is OPEN")
+        # В CLOSED без ошибок вызов не трогает lock и ничего не записывает
+        probe = self.state is not _CLOSED and self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.on_failure(probe)
+            raise e
+        except BaseException:
+            # Отмена снаружи — не отказ сервиса, но слот пробного вызова нужно вернуть
+            if probe:
+                self._release_probe()
+            raise
+        if probe or self.failure_count:
+            self.on_success(probe)
+        return result
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        probe = self.state is not _CLOSED and self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.on_failure(probe)
+            raise e
+        except BaseException:
+            # Отмена снаружи — не отказ сервиса, но слот пробного вызова нужно вернуть
+            if probe:
+                self._release_probe()
+            raise
+        if probe or self.failure_count:
+            self.on_success(probe)
+        return result
+
+    def __call__(self, func: Callable):
+        # Использование как декоратора: @breaker
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def _set_state(self, state: State):
+        self.state = state
+
+    def _release_probe(self):
+        with self._lock:
+            self._half_open_calls -= 1
+
+    def on_success(self, probe: bool = False):
+        if not probe and self.state is State.CLOSED and self.failure_count == 0:
+            return  # ничего не меняется, обходимся без записи и lock
+        with self._lock:
+            if probe:
+                self._half_open_calls -= 1
+                self._set_state(State.CLOSED)
+                self.failure_count = 0
+            elif self.state is State.CLOSED:
+                self.failure_count = 0
+            # Успех обычного вызова, начатого до размыкания, цепь не закрывает
 
+    def on_failure(self, probe: bool = False):
+        with self._lock:
+            if probe:
+                self._half_open_calls -= 1
+            self.failure_count += 1
+            self.last_failure_time = self.clock()
+            if probe or self.failure_count >= self.failure_threshold:
+                self._set_state(State.OPEN)
+
+
+# =============== Sliding window ===============
+@dataclass(frozen=True)
+class SlidingWindowConfig:
+    # Общая для всех breaker'ов реестра настройка: в каждом breaker хранится только ссылка
+    failure_rate_threshold: float = 0.5  # доля ошибок в окне, при которой цепь размыкается
+    slow_call_rate_threshold: float = 1.0  # доля медленных вызовов; 1.0 и выше — не учитывать
+    slow_call_duration: float = 1.0  # секунды
+    minimum_calls: int = 20  # меньше вызовов в окне — решение не принимается
+    window: float = 10.0  # секунды
+    buckets: int = 10
+    timeout: float = 60
+    half_open_max_calls: int = 1
+
+
+StateListener = Callable[[str, State, State], None]
+
+
+class SlidingWindowCircuitBreaker(CircuitBreaker):
+    # Размыкается по доле ошибок и медленных вызовов за последние window секунд.
+    # Окно — кольцевой буфер из buckets корзин фиксированного размера (array),
+    # итоги поддерживаются инкрементально: запись вызова — O(1), память не растёт.
+    __slots__ = ("name", "config", "listener", "rejected", "calls", "failures", "slow_calls",
+                 "_bucket_width", "_slot", "_bucket_calls", "_bucket_failures", "_bucket_slow")
+
+    def __init__(self, name: str = "", config: SlidingWindowConfig = None, listener: StateListener = None,
+                 clock: Callable[[], float] = time.monotonic):
+        config = config or SlidingWindowConfig()
+        super().__init__(timeout=config.timeout, half_open_max_calls=config.half_open_max_calls, clock=clock)
+        self._lock = threading.RLock()  # слушатель событий может снова обратиться к breaker
+        self.name = name
+        self.config = config
+        self.listener = listener
+        self.rejected = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self._bucket_width = config.window / config.buckets
+        self._slot = int(clock() / self._bucket_width)
+        self._bucket_calls = array("I", bytes(4 * config.buckets))
+        self._bucket_failures = array("I", bytes(4 * config.buckets))
+        self._bucket_slow = array("I", bytes(4 * config.buckets))
+
+    def _set_state(self, state: State):
+        old = self.state
+        if old is state:
+            return
+        self.state = state
+        if self.listener is not None:
+            self.listener(self.name, old, state)
+
+    def _before_call(self) -> bool:
+        try:
+            return super()._before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+    def call(self, func: Callable, *args, **kwargs):
+        probe = self.state is not _CLOSED and self._before_call()
+        started = self.clock()
         try:
             result = func(*args, **kwargs)
-            self.on_success()
-            return result
         except Exception as e:
-            self.on_failure()
+            self._record(started, True, probe)
             raise e
+        except BaseException:
+            if probe:
+                self._release_probe()
+            raise
+        self._record(started, False, probe)
+        return result
 
-    def on_success(self):
-        self.failure_count = 0
-        self.state = State.CLOSED
+    async def call_async(self, func: Callable, *args, **kwargs):
+        probe = self.state is not _CLOSED and self._before_call()
+        started = self.clock()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record(started, True, probe)
+            raise e
+        except BaseException:
+            if probe:
+                self._release_probe()
+            raise
+        self._record(started, False, probe)
+        return result
+
+    def on_success(self, probe: bool = False):
+        self._record(self.clock(), False, probe)
+
+    def on_failure(self, probe: bool = False):
+        self._record(self.clock(), True, probe)
 
-    def on_failure(self):
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        if self.failure_count >= self.failure_threshold:
-            self.state = State.OPEN
+    def _advance(self, slot: int):
+        # Обнуляем корзины, время которых вышло из окна; их не больше, чем корзин в буфере
+        count = len(self._bucket_calls)
+        for passed in range(max(self._slot + 1, slot - count + 1), slot + 1):
+            index = passed % count
+            self.calls -= self._bucket_calls[index]
+            self.failures -= self._bucket_failures[index]
+            self.slow_calls -= self._bucket_slow[index]
+            self._bucket_calls[index] = self._bucket_failures[index] = self._bucket_slow[index] = 0
+        self._slot = slot
+
+    def _reset_window(self):
+        for buffer in (self._bucket_calls, self._bucket_failures, self._bucket_slow):
+            for index in range(len(buffer)):
+                buffer[index] = 0
+        self.calls = self.failures = self.slow_calls = 0
+
+    def _record(self, started: float, failed: bool, probe: bool):
+        now = self.clock()
+        config = self.config
+        slow = now - started >= config.slow_call_duration
+        with self._lock:
+            if probe:
+                self._half_open_calls -= 1
+                # Медленный пробный вызов — отказ, только если медленные вызовы вообще учитываются
+                if failed or (slow and config.slow_call_rate_threshold < 1.0):
+                    self.last_failure_time = now
+                    self._set_state(State.OPEN)
+                else:
+                    self._reset_window()
+                    self._set_state(State.CLOSED)
+                return
+            if self.state is not _CLOSED:
+                return  # вызов начался до размыкания
+
+            slot = int(now / self._bucket_width)
+            if slot != self._slot:
+                self._advance(slot)
+            index = slot % config.buckets
+            self._bucket_calls[index] += 1
+            calls = self.calls = self.calls + 1
+            if failed:
+                self._bucket_failures[index] += 1
+                self.failures += 1
+            if slow:
+                self._bucket_slow[index] += 1
+                self.slow_calls += 1
+
+            if calls >= config.minimum_calls and (
+                self.failures >= config.failure_rate_threshold * calls
+                or (config.slow_call_rate_threshold < 1.0
+                    and self.slow_calls >= config.slow_call_rate_threshold * calls)
+            ):
+                self.last_failure_time = now
+                self._set_state(State.OPEN)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            self._advance(int(self.clock() / self._bucket_width))
+            calls = self.calls
+            return {
+                "state": self.state.value,
+                "calls": calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "failure_rate": self.failures / calls if calls else 0.0,
+                "slow_call_rate": self.slow_calls / calls if calls else 0.0,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    # Breaker на каждый endpoint создаётся лениво при первом обращении.
+    # Все breaker'ы делят один конфиг и одного слушателя событий реестра.
+    def __init__(self, config: SlidingWindowConfig = None, clock: Callable[[], float] = time.monotonic):
+        self.config = config or SlidingWindowConfig()
+        self.clock = clock
+        self._breakers: Dict[str, SlidingWindowCircuitBreaker] = {}
+        self._listeners: List[StateListener] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._breakers)
+
+    def get(self, name: str) -> SlidingWindowCircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = SlidingWindowCircuitBreaker(name, self.config, self._emit, self.clock)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def call(self, name: str, func: Callable, *args, **kwargs):
+        return self.get(name).call(func, *args, **kwargs)
+
+    async def call_async(self, name: str, func: Callable, *args, **kwargs):
+        return await self.get(name).call_async(func, *args, **kwargs)
+
+    def subscribe(self, listener: StateListener):
+        self._listeners.append(listener)
+
+    def _emit(self, name: str, old: State, new: State):
+        for listener in self._listeners:
+            listener(name, old, new)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: breaker.metrics() for name, breaker in list(self._breakers.items())}
+
+
+# =============== Adaptive concurrency limit ===============
+class LimitExceededError(Exception):
+    pass
+
+
+class AIMDLimit:
+    # Аддитивный рост на единицу, пока лимит реально используется; мультипликативный спад при ошибке/таймауте
+    def __init__(self, backoff_ratio: float = 0.9, latency_threshold: float = None):
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        if dropped or (self.latency_threshold is not None and rtt > self.latency_threshold):
+            return limit * self.backoff_ratio
+        if in_flight * 2 >= limit:
+            return limit + 1
+        return limit
+
+
+class GradientLimit:
+    # Градиентный лимит в духе TCP Vegas / Netflix Gradient:
+    # сравниваем текущую латентность с латентностью без нагрузки (минимум за период).
+    # Ответы медленнее tolerance * минимум — значит растёт очередь, лимит сжимается пропорционально;
+    # иначе лимит растёт на queue_size(limit).
+    def __init__(self, smoothing: float = 0.2, tolerance: float = 2.0, probe_interval: int = 100,
+                 queue_size: Callable[[float], float] = math.sqrt):
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.probe_interval = probe_interval
+        self.queue_size = queue_size
+        self.rtt_noload = 0.0
+        self.updates = 0
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        self.updates += 1
+        # Минимум периодически сбрасывается, чтобы заметить, что сервис стал медленнее насовсем
+        if self.rtt_noload == 0.0 or rtt < self.rtt_noload or self.updates % self.probe_interval == 0:
+            self.rtt_noload = rtt
+        if dropped:
+            return limit / 2
+        if in_flight * 2 < limit:
+            return limit  # лимит не используется, сигнала о перегрузке нет
+        gradient = max(0.5, min(1.0, self.tolerance * self.rtt_noload / rtt))
+        new_limit = limit * gradient + self.queue_size(limit)
+        return limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+
+class AdaptiveConcurrencyLimiter:
+    # Ограничивает число одновременных вызовов зависимости и подбирает лимит по латентности.
+    # Сверх лимита вызов сразу отклоняется (LimitExceededError), а не встаёт в очередь.
+    # Замеры копятся в окне (не короче window_time и не меньше window_samples вызовов),
+    # лимит пересчитывается раз в окно по средней латентности — так он не раскачивается от шума.
+    def __init__(self, strategy=None, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 1000,
+                 window_time: float = 0.05, window_samples: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.strategy = strategy or GradientLimit()
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window_time = window_time
+        self.window_samples = window_samples
+        self.clock = clock
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._window_count = 0
+        self._window_rtt = 0.0
+        self._window_in_flight = 0
+        self._window_dropped = False
+
+    def _acquire(self) -> float:
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                raise LimitExceededError(f"Concurrency limit {int(self.limit)} reached")
+            self.in_flight += 1
+            self.accepted += 1
+        return self.clock()
+
+    def _release(self, started: float, dropped: bool = None):
+        # dropped=None: вызов отменён снаружи, замер в расчёт лимита не идёт
+        now = self.clock()
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if dropped is None:
+                return
+            if dropped:
+                self.dropped += 1
+                self._window_dropped = True
+            self._window_count += 1
+            self._window_rtt += now - started
+            self._window_in_flight = max(self._window_in_flight, in_flight)
+            if self._window_count < self.window_samples or now - self._window_start < self.window_time:
+                return
+            limit = self.strategy.update(self.limit, self._window_rtt / self._window_count,
+                                         self._window_in_flight, self._window_dropped)
+            self.limit = min(self.max_limit, max(self.min_limit, limit))
+            self._window_start = now
+            self._window_count = 0
+            self._window_rtt = 0.0
+            self._window_in_flight = 0
+            self._window_dropped = False
+
+    def call(self, func: Callable, *args, **kwargs):
+        started = self._acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._release(started, True)
+            raise
+        except BaseException:
+            self._release(started)
+            raise
+        self._release(started, False)
+        return result
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        started = self._acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self._release(started, True)
+            raise
+        except BaseException:
+            self._release(started)
+            raise
+        self._release(started, False)
+        return result
+
+    def __call__(self, func: Callable):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def metrics(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
 
 
 # Использование
@@ -60,12 +509,13 @@ def unreliable_service():
     return "Success"
 
 
-breaker = CircuitBreaker(failure_threshold=3, timeout=10)
+if __name__ == "__main__":
+    breaker = CircuitBreaker(failure_threshold=3, timeout=10)
 
-for i in range(10):
-    try:
-        result = breaker.call(unreliable_service)
-        print(f"Attempt {i}: {result}")
-    except Exception as e:
-        print(f"Attempt {i}: {e}")
-    time.sleep(1)
+    for i in range(10):
+        try:
+            result = breaker.call(unreliable_service)
+            print(f"Attempt {i}: {result}")
+        except Exception as e:
+            print(f"Attempt {i}: {e}")
+        time.sleep(1)
@@ -0,0 +1,118 @@
+import asyncio
+import importlib.util
+import pathlib
+import sys
+
+import pytest
+
+
+# main.py загружается по пути: в каждом каталоге репозитория свой модуль main
+_spec = importlib.util.spec_from_file_location("circuit_breaker_main", pathlib.Path(__file__).with_name("main.py"))
+cb = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = cb
+_spec.loader.exec_module(cb)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_breaker(clock: FakeClock) -> "cb.CircuitBreaker":
+    breaker = cb.CircuitBreaker(failure_threshold=1, timeout=10, clock=clock)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: (_ for _ in ()).throw(ValueError("down")))
+    assert breaker.state is cb.State.OPEN
+    clock.now = 11
+    return breaker
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.call_async(asyncio.sleep, 1), timeout=0.01)
+        assert breaker.state is cb.State.HALF_OPEN
+        assert breaker._half_open_calls == 0
+        # следующий пробный вызов проходит и закрывает цепь
+        await breaker.call_async(asyncio.sleep, 0)
+
+    asyncio.run(scenario())
+    assert breaker.state is cb.State.CLOSED
+
+
+def test_interrupted_sync_probe_releases_half_open_slot():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker._half_open_calls == 0
+    assert breaker.call(lambda: 42) == 42
+    assert breaker.state is cb.State.CLOSED
+
+
+def test_sliding_window_cancelled_probe_releases_half_open_slot():
+    clock = FakeClock()
+    config = cb.SlidingWindowConfig(minimum_calls=1, timeout=10)
+    breaker = cb.SlidingWindowCircuitBreaker("svc", config, clock=clock)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: (_ for _ in ()).throw(ValueError("down")))
+    assert breaker.state is cb.State.OPEN
+    clock.now = 11
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.call_async(asyncio.sleep, 1), timeout=0.01)
+        assert breaker._half_open_calls == 0
+        await breaker.call_async(asyncio.sleep, 0)
+
+    asyncio.run(scenario())
+    assert breaker.state is cb.State.CLOSED
+
+
+def test_slow_call_threshold_one_disables_slow_call_check():
+    clock = FakeClock()
+    config = cb.SlidingWindowConfig(minimum_calls=5, slow_call_duration=1.0)
+    breaker = cb.SlidingWindowCircuitBreaker("svc", config, clock=clock)
+
+    def slow():
+        clock.now += 2
+
+    for _ in range(10):
+        breaker.call(slow)
+    assert breaker.metrics()["slow_call_rate"] == 1.0
+    assert breaker.state is cb.State.CLOSED
+
+
+def slow_probe_breaker(threshold: float):
+    clock = FakeClock()
+    config = cb.SlidingWindowConfig(minimum_calls=1, timeout=10, slow_call_duration=1.0,
+                                    slow_call_rate_threshold=threshold)
+    breaker = cb.SlidingWindowCircuitBreaker("svc", config, clock=clock)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: (_ for _ in ()).throw(ValueError("down")))
+    clock.now = 11
+
+    def slow_success():
+        clock.now += 1.5
+        return "ok"
+
+    assert breaker.call(slow_success) == "ok"
+    return breaker
+
+
+def test_slow_successful_probe_closes_when_slow_calls_are_ignored():
+    assert slow_probe_breaker(1.0).state is cb.State.CLOSED
+
+
+def test_slow_successful_probe_reopens_when_slow_calls_count():
+    assert slow_probe_breaker(0.5).state is cb.State.OPEN
@@ -0,0 +1,102 @@
+import random
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from main import (CommandHandler, CreateTaskCommand, ListTasksQuery, Task, TaskReadStore, TaskWriteModel,
+                  UpdateTaskCommand)
+
+
+# Латентность запросов и память: проекция с индексами против прежнего подхода,
+# где каждый запрос начинался с list(write_model.tasks.values()) и дальше фильтровал/сортировал копию.
+# Запуск: python cqrs/benchmark.py [число задач]
+
+
+WORDS = [f"word{i:04d}" for i in range(1000)]
+REPEATS = 20
+
+
+def legacy_page_by_id(write_model: TaskWriteModel, after_id: int, limit: int) -> List[Task]:
+    tasks = list(write_model.tasks.values())
+    return [task for task in tasks if task.id > after_id][:limit]
+
+
+def legacy_prefix(write_model: TaskWriteModel, prefix: str, limit: int) -> List[Task]:
+    tasks = list(write_model.tasks.values())
+    matched = [task for task in tasks if task.title.casefold().startswith(prefix)]
+    matched.sort(key=lambda task: (task.title.casefold(), task.id))
+    return matched[:limit]
+
+
+def legacy_latest(write_model: TaskWriteModel, limit: int) -> List[Task]:
+    tasks = list(write_model.tasks.values())
+    return sorted(tasks, key=lambda task: (task.updated_at, task.id), reverse=True)[:limit]
+
+
+def timed(func, repeats: int = REPEATS) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats
+
+
+def allocated(func):
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rnd = random.Random(42)
+    commands = [CreateTaskCommand(f"{rnd.choice(WORDS)} task {i}", "") for i in range(count)]
+
+    def fill(with_store: bool):
+        write_model = TaskWriteModel()
+        store = TaskReadStore() if with_store else None
+        handler = CommandHandler(write_model, store)
+        for command in commands:
+            handler.handle(command)
+        for task_id in rnd.sample(range(1, count + 1), count // 10):
+            handler.handle(UpdateTaskCommand(task_id, title=f"{rnd.choice(WORDS)} renamed {task_id}"))
+        return write_model, store
+
+    started = time.perf_counter()
+    (write_model, _), write_only = allocated(lambda: fill(False))
+    legacy_fill = time.perf_counter() - started
+    del write_model
+    started = time.perf_counter()
+    (write_model, store), with_store = allocated(lambda: fill(True))
+    indexed_fill = time.perf_counter() - started
+
+    print(f"{count} tasks, {count // 10} updates")
+    print(f"fill (under tracemalloc): legacy {legacy_fill:6.1f} s, indexed {indexed_fill:6.1f} s")
+    print(f"memory: legacy {write_only / 2**20:6.0f} MiB, indexed {with_store / 2**20:6.0f} MiB "
+          f"(read store {(with_store - write_only) / count:.0f} bytes/task)")
+    _, copy_size = allocated(lambda: list(write_model.tasks.values()))
+    print(f"legacy query copies {copy_size / 2**20:.1f} MiB per call")
+
+    middle = count // 2
+    middle_cursor = store.list(ListTasksQuery(limit=middle)).next_cursor
+    prefix = WORDS[7]
+    cases = [
+        ("page by id", lambda: legacy_page_by_id(write_model, middle, 50),
+         lambda: store.list(ListTasksQuery(limit=50, cursor=middle_cursor))),
+        ("title prefix", lambda: legacy_prefix(write_model, prefix, 50),
+         lambda: store.list(ListTasksQuery(limit=50, title_prefix=prefix))),
+        ("latest updated", lambda: legacy_latest(write_model, 50),
+         lambda: store.list(ListTasksQuery(limit=50, order_by="updated_at", descending=True))),
+    ]
+    for label, legacy, indexed in cases:
+        assert [t.id for t in legacy()] == [t.id for t in indexed().items]
+        legacy_time = timed(legacy, 3)
+        indexed_time = timed(indexed, 1000)
+        print(f"{label:>14}: legacy {legacy_time * 1000:9.1f} ms, indexed {indexed_time * 1e6:7.1f} us "
+              f"(x{legacy_time / indexed_time:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sys
+import time
+from dataclasses import make_dataclass
+
+from main import (CommandHandler, CreateTaskCommand, MessageBus, TaskReadStore, TaskWriteModel, TimingMiddleware,
+                  ValidationMiddleware)
+
+
+# Стоимость маршрутизации: цепочка isinstance (как было в CommandHandler.handle) против MessageBus,
+# для сообщений из начала, середины и конца цепочки и для подкласса зарегистрированного типа.
+# Плюс handle_many против поштучного handle при массовом создании задач.
+# Запуск: python cqrs/benchmark_dispatch.py [число типов]
+
+
+CALLS = 200_000
+
+
+def make_types(count: int) -> list:
+    return [make_dataclass(f"Command{i}", [("value", int)]) for i in range(count)]
+
+
+def make_isinstance_chain(types: list):
+    # Эквивалент длинной цепочки if/elif isinstance(...)
+    handlers = [(message_type, lambda message: message.value) for message_type in types]
+
+    def handle(message):
+        for message_type, handler in handlers:
+            if isinstance(message, message_type):
+                return handler(message)
+        raise ValueError(f"Unknown command: {type(message)}")
+    return handle
+
+
+def timed(handle, message) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        handle(message)
+    return (time.perf_counter() - started) / CALLS
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    types = make_types(count)
+    chain = make_isinstance_chain(types)
+    bus = MessageBus("command")
+    for message_type in types:
+        bus.register(message_type, lambda message: message.value)
+    with_middleware = MessageBus("command", [ValidationMiddleware(), TimingMiddleware()])
+    for message_type in types:
+        with_middleware.register(message_type, lambda message: message.value)
+
+    subclass = type("SubCommand", (types[-1],), {})
+    samples = [("first", types[0](1)), ("middle", types[count // 2](1)), ("last", types[-1](1)),
+               ("subclass", subclass(1))]
+    print(f"{count} message types, ns per dispatch")
+    print(f"{'':>10} {'isinstance':>10} {'bus':>10} {'bus+mw':>10}")
+    for label, message in samples:
+        print(f"{label:>10} {timed(chain, message) * 1e9:10.0f} {timed(bus.dispatch, message) * 1e9:10.0f} "
+              f"{timed(with_middleware.dispatch, message) * 1e9:10.0f}")
+
+    commands = [CreateTaskCommand(f"task {i}", "") for i in range(CALLS)]
+    for label in ("handle", "handle_many"):
+        handler = CommandHandler(TaskWriteModel(), TaskReadStore())
+        started = time.perf_counter()
+        if label == "handle":
+            for command in commands:
+                handler.handle(command)
+        else:
+            handler.handle_many(commands)
+        elapsed = time.perf_counter() - started
+        print(f"{label:>11}: {CALLS / elapsed:9,.0f} commands/s with read store projection")
+
+
+if __name__ == "__main__":
+    main()
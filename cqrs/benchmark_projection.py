@@ -0,0 +1,83 @@
+import random
+import sys
+import time
+from typing import List
+
+from main import (CommandHandler, CreateTaskCommand, ProjectionPipeline, TaskReadStore, TaskWriteModel,
+                  UpdateTaskCommand)
+
+
+# Синхронная проекция против ProjectionPipeline с разными размерами пачки.
+# Для каждого режима: латентность команды на пути записи (p50/p99), время до полного применения проекции,
+# пропускная способность проектора, средний размер пачки и максимальное отставание.
+# Половина команд — обновления «горячих» задач, их изменения схлопываются внутри пачки.
+# Запуск: python cqrs/benchmark_projection.py [число команд]
+
+
+def make_commands(count: int) -> list:
+    rnd = random.Random(3)
+    commands = []
+    created = 0
+    for i in range(count):
+        if created and i % 2:
+            task_id = rnd.randint(max(1, created - 100), created)  # свежие задачи правят чаще
+            commands.append(UpdateTaskCommand(task_id, title=f"task {task_id} rev {i}"))
+        else:
+            created += 1
+            commands.append(CreateTaskCommand(f"task {created}", ""))
+    return commands
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return sorted(samples)[int(len(samples) * q)]
+
+
+def run(label: str, commands: list, batch_size: int = None, linger: float = 0.005):
+    store = TaskReadStore()
+    pipeline = ProjectionPipeline(store, batch_size, linger) if batch_size else None
+    handler = CommandHandler(TaskWriteModel(), store, pipeline)
+    latencies = []
+    started = time.perf_counter()
+    for command in commands:
+        issued = time.perf_counter()
+        handler.handle(command)
+        latencies.append(time.perf_counter() - issued)
+    written = time.perf_counter() - started
+    line = f"{label:>12}: write p50 {percentile(latencies, 0.5) * 1e6:6.1f} us  p99 {percentile(latencies, 0.99) * 1e6:7.1f} us"
+    if pipeline is not None:
+        pipeline.close()
+        total = time.perf_counter() - started
+        metrics = pipeline.metrics()
+        line += (f"  writes {written:5.2f} s  projected {total:5.2f} s ({len(commands) / total:8,.0f}/s)"
+                 f"  avg batch {metrics['avg_batch']:6.1f}  max lag {metrics['max_lag'] * 1000:7.1f} ms")
+    else:
+        line += f"  writes {written:5.2f} s  projected {written:5.2f} s ({len(commands) / written:8,.0f}/s)"
+    print(line)
+
+
+def read_your_writes(samples: int = 1000):
+    store = TaskReadStore()
+    with ProjectionPipeline(store, batch_size=500, linger=0.001) as pipeline:
+        handler = CommandHandler(TaskWriteModel(), store, pipeline)
+        waits = []
+        for i in range(samples):
+            handler.handle(CreateTaskCommand(f"task {i}", ""))
+            issued = time.perf_counter()
+            store.wait_for(handler.last_token(), timeout=1)
+            waits.append(time.perf_counter() - issued)
+    print(f"read-your-writes wait (linger 1 ms): p50 {percentile(waits, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(waits, 0.99) * 1000:.2f} ms")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    commands = make_commands(count)
+    print(f"{count} commands")
+    run("sync", commands)
+    for batch_size in (1, 100, 1000):
+        run(f"batch {batch_size}", commands, batch_size)
+    read_your_writes()
+
+
+if __name__ == "__main__":
+    main()
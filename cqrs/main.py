@@ -5,9 +5,24 @@
 # Четкое разделение команд и запросов.
 # Подходит для систем с высокой нагрузкой на чтение/запись.
 # Можно использовать с Event Sourcing.
+# Read-сторона — отдельная проекция с вторичными индексами и курсорной пагинацией.
+# Проекцию можно обновлять асинхронно: команды публикуют изменения в ограниченную очередь,
+# фоновый проектор применяет их пачками, а токен позиции даёт «чтение своих записей».
+# Команды и запросы маршрутизируются через MessageBus: обработчик регистрируется на тип сообщения.
 
-from typing import List, Dict
-from dataclasses import dataclass
+import base64
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from dataclasses import dataclass, replace
+
+
+logger = logging.getLogger(__name__)
 
 
 # =============== Commands ===============
@@ -35,90 +50,656 @@ class GetAllTasksQuery:
     pass
 
 
+@dataclass
+class ListTasksQuery:
+    limit: int = 50
+    cursor: Optional[str] = None  # next_cursor предыдущей страницы
+    title_prefix: Optional[str] = None  # с префиксом сортировка по названию
+    order_by: str = "id"  # "id" или "updated_at"
+    descending: bool = False
+
+
 # =============== Models ===============
 @dataclass
 class Task:
     id: int
     title: str
     description: str
+    updated_at: float = 0.0
+
+
+@dataclass(frozen=True)
+class TaskView:
+    # Неизменяемое представление для чтения: отдаётся наружу без копирования
+    __slots__ = ("id", "title", "description", "updated_at")
+    id: int
+    title: str
+    description: str
+    updated_at: float
+
+
+@dataclass
+class Page:
+    items: List[TaskView]
+    next_cursor: Optional[str]
 
 
 # =============== Write Model (для команд) ===============
 class TaskWriteModel:
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.time):
         self.tasks: Dict[int, Task] = {}
         self._next_id = 1
+        self.clock = clock
+        self._undo: Optional[list] = None
+
+    @contextmanager
+    def transaction(self):
+        # Команды внутри применяются целиком или откатываются; вложенная транзакция — часть внешней
+        if self._undo is not None:
+            yield
+            return
+        self._undo = []
+        next_id = self._next_id
+        try:
+            yield
+        except BaseException:
+            for task_id, previous in reversed(self._undo):
+                if previous is None:
+                    del self.tasks[task_id]
+                else:
+                    self.tasks[task_id] = previous
+            self._next_id = next_id
+            raise
+        finally:
+            self._undo = None
 
     def create_task(self, command: CreateTaskCommand) -> int:
         task_id = self._next_id
-        self.tasks[task_id] = Task(id=task_id, title=command.title, description=command.description)
+        self.tasks[task_id] = Task(id=task_id, title=command.title, description=command.description,
+                                   updated_at=self.clock())
         self._next_id += 1
+        if self._undo is not None:
+            self._undo.append((task_id, None))
         return task_id
 
     def update_task(self, command: UpdateTaskCommand):
         task = self.tasks.get(command.task_id)
         if not task:
             raise ValueError(f"Task with id {command.task_id} not found")
+        if self._undo is not None:
+            self._undo.append((task.id, replace(task)))
         if command.title is not None:
             task.title = command.title
         if command.description is not None:
             task.description = command.description
+        task.updated_at = self.clock()
+
+
+# =============== Read Store (проекция) ===============
+class SortedIndex:
+    # Отсортированный список, разбитый на короткие корзины (как SortedList из sortedcontainers):
+    # вставка и удаление — бинарный поиск + сдвиг внутри корзины, а не всего списка.
+    def __init__(self, load: int = 1000):
+        self.load = load
+        self._buckets: List[list] = []
+        self._maxes: List[Any] = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            return
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._buckets[pos].append(key)
+            self._maxes[pos] = key
+        else:
+            insort(self._buckets[pos], key)
+        if len(self._buckets[pos]) > 2 * self.load:
+            bucket = self._buckets[pos]
+            self._buckets[pos:pos + 1] = [bucket[:self.load], bucket[self.load:]]
+            self._maxes[pos:pos + 1] = [bucket[self.load - 1], bucket[-1]]
+
+    def remove(self, key):
+        pos = bisect_left(self._maxes, key)
+        bucket = self._buckets[pos] if pos < len(self._buckets) else None
+        index = bisect_left(bucket, key) if bucket else 0
+        if not bucket or index == len(bucket) or bucket[index] != key:
+            raise KeyError(key)
+        del bucket[index]
+        self._len -= 1
+        if not bucket:
+            del self._buckets[pos]
+            del self._maxes[pos]
+        elif index == len(bucket):
+            self._maxes[pos] = bucket[-1]
+
+    def irange(self, start=None, reverse: bool = False) -> Iterator:
+        # Ключи строго после start (или строго до него при reverse); без start — с края
+        if not reverse:
+            pos = 0 if start is None else bisect_right(self._maxes, start)
+            if pos == len(self._buckets):
+                return
+            index = 0 if start is None else bisect_right(self._buckets[pos], start)
+            for bucket in self._buckets[pos:pos + 1]:
+                yield from bucket[index:]
+            for bucket in self._buckets[pos + 1:]:
+                yield from bucket
+        else:
+            pos = len(self._buckets) - 1 if start is None else bisect_left(self._maxes, start)
+            pos = min(pos, len(self._buckets) - 1)
+            for p in range(pos, -1, -1):
+                bucket = self._buckets[p]
+                index = len(bucket) if start is None or p != pos else bisect_left(bucket, start)
+                for i in range(index - 1, -1, -1):
+                    yield bucket[i]
+
+
+def encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return tuple(key) if isinstance(key, list) else key
+
+
+def to_view(task: Task) -> TaskView:
+    return TaskView(task.id, task.title, task.description, task.updated_at)
+
+
+class TaskReadStore:
+    # Отдельное хранилище read-стороны, CommandHandler обновляет его после каждой команды.
+    # Индексы: по id, по (updated_at, id) и по (название в нижнем регистре, id).
+    # position — позиция последнего применённого изменения из ProjectionPipeline;
+    # failure — ошибка, на которой проекция остановилась (дальше position не продвинется).
+    def __init__(self):
+        self.by_id: Dict[int, TaskView] = {}
+        self.ids = SortedIndex()
+        self.by_updated = SortedIndex()
+        self.by_title = SortedIndex()
+        self.position = 0
+        self.failure: Optional[BaseException] = None
+        self._changed = threading.Condition()
+
+    def apply(self, task: Task):
+        with self._changed:
+            self._apply_view(to_view(task))
+
+    def apply_batch(self, views: List[TaskView], position: int = None):
+        # Несколько изменений одной задачи в пачке схлопываются в последнее
+        latest = {view.id: view for view in views}
+        with self._changed:
+            for view in latest.values():
+                self._apply_view(view)
+            if position is not None:
+                self.position = position
+            self._changed.notify_all()
+
+    def wait_for(self, position: Optional[int], timeout: float = None) -> bool:
+        # Ждёт, пока проекция догонит позицию записи (read-your-writes).
+        # Если проекция остановилась раньше этой позиции, бросает RuntimeError.
+        if not position or self.position >= position:
+            return True
+        with self._changed:
+            reached = self._changed.wait_for(lambda: self.position >= position or self.failure is not None, timeout)
+            if self.position >= position:
+                return True
+            if self.failure is not None:
+                raise RuntimeError(f"Projection stopped at position {self.position}") from self.failure
+            return reached
+
+    def fail(self, error: BaseException):
+        with self._changed:
+            self.failure = error
+            self._changed.notify_all()
+
+    def _apply_view(self, view: TaskView):
+        # Ключи считаются до изменений: ошибка в данных не оставит индексы обновлёнными наполовину
+        updated_key = (view.updated_at, view.id)
+        title_key = (view.title.casefold(), view.id)
+        old = self.by_id.get(view.id)
+        if old is None:
+            self.ids.add(view.id)
+        else:
+            self.by_updated.remove((old.updated_at, old.id))
+            self.by_title.remove((old.title.casefold(), old.id))
+        self.by_updated.add(updated_key)
+        self.by_title.add(title_key)
+        self.by_id[view.id] = view
+
+    def get(self, task_id: int) -> Optional[TaskView]:
+        return self.by_id.get(task_id)
+
+    def list(self, query: ListTasksQuery) -> Page:
+        if query.limit < 1:
+            raise ValueError(f"limit must be >= 1, got {query.limit}")
+        start = decode_cursor(query.cursor) if query.cursor else None
+        if query.title_prefix is not None:
+            prefix = query.title_prefix.casefold()
+            if start is None:
+                # (prefix,) меньше любого (prefix..., id), а prefix + U+10FFFF — больше
+                start = (prefix + "\U0010ffff",) if query.descending else (prefix,)
+            keys = self._prefixed(self.by_title.irange(start, query.descending), prefix)
+        elif query.order_by == "updated_at":
+            keys = self.by_updated.irange(start, query.descending)
+        elif query.order_by == "id":
+            keys = self.ids.irange(start, query.descending)
+        else:
+            raise ValueError(f"Unknown order_by: {query.order_by}")
+
+        items = []
+        last_key = None
+        with self._changed:
+            for key in keys:
+                items.append(self.by_id[key if isinstance(key, int) else key[1]])
+                last_key = key
+                if len(items) == query.limit:
+                    break
+        next_cursor = encode_cursor(last_key) if len(items) == query.limit else None
+        return Page(items, next_cursor)
+
+    @staticmethod
+    def _prefixed(keys: Iterator, prefix: str) -> Iterator:
+        for key in keys:
+            if not key[0].startswith(prefix):
+                return  # вышли за диапазон префикса
+            yield key
 
 
 # =============== Read Model (для запросов) ===============
 class TaskReadModel:
-    def __init__(self, write_model: TaskWriteModel):
-        self.write_model = write_model
+    def __init__(self, store: TaskReadStore):
+        self.store = store
+
+    def get_task(self, query: GetTaskQuery) -> TaskView:
+        return self.store.get(query.task_id)
+
+    def get_all_tasks(self, query: GetAllTasksQuery) -> List[TaskView]:
+        return list(self.store.by_id.values())
+
+    def list_tasks(self, query: ListTasksQuery) -> Page:
+        return self.store.list(query)
+
+
+# =============== Projection pipeline ===============
+@dataclass(frozen=True)
+class TaskChanged:
+    position: int
+    view: TaskView
+    emitted_at: float
+
+
+_STOP = object()
+
+
+class ProjectionPipeline:
+    # Асинхронная проекция: команды кладут изменения в ограниченную очередь (при переполнении
+    # запись ждёт — backpressure), фоновый поток забирает до batch_size изменений,
+    # ожидая добора не дольше linger секунд, и применяет пачку к read store под одной блокировкой.
+    # Если пачка не применилась, изменения повторяются по одному; изменение, которое не применяется
+    # и поштучно, останавливает проекцию: position не уходит дальше него, wait_for бросает RuntimeError,
+    # publish — тоже. Так read-your-writes никогда не подтверждает запись, которой нет в read store.
+    def __init__(self, store: TaskReadStore, batch_size: int = 500, linger: float = 0.005,
+                 max_queue: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.batch_size = batch_size
+        self.linger = linger
+        self.clock = clock
+        self.queue: "queue.Queue" = queue.Queue(max_queue)
+        self.published = 0
+        self.applied = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._started_at = clock()
+        self._publish_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="projection", daemon=True)
+        self._thread.start()
+
+    def publish(self, view: TaskView) -> int:
+        # Возвращает токен позиции; позиции выдаются и попадают в очередь строго по порядку
+        if self.store.failure is not None:
+            raise RuntimeError("Projection is stopped") from self.store.failure
+        with self._publish_lock:
+            self.published += 1
+            self.queue.put(TaskChanged(self.published, view, self.clock()))
+            return self.published
+
+    def _next_batch(self) -> Optional[List[TaskChanged]]:
+        first = self.queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = self.clock() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                self.queue.put(_STOP)  # завершимся после применения текущей пачки
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.store.apply_batch([change.view for change in batch], batch[-1].position)
+            except Exception:
+                self.errors += 1
+                logger.exception("projection batch up to position %d failed, retrying one by one", batch[-1].position)
+                if not self._apply_one_by_one(batch):
+                    return
+            lag = self.clock() - batch[0].emitted_at
+            self.applied += len(batch)
+            self.batches += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def _apply_one_by_one(self, batch: List[TaskChanged]) -> bool:
+        for change in batch:
+            try:
+                self.store.apply_batch([change.view], change.position)
+            except Exception as error:
+                self.errors += 1
+                logger.exception("projection stopped at position %d", change.position)
+                self.store.fail(error)
+                self._discard_queue()
+                return False
+        return True
+
+    def _discard_queue(self):
+        # Освобождаем издателей, ждущих места в очереди: их токены wait_for всё равно отклонит
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self, timeout: float = None):
+        # Дожидается применения всего, что уже опубликовано
+        if self.store.failure is None and self._thread.is_alive():
+            self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def metrics(self) -> dict:
+        elapsed = self.clock() - self._started_at
+        return {
+            "published": self.published,
+            "applied": self.applied,
+            "lag_events": self.published - self.applied,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "batches": self.batches,
+            "avg_batch": self.applied / self.batches if self.batches else 0.0,
+            "throughput": self.applied / elapsed if elapsed > 0 else 0.0,
+            "errors": self.errors,
+            "failed": self.store.failure is not None,
+        }
+
+
+# =============== Message bus ===============
+Middleware = Callable[[Any, Callable[[Any], Any]], Any]  # (message, call_next) -> result
+
+
+def resolve_by_type(table: Dict[type, Any], cache: Dict[type, Any], message_type: type):
+    # Точное совпадение или ближайший предок по MRO; результат кэшируется для подкласса
+    try:
+        return cache[message_type]
+    except KeyError:
+        pass
+    for klass in message_type.__mro__:
+        if klass in table:
+            cache[message_type] = table[klass]
+            return table[klass]
+    cache[message_type] = None
+    return None
+
+
+class MessageBus:
+    # Маршрутизация по типу сообщения: dict-поиск вместо цепочки isinstance.
+    # Цепочка middleware собирается один раз на тип и кэшируется вместе с обработчиком.
+    def __init__(self, kind: str = "message", middleware: List[Middleware] = None):
+        self.kind = kind
+        self._handlers: Dict[type, Callable] = {}
+        self._middleware: List[Middleware] = list(middleware or [])
+        self._chains: Dict[type, Callable] = {}
+        self._resolved: Dict[type, Optional[Callable]] = {}
+
+    def register(self, message_type: type, handler: Callable = None):
+        # Можно использовать как декоратор: @bus.register(MyCommand)
+        if handler is None:
+            return lambda func: self.register(message_type, func) or func
+        self._handlers[message_type] = handler
+        self._chains.clear()
+        self._resolved.clear()
+
+    def use(self, middleware: Middleware):
+        self._middleware.append(middleware)
+        self._chains.clear()
+
+    def resolve(self, message_type: type) -> Callable:
+        chain = self._chains.get(message_type)
+        if chain is None:
+            handler = resolve_by_type(self._handlers, self._resolved, message_type)
+            if handler is None:
+                raise ValueError(f"Unknown {self.kind}: {message_type}")
+            chain = handler
+            for middleware in reversed(self._middleware):
+                chain = self._link(middleware, chain)
+            self._chains[message_type] = chain
+        return chain
+
+    @staticmethod
+    def _link(middleware: Middleware, call_next: Callable) -> Callable:
+        return lambda message: middleware(message, call_next)
+
+    def dispatch(self, message):
+        chain = self._chains.get(type(message))
+        if chain is None:
+            chain = self.resolve(type(message))
+        return chain(message)
+
+
+class TimingMiddleware:
+    # Число вызовов, суммарное и максимальное время обработки по типу сообщения
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.stats: Dict[str, List[float]] = {}
+
+    def __call__(self, message, call_next):
+        started = self.clock()
+        try:
+            return call_next(message)
+        finally:
+            elapsed = self.clock() - started
+            stats = self.stats.get(type(message).__name__)
+            if stats is None:
+                stats = self.stats[type(message).__name__] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: {"count": count, "avg": total / count, "max": worst}
+                for name, (count, total, worst) in self.stats.items()}
+
+
+class ValidationMiddleware:
+    # Валидаторы регистрируются на тип, как обработчики; валидатор бросает ValueError
+    def __init__(self):
+        self._validators: Dict[type, Callable[[Any], None]] = {}
+        self._resolved: Dict[type, Optional[Callable]] = {}
 
-    def get_task(self, query: GetTaskQuery) -> Task:
-        return self.write_model.tasks.get(query.task_id)
+    def register(self, message_type: type, validator: Callable[[Any], None]):
+        self._validators[message_type] = validator
+        self._resolved.clear()
 
-    def get_all_tasks(self, query: GetAllTasksQuery) -> List[Task]:
-        return list(self.write_model.tasks.values())
+    def __call__(self, message, call_next):
+        validator = resolve_by_type(self._validators, self._resolved, type(message))
+        if validator is not None:
+            validator(message)
+        return call_next(message)
 
 
 # =============== Handlers ===============
 class CommandHandler:
-    def __init__(self, write_model: TaskWriteModel):
+    # С pipeline проекция обновляется асинхронно, токен последней записи потока — last_token().
+    # Команды разных потоков выполняются по одной под _write_lock: у write-модели один журнал отката,
+    # и пачка одного потока не должна попасть в транзакцию другого.
+    def __init__(self, write_model: TaskWriteModel, read_store: TaskReadStore = None,
+                 pipeline: ProjectionPipeline = None, bus: MessageBus = None):
         self.write_model = write_model
+        self.read_store = read_store
+        self.pipeline = pipeline
+        self.bus = bus or MessageBus("command")
+        self.bus.register(CreateTaskCommand, self._create)
+        self.bus.register(UpdateTaskCommand, self._update)
+        self._local = threading.local()
+        self._write_lock = threading.RLock()  # RLock: обработчик может вызвать handle/handle_many
 
     def handle(self, command):
-        if isinstance(command, CreateTaskCommand):
-            return self.write_model.create_task(command)
-        elif isinstance(command, UpdateTaskCommand):
-            self.write_model.update_task(command)
-        else:
-            raise ValueError(f"Unknown command: {type(command)}")
+        with self._write_lock:
+            return self.bus.dispatch(command)
+
+    def handle_many(self, commands: List[Any]) -> List[Any]:
+        # Пачка команд в одной транзакции write-модели: ошибка любой откатывает все.
+        # Проекция обновляется один раз после фиксации, по разу на каждую затронутую задачу.
+        with self._write_lock:
+            if getattr(self._local, "pending", None) is not None:
+                return [self.bus.dispatch(command) for command in commands]  # вложенный вызов
+            self._local.pending = pending = {}
+            try:
+                with self.write_model.transaction():
+                    results = [self.bus.dispatch(command) for command in commands]
+            finally:
+                self._local.pending = None
+            tasks = [self.write_model.tasks[task_id] for task_id in pending]
+            if self.pipeline is not None:
+                for task in tasks:
+                    self._local.token = self.pipeline.publish(to_view(task))
+            elif self.read_store is not None:
+                self.read_store.apply_batch([to_view(task) for task in tasks])
+            return results
+
+    def _create(self, command: CreateTaskCommand) -> int:
+        task_id = self.write_model.create_task(command)
+        self._project(task_id)
+        return task_id
 
+    def _update(self, command: UpdateTaskCommand):
+        self.write_model.update_task(command)
+        self._project(command.task_id)
 
-class QueryHandler:
-    def __init__(self, read_model: TaskReadModel):
-        self.read_model = read_model
+    def _project(self, task_id: int):
+        # Инкрементальное обновление проекции: меняется только затронутая задача
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending[task_id] = None
+        elif self.pipeline is not None:
+            self._local.token = self.pipeline.publish(to_view(self.write_model.tasks[task_id]))
+        elif self.read_store is not None:
+            self.read_store.apply(self.write_model.tasks[task_id])
 
-    def handle(self, query):
-        if isinstance(query, GetTaskQuery):
-            return self.read_model.get_task(query)
-        elif isinstance(query, GetAllTasksQuery):
-            return self.read_model.get_all_tasks(query)
-        else:
-            raise ValueError(f"Unknown query: {type(query)}")
+    def last_token(self) -> Optional[int]:
+        return getattr(self._local, "token", None)
 
 
-# =============== Использование ===============
-write_model = TaskWriteModel()
-read_model = TaskReadModel(write_model)
-
-command_handler = CommandHandler(write_model)
-query_handler = QueryHandler(read_model)
+class QueryHandler:
+    def __init__(self, read_model: TaskReadModel, bus: MessageBus = None):
+        self.read_model = read_model
+        self.bus = bus or MessageBus("query")
+        self.bus.register(GetTaskQuery, read_model.get_task)
+        self.bus.register(GetAllTasksQuery, read_model.get_all_tasks)
+        self.bus.register(ListTasksQuery, read_model.list_tasks)
 
-# Создаём задачу
-task_id = command_handler.handle(CreateTaskCommand("Купить молоко", "С утра"))
-print(f"Created task with id: {task_id}")
+    def handle(self, query, token: int = None, timeout: float = None):
+        # token — позиция из CommandHandler.last_token(): запрос увидит эту запись
+        if token is not None and not self.read_model.store.wait_for(token, timeout):
+            raise TimeoutError(f"Projection has not reached position {token}")
+        return self.bus.dispatch(query)
 
-# Читаем задачу
-task = query_handler.handle(GetTaskQuery(task_id))
-print(f"Task: {task}")
 
-# Читаем все задачи
-all_tasks = query_handler.handle(GetAllTasksQuery())
-print(f"All tasks: {all_tasks}")
+# =============== Использование ===============
+if __name__ == "__main__":
+    write_model = TaskWriteModel()
+    read_store = TaskReadStore()
+    read_model = TaskReadModel(read_store)
+
+    command_handler = CommandHandler(write_model, read_store)
+    query_handler = QueryHandler(read_model)
+
+    # Создаём задачу
+    task_id = command_handler.handle(CreateTaskCommand("Купить молоко", "С утра"))
+    print(f"Created task with id: {task_id}")
+    command_handler.handle(CreateTaskCommand("Купить хлеб", "Вечером"))
+    command_handler.handle(CreateTaskCommand("Позвонить маме", ""))
+
+    # Читаем задачу
+    task = query_handler.handle(GetTaskQuery(task_id))
+    print(f"Task: {task}")
+
+    # Читаем все задачи
+    all_tasks = query_handler.handle(GetAllTasksQuery())
+    print(f"All tasks: {all_tasks}")
+
+    # Постранично и по префиксу названия
+    page = query_handler.handle(ListTasksQuery(limit=1, title_prefix="купить"))
+    print(f"Page: {page.items}")
+    page = query_handler.handle(ListTasksQuery(limit=1, title_prefix="купить", cursor=page.next_cursor))
+    print(f"Next page: {page.items}")
+
+    # Пачка команд одной транзакцией, с замером времени и валидацией
+    timing = TimingMiddleware()
+    validation = ValidationMiddleware()
+
+    def require_title(command: CreateTaskCommand):
+        if not command.title:
+            raise ValueError("Empty title")
+
+    validation.register(CreateTaskCommand, require_title)
+    command_handler.bus.use(validation)
+    command_handler.bus.use(timing)
+    ids = command_handler.handle_many([
+        CreateTaskCommand("Помыть посуду", ""),
+        UpdateTaskCommand(task_id, title="Купить кефир"),
+    ])
+    print(f"Batch: {ids}, timings: {timing.metrics()}")
+    try:
+        command_handler.handle_many([CreateTaskCommand("Вынести мусор", ""), CreateTaskCommand("", "")])
+    except ValueError as e:
+        print(f"Rolled back: {e}, tasks: {len(write_model.tasks)}")
+
+    # Асинхронная проекция с чтением своих записей
+    async_store = TaskReadStore()
+    with ProjectionPipeline(async_store) as pipeline:
+        async_handler = CommandHandler(TaskWriteModel(), pipeline=pipeline)
+        async_queries = QueryHandler(TaskReadModel(async_store))
+        task_id = async_handler.handle(CreateTaskCommand("Купить молоко", "С утра"))
+        task = async_queries.handle(GetTaskQuery(task_id), token=async_handler.last_token(), timeout=1)
+        print(f"Read your write: {task}")
+        print(f"Projection: {pipeline.metrics()}")
@@ -0,0 +1,94 @@
+import importlib.util
+import pathlib
+import sys
+import threading
+import time
+
+import pytest
+
+
+# main.py загружается по пути: в каждом каталоге репозитория свой модуль main
+_spec = importlib.util.spec_from_file_location("cqrs_main", pathlib.Path(__file__).with_name("main.py"))
+cqrs = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = cqrs
+_spec.loader.exec_module(cqrs)
+
+
+def make_store(count: int) -> "cqrs.TaskReadStore":
+    store = cqrs.TaskReadStore()
+    for task_id in range(1, count + 1):
+        store.apply(cqrs.Task(task_id, f"task {task_id}", "", updated_at=float(task_id)))
+    return store
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_list_rejects_non_positive_limit(limit):
+    store = make_store(10)
+    with pytest.raises(ValueError):
+        store.list(cqrs.ListTasksQuery(limit=limit))
+
+
+def test_list_pages_with_cursor():
+    store = make_store(5)
+    first = store.list(cqrs.ListTasksQuery(limit=2))
+    second = store.list(cqrs.ListTasksQuery(limit=2, cursor=first.next_cursor))
+    assert [view.id for view in first.items + second.items] == [1, 2, 3, 4]
+
+
+class FailAfterSignal:
+    pass
+
+
+def test_concurrent_handle_many_does_not_share_transaction():
+    write_model = cqrs.TaskWriteModel()
+    store = cqrs.TaskReadStore()
+    handler = cqrs.CommandHandler(write_model, store)
+    inside, release = threading.Event(), threading.Event()
+
+    def fail_after_signal(command):
+        inside.set()
+        release.wait(1)
+        raise RuntimeError("batch A fails")
+
+    handler.bus.register(FailAfterSignal, fail_after_signal)
+    errors = []
+
+    def batch_a():
+        try:
+            handler.handle_many([cqrs.CreateTaskCommand("a", ""), FailAfterSignal()])
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread_a = threading.Thread(target=batch_a)
+    thread_a.start()
+    assert inside.wait(1)
+    thread_b = threading.Thread(target=lambda: handler.handle_many([cqrs.CreateTaskCommand("b", "")]))
+    thread_b.start()
+    time.sleep(0.05)  # B успевает упереться в транзакцию A
+    release.set()
+    thread_a.join(2)
+    thread_b.join(2)
+
+    assert len(errors) == 1
+    assert {task.title for task in write_model.tasks.values()} == {"b"}
+    assert {task_id: store.get(task_id).title for task_id in write_model.tasks} == \
+        {task_id: task.title for task_id, task in write_model.tasks.items()}
+    assert len(store.by_id) == len(write_model.tasks)
+
+
+def test_projection_stops_instead_of_confirming_a_failed_write():
+    store = cqrs.TaskReadStore()
+    pipeline = cqrs.ProjectionPipeline(store, linger=0.05)
+    good = pipeline.publish(cqrs.TaskView(1, "ok", "", 1.0))
+    poisoned = pipeline.publish(cqrs.TaskView(2, None, "", 2.0))  # title=None: casefold падает
+    after = pipeline.publish(cqrs.TaskView(3, "later", "", 3.0))
+
+    assert store.wait_for(good, timeout=1)
+    with pytest.raises(RuntimeError):
+        store.wait_for(after, timeout=1)
+    assert store.position == good < poisoned
+    assert set(store.by_id) == {1}
+    with pytest.raises(RuntimeError):
+        pipeline.publish(cqrs.TaskView(4, "x", "", 4.0))
+    pipeline.close(timeout=1)
+    assert pipeline.metrics()["failed"]
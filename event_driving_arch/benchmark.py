@@ -0,0 +1,107 @@
+import asyncio
+import sys
+import time
+from typing import List
+
+from main import BLOCK, DROP, SPILL, AsyncioDispatcher, EventManager, SyncDispatcher, ThreadPoolDispatcher
+
+
+# Латентность издателя при смеси быстрых и медленных слушателей в разных режимах доставки.
+# Слушатели: три быстрых, один медленный (SLOW секунд на событие) и один, который всегда падает.
+# Издатель публикует EVENTS событий подряд; очередь слушателя — QUEUE_SIZE событий.
+# Запуск: python event_driving_arch/benchmark.py [число событий]
+
+
+SLOW = 0.001
+QUEUE_SIZE = 100
+
+
+def fast(data):
+    data["seen"] = True
+
+
+def slow(data):
+    time.sleep(SLOW)
+
+
+def failing(data):
+    raise ValueError("broken listener")
+
+
+async def slow_async(data):
+    await asyncio.sleep(SLOW)
+
+
+def subscribe(events: EventManager, slow_listener):
+    for listener in (fast, lambda data: None, lambda data: len(data), slow_listener, failing):
+        events.subscribe("order_placed", listener)
+
+
+def report(label: str, latencies: List[float], published: float, drained: float, metrics: dict):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    slow_metrics = next((m for name, m in metrics.items() if name.startswith("slow")), {})
+    print(f"{label:>14}: publish p50 {p50:8.1f} us  p99 {p99:8.1f} us  total {published:6.2f} s  "
+          f"drained {drained:6.2f} s  slow listener: delivered {slow_metrics.get('delivered', '-'):>5} "
+          f"dropped {slow_metrics.get('dropped', '-'):>5} spilled {slow_metrics.get('spilled', '-'):>5}")
+
+
+def run_sync(count: int):
+    events = EventManager(SyncDispatcher())
+    subscribe(events, slow)
+    events.unsubscribe("order_placed", failing)  # в синхронном режиме исключение прервало бы публикацию
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        issued = time.perf_counter()
+        events.publish("order_placed", {"id": i})
+        latencies.append(time.perf_counter() - issued)
+    published = time.perf_counter() - started
+    report("sync", latencies, published, published, {})
+
+
+def run_threads(count: int, policy: str):
+    dispatcher = ThreadPoolDispatcher(workers=4, queue_size=QUEUE_SIZE, policy=policy)
+    events = EventManager(dispatcher)
+    subscribe(events, slow)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        issued = time.perf_counter()
+        events.publish("order_placed", {"id": i})
+        latencies.append(time.perf_counter() - issued)
+    published = time.perf_counter() - started
+    dispatcher.close()
+    report(f"threads/{policy}", latencies, published, time.perf_counter() - started, events.metrics())
+
+
+async def run_asyncio(count: int, policy: str):
+    dispatcher = AsyncioDispatcher(queue_size=QUEUE_SIZE, policy=policy)
+    events = EventManager(dispatcher)
+    subscribe(events, slow_async)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        issued = time.perf_counter()
+        await events.publish_async("order_placed", {"id": i})
+        latencies.append(time.perf_counter() - issued)
+        await asyncio.sleep(0)  # издатель — обычная корутина, отдаёт управление между событиями
+    published = time.perf_counter() - started
+    await dispatcher.join()
+    dispatcher.close()
+    report(f"asyncio/{policy}", latencies, published, time.perf_counter() - started, events.metrics())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{count} events, slow listener {SLOW * 1000:.0f} ms, queue {QUEUE_SIZE}")
+    run_sync(count)
+    for policy in (BLOCK, DROP, SPILL):
+        run_threads(count, policy)
+    for policy in (BLOCK, DROP, SPILL):
+        asyncio.run(run_asyncio(count, policy))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import random
+import re
+import sys
+import time
+
+from main import EventManager
+
+
+# Стоимость публикации при 10k подписок: перебор всех шаблонов (как без индекса) против
+# дерева тем без кэша и с кэшем, плюс publish_many против поштучного publish. При ~50 слушателях
+# на тему время уходит на вызовы слушателей, поэтому у SyncDispatcher пачка стоит столько же, сколько publish.
+# Темы вида svcA.entityB.action; 90% подписок точные, остальные — "svcA.entityB.*" и "svcA.#".
+# Запуск: python event_driving_arch/benchmark_topics.py [число подписок]
+
+
+SERVICES = 10
+ACTIONS = ("created", "updated", "deleted", "archived", "restored", "viewed", "shared", "locked", "moved", "tagged")
+
+
+def make_listener():
+    # У каждой подписки свой слушатель: один и тот же слушатель получил бы событие лишь раз
+    def listener(data):
+        pass
+    return listener
+
+
+def pattern_regex(pattern: str):
+    parts = []
+    for segment in pattern.split("."):
+        parts.append({"*": r"[^.]+", "#": r".*"}.get(segment, re.escape(segment)))
+    return re.compile(r"\.".join(parts).replace(r"\..*", r"(\..*)?") + "$")
+
+
+def make_subscriptions(count: int, rnd: random.Random) -> list:
+    entities = max(1, count // (SERVICES * len(ACTIONS)))
+    patterns = []
+    for i in range(count):
+        service, entity = rnd.randrange(SERVICES), rnd.randrange(entities)
+        if i % 10 == 0:
+            patterns.append(f"svc{service}.#" if i % 20 == 0 else f"svc{service}.entity{entity}.*")
+        else:
+            patterns.append(f"svc{service}.entity{entity}.{rnd.choice(ACTIONS)}")
+    return patterns, entities
+
+
+def per_call(func, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) / len(items)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rnd = random.Random(5)
+    patterns, entities = make_subscriptions(count, rnd)
+    events = EventManager()
+    listeners = [make_listener() for _ in patterns]
+    for pattern, listener in zip(patterns, listeners):
+        events.subscribe(pattern, listener)
+    scan = [(pattern_regex(pattern), listener) for pattern, listener in zip(patterns, listeners)]
+    topics = [f"svc{rnd.randrange(SERVICES)}.entity{rnd.randrange(entities)}.{rnd.choice(ACTIONS)}"
+              for _ in range(5000)]
+    index = events._topics
+
+    def publish_scan(topic):
+        for regex, callback in scan:
+            if regex.match(topic):
+                callback({})
+
+    def publish_uncached(topic):
+        for callback in index.resolve(topic):
+            callback({})
+
+    for topic in topics[:200]:
+        assert len(index.resolve(topic)) == sum(1 for regex, _ in scan if regex.match(topic))
+
+    print(f"{count:,} subscriptions, {len(set(patterns)):,} distinct patterns")
+    print(f"{'scan all patterns':>22}: {per_call(publish_scan, topics[:200]) * 1e6:9.1f} us/publish")
+    print(f"{'trie, no cache':>22}: {per_call(publish_uncached, topics) * 1e6:9.1f} us/publish")
+    events.publish_many((topic, {}) for topic in topics)  # прогрев кэша
+    print(f"{'trie, cached':>22}: {per_call(lambda topic: events.publish(topic, {}), topics) * 1e6:9.1f} us/publish")
+    started = time.perf_counter()
+    events.publish_many((topic, {}) for topic in topics)
+    print(f"{'publish_many':>22}: {(time.perf_counter() - started) / len(topics) * 1e6:9.1f} us/event")
+    matched = sum(len(index.match(topic)) for topic in topics) / len(topics)
+    print(f"average listeners per topic: {matched:.1f}")
+
+
+if __name__ == "__main__":
+    main()
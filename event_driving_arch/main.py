@@ -1,4 +1,13 @@
-from typing import Callable, List
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import inspect
+import pickle
+import tempfile
+import threading
+import time
 
 
 # Понимание Event-Driven Architecture.
@@ -8,25 +17,548 @@ from typing import Callable, List
 # Слабая связанность между компонентами.
 # Подходит для систем с высокой модульностью.
 # Используется паттерн Observer.
+# Доставка вынесена в Dispatcher: синхронно (как раньше), через пул потоков или в asyncio.
+# В асинхронных режимах у каждого слушателя своя ограниченная очередь с политикой переполнения,
+# ошибки слушателя не мешают остальным, а задержки и глубина очереди видны в metrics().
+# Темы иерархические через точку: подписка на "user.*" (ровно один сегмент) или "order.#" (ноль и более).
 
+BLOCK = "block"  # издатель ждёт места в очереди
+DROP = "drop"  # событие для этого слушателя отбрасывается
+SPILL = "spill"  # излишек уходит во временный файл и доставляется позже по порядку
+
+ErrorHandler = Callable[[Callable, str, dict, Exception], None]
+
+
+class SpillFile:
+    # Очередь переполнения на диске: события пишутся pickle'ом в конец, читаются с начала
+    def __init__(self):
+        self._file = None
+        self._read = 0
+        self._write = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, item):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(self._write)
+        pickle.dump(item, self._file, pickle.HIGHEST_PROTOCOL)
+        self._write = self._file.tell()
+        self.size += 1
+
+    def popleft(self):
+        self._file.seek(self._read)
+        item = pickle.load(self._file)
+        self._read = self._file.tell()
+        self.size -= 1
+        if not self.size:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read = self._write = 0
+        return item
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ListenerChannel:
+    # Очередь одного слушателя и его метрики. Элемент — (event_type, data, время постановки).
+    # Пока в spill есть события, новые тоже идут туда, чтобы не нарушить порядок.
+    def __init__(self, callback: Callable, capacity: int, policy: str, on_error: Optional[ErrorHandler]):
+        self.callback = callback
+        self.capacity = capacity
+        self.policy = policy
+        self.on_error = on_error
+        self.queue: deque = deque()
+        self.spill = SpillFile() if policy == SPILL else None
+        self.lock = threading.Condition()
+        self.scheduled = False  # обработка очереди запущена
+        self.blocked = 0  # издатели, ждущие места (BLOCK)
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.busy_time = 0.0
+        self.max_latency = 0.0
+        self.wait_time = 0.0
+        self.max_depth = 0
+
+    def depth(self) -> int:
+        return len(self.queue) + (len(self.spill) if self.spill is not None else 0)
+
+    def has_room(self) -> bool:
+        return len(self.queue) < self.capacity and not (self.spill is not None and len(self.spill))
+
+    def put(self, item) -> bool:
+        if self.has_room():
+            self.queue.append(item)
+        elif self.policy == SPILL:
+            self.spill.append(item)
+            self.spilled += 1
+        else:
+            self.dropped += 1
+            return False
+        depth = self.depth()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def take(self):
+        if not self.queue and self.spill is not None:
+            while len(self.spill) and len(self.queue) < self.capacity:
+                self.queue.append(self.spill.popleft())
+        return self.queue.popleft() if self.queue else None
+
+    def _record(self, enqueued: float, started: float, error: Optional[Exception], event_type: str, data: dict):
+        elapsed = time.perf_counter() - started
+        self.delivered += 1
+        self.busy_time += elapsed
+        self.wait_time += started - enqueued
+        if elapsed > self.max_latency:
+            self.max_latency = elapsed
+        if error is not None:
+            self.errors += 1
+            self.last_error = repr(error)
+            if self.on_error is not None:
+                try:
+                    self.on_error(self.callback, event_type, data, error)
+                except Exception as handler_error:  # сломанный обработчик ошибок не должен останавливать ящик
+                    self.last_error = f"{error!r}; on_error failed: {handler_error!r}"
+
+    def run(self, item):
+        event_type, data, enqueued = item
+        started = time.perf_counter()
+        error = None
+        try:
+            self.callback(data)
+        except Exception as e:
+            error = e
+        self._record(enqueued, started, error, event_type, data)
+
+    async def run_async(self, item):
+        event_type, data, enqueued = item
+        started = time.perf_counter()
+        error = None
+        try:
+            result = self.callback(data)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            error = e
+        self._record(enqueued, started, error, event_type, data)
+
+    def metrics(self) -> dict:
+        delivered = self.delivered
+        return {
+            "delivered": delivered,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "avg_latency": self.busy_time / delivered if delivered else 0.0,
+            "max_latency": self.max_latency,
+            "avg_wait": self.wait_time / delivered if delivered else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+def listener_name(callback: Callable) -> str:
+    return getattr(callback, "__qualname__", repr(callback))
+
+
+def listener_key(callback: Callable) -> str:
+    # Ключ метрик: у двух lambda или одного метода разных объектов __qualname__ совпадает
+    return f"{listener_name(callback)}@{id(callback):x}"
+
+
+class Dispatcher(ABC):
+    @abstractmethod
+    def dispatch(self, callbacks: List[Callable], event_type: str, data: dict):
+        pass
+
+    async def dispatch_async(self, callbacks: List[Callable], event_type: str, data: dict):
+        self.dispatch(callbacks, event_type, data)
+
+    def dispatch_many(self, batch: Iterable[Tuple[Sequence[Callable], str, dict]]):
+        for callbacks, event_type, data in batch:
+            self.dispatch(callbacks, event_type, data)
+
+    async def dispatch_many_async(self, batch: Iterable[Tuple[Sequence[Callable], str, dict]]):
+        for callbacks, event_type, data in batch:
+            await self.dispatch_async(callbacks, event_type, data)
+
+    def metrics(self) -> Dict[str, dict]:
+        return {}
+
+    def close(self):
+        pass
+
+
+class SyncDispatcher(Dispatcher):
+    # Прежнее поведение: слушатели по очереди в потоке издателя, исключение прерывает доставку
+    def dispatch(self, callbacks: List[Callable], event_type: str, data: dict):
+        for callback in callbacks:
+            callback(data)
+
+    def dispatch_many(self, batch: Iterable[Tuple[Sequence[Callable], str, dict]]):
+        for callbacks, _, data in batch:
+            for callback in callbacks:
+                callback(data)
+
+
+class ThreadPoolDispatcher(Dispatcher):
+    # Каждый слушатель — почтовый ящик с очередью не длиннее queue_size. Ящик обрабатывается пулом
+    # потоков не более чем одной задачей за раз (порядок для слушателя сохраняется), за один заход —
+    # до batch событий, после чего задача уступает пул другим слушателям.
+    # BLOCK из слушателя, который публикует в собственную полную очередь, приведёт к взаимоблокировке.
+    def __init__(self, workers: int = 8, queue_size: int = 1000, policy: str = BLOCK,
+                 on_error: ErrorHandler = None, batch: int = 64):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.on_error = on_error
+        self.batch = batch
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="listener")
+        self._channels: Dict[Callable, ListenerChannel] = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, callback: Callable) -> ListenerChannel:
+        channel = self._channels.get(callback)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.get(callback)
+                if channel is None:
+                    channel = ListenerChannel(callback, self.queue_size, self.policy, self.on_error)
+                    self._channels[callback] = channel
+        return channel
+
+    def dispatch(self, callbacks: List[Callable], event_type: str, data: dict):
+        item = (event_type, data, time.perf_counter())
+        for callback in callbacks:
+            channel = self._channel(callback)
+            with channel.lock:
+                if channel.policy == BLOCK:
+                    channel.blocked += 1
+                    while len(channel.queue) >= channel.capacity:
+                        channel.lock.wait()
+                    channel.blocked -= 1
+                if not channel.put(item) or channel.scheduled:
+                    continue
+                channel.scheduled = True
+            self._executor.submit(self._drain, channel)
+
+    def dispatch_many(self, batch: Iterable[Tuple[Sequence[Callable], str, dict]]):
+        # Пачка раскладывается по слушателям: блокировка ящика берётся один раз на слушателя
+        now = time.perf_counter()
+        per_channel: Dict[ListenerChannel, list] = {}
+        for callbacks, event_type, data in batch:
+            item = (event_type, data, now)
+            for callback in callbacks:
+                channel = self._channel(callback)
+                items = per_channel.get(channel)
+                if items is None:
+                    items = per_channel[channel] = []
+                items.append(item)
+        for channel, items in per_channel.items():
+            with channel.lock:
+                for item in items:
+                    if channel.policy == BLOCK:
+                        channel.blocked += 1
+                        while len(channel.queue) >= channel.capacity:
+                            channel.lock.wait()
+                        channel.blocked -= 1
+                    if channel.put(item) and not channel.scheduled:
+                        channel.scheduled = True
+                        self._executor.submit(self._drain, channel)
+
+    def _drain(self, channel: ListenerChannel):
+        try:
+            for _ in range(self.batch):
+                with channel.lock:
+                    item = channel.take()
+                    if item is None:
+                        channel.scheduled = False
+                        channel.lock.notify_all()
+                        return
+                    if channel.blocked:
+                        channel.lock.notify_all()
+                channel.run(item)
+        except BaseException:
+            # Слушатель бросил BaseException: ящик не должен остаться помеченным как занятый навсегда
+            with channel.lock:
+                channel.scheduled = channel.depth() > 0
+                channel.lock.notify_all()
+            if channel.scheduled:
+                self._executor.submit(self._drain, channel)
+            raise
+        self._executor.submit(self._drain, channel)
+
+    def join(self):
+        # Дождаться доставки всего, что уже опубликовано
+        for channel in list(self._channels.values()):
+            with channel.lock:
+                while channel.scheduled:
+                    channel.lock.wait()
+
+    def close(self):
+        self.join()
+        self._executor.shutdown()
+        for channel in self._channels.values():
+            if channel.spill is not None:
+                channel.spill.close()
+
+    def metrics(self) -> Dict[str, dict]:
+        return {listener_key(callback): channel.metrics() for callback, channel in list(self._channels.items())}
+
+
+class AsyncioDispatcher(Dispatcher):
+    # На каждого слушателя — очередь и задача-потребитель в текущем event loop: корутины разных
+    # слушателей выполняются конкурентно, у одного слушателя — по порядку. Синхронные слушатели
+    # вызываются прямо в loop. Ждать места (BLOCK) умеет только publish_async; синхронный publish
+    # при полной очереди с BLOCK бросает RuntimeError.
+    def __init__(self, queue_size: int = 1000, policy: str = BLOCK, on_error: ErrorHandler = None):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.on_error = on_error
+        self._channels: Dict[Callable, ListenerChannel] = {}
+        self._tasks: Dict[ListenerChannel, asyncio.Task] = {}
+        self._ready: Dict[ListenerChannel, asyncio.Event] = {}
+        self._space: Dict[ListenerChannel, asyncio.Event] = {}
+        self._idle: Dict[ListenerChannel, asyncio.Event] = {}
+        self._closed = False
+
+    def _channel(self, callback: Callable) -> ListenerChannel:
+        channel = self._channels.get(callback)
+        if channel is None:
+            channel = self._channels[callback] = ListenerChannel(callback, self.queue_size, self.policy, self.on_error)
+            self._ready[channel] = asyncio.Event()
+            self._space[channel] = asyncio.Event()
+            self._idle[channel] = asyncio.Event()
+            self._idle[channel].set()
+        return channel
+
+    def _ensure_consumer(self, channel: ListenerChannel):
+        # Потребитель запускается при первом событии и заново, если прежний умер от BaseException слушателя
+        if channel not in self._tasks and not self._closed:
+            self._tasks[channel] = asyncio.get_running_loop().create_task(self._consume(channel))
+
+    def _put(self, channel: ListenerChannel, item):
+        if channel.put(item):
+            self._idle[channel].clear()
+            self._ready[channel].set()
+            self._ensure_consumer(channel)
+
+    def dispatch(self, callbacks: List[Callable], event_type: str, data: dict):
+        item = (event_type, data, time.perf_counter())
+        for callback in callbacks:
+            channel = self._channel(callback)
+            if channel.policy == BLOCK and len(channel.queue) >= channel.capacity:
+                raise RuntimeError(f"Queue of {listener_name(callback)} is full, use publish_async to wait")
+            self._put(channel, item)
+
+    async def dispatch_async(self, callbacks: List[Callable], event_type: str, data: dict):
+        item = (event_type, data, time.perf_counter())
+        for callback in callbacks:
+            channel = self._channel(callback)
+            while channel.policy == BLOCK and len(channel.queue) >= channel.capacity:
+                space = self._space[channel]
+                space.clear()
+                self._ensure_consumer(channel)
+                await space.wait()
+            self._put(channel, item)
+
+    async def _consume(self, channel: ListenerChannel):
+        ready = self._ready[channel]
+        space = self._space[channel]
+        idle = self._idle[channel]
+        try:
+            while True:
+                item = channel.take()
+                if item is None:
+                    ready.clear()
+                    idle.set()
+                    await ready.wait()
+                    continue
+                space.set()
+                await channel.run_async(item)
+        finally:
+            # Остановлен close() или BaseException слушателя: снимаем пометку, чтобы join не завис,
+            # а следующая публикация или join запустили нового потребителя
+            if self._tasks.get(channel) is asyncio.current_task():
+                del self._tasks[channel]
+            idle.set()
+            space.set()
+
+    async def join(self):
+        if self._closed:
+            return
+        for channel, idle in list(self._idle.items()):
+            while channel.depth() or not idle.is_set():
+                if channel.depth():
+                    idle.clear()
+                    self._ensure_consumer(channel)
+                await idle.wait()
+                await asyncio.sleep(0)
+
+    def close(self):
+        self._closed = True
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for channel in self._channels.values():
+            if channel.spill is not None:
+                channel.spill.close()
+
+    def metrics(self) -> Dict[str, dict]:
+        return {listener_key(callback): channel.metrics() for callback, channel in self._channels.items()}
+
+
+class TopicNode:
+    __slots__ = ("children", "listeners")
 
-class EventManager:
     def __init__(self):
-        self._listeners: dict[str, List[Callable]] = {}
+        self.children: Dict[str, "TopicNode"] = {}
+        self.listeners: Dict[Callable, int] = {}  # слушатель -> число подписок, порядок — порядок подписки
+
+
+class TopicIndex:
+    # Префиксное дерево по сегментам темы; "*" и "#" — обычные ключи в children.
+    # Поиск идёт по сегментам публикуемой темы, а не по всем подпискам; результат кэшируется на тему.
+    # Подписка без шаблонов сбрасывает кэш только своей темы, с шаблоном — весь кэш.
+    def __init__(self, cache_size: int = 100_000):
+        self.root = TopicNode()
+        self.cache_size = cache_size
+        self._cache: Dict[str, Tuple[Callable, ...]] = {}
+
+    @staticmethod
+    def _is_pattern(pattern: str) -> bool:
+        return "*" in pattern or "#" in pattern
+
+    def _invalidate(self, pattern: str):
+        if self._is_pattern(pattern):
+            self._cache.clear()
+        else:
+            self._cache.pop(pattern, None)
+
+    def add(self, pattern: str, callback: Callable):
+        node = self.root
+        for segment in pattern.split("."):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = TopicNode()
+            node = child
+        node.listeners[callback] = node.listeners.get(callback, 0) + 1
+        self._invalidate(pattern)
+
+    def remove(self, pattern: str, callback: Callable) -> bool:
+        # False, если такой подписки нет
+        path = [self.root]
+        segments = pattern.split(".")
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return False
+            path.append(node)
+        node = path[-1]
+        count = node.listeners.get(callback)
+        if count is None:
+            return False
+        if count > 1:
+            node.listeners[callback] = count - 1
+        else:
+            del node.listeners[callback]
+        # Убираем опустевшие узлы, чтобы дерево не росло от временных подписок
+        for depth in range(len(segments), 0, -1):
+            node = path[depth]
+            if node.listeners or node.children:
+                break
+            del path[depth - 1].children[segments[depth - 1]]
+        self._invalidate(pattern)
+        return True
+
+    def resolve(self, topic: str) -> Tuple[Callable, ...]:
+        # Поиск без кэша. Слушатель получает событие один раз, сколько бы его шаблонов ни совпало
+        # ("#.#", "a.*" вместе с "a.#" и т.п.); повторная подписка на один и тот же шаблон, как и прежде,
+        # даёт повторный вызов — берётся наибольшее число подписок среди совпавших узлов.
+        found: Dict[int, TopicNode] = {}
+        self._collect(self.root, topic.split("."), 0, found)
+        if len(found) == 1:  # частый случай: совпал один узел, повторов быть не может
+            node, = found.values()
+            return tuple(callback for callback, count in node.listeners.items() for _ in range(count))
+        counts: Dict[Callable, int] = {}
+        for node in found.values():
+            for callback, count in node.listeners.items():
+                if count > counts.get(callback, 0):
+                    counts[callback] = count
+        callbacks: List[Callable] = []
+        for callback, count in counts.items():
+            callbacks.extend((callback,) * count)
+        return tuple(callbacks)
+
+    def match(self, topic: str) -> Tuple[Callable, ...]:
+        callbacks = self._cache.get(topic)
+        if callbacks is None:
+            callbacks = self.resolve(topic)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[topic] = callbacks
+        return callbacks
+
+    def _collect(self, node: TopicNode, segments: List[str], index: int, found: Dict[int, TopicNode]):
+        children = node.children
+        multi = children.get("#")
+        if multi is not None:
+            # "#" поглощает от нуля до всех оставшихся сегментов
+            for rest in range(index, len(segments) + 1):
+                self._collect(multi, segments, rest, found)
+        if index == len(segments):
+            if node.listeners:
+                found.setdefault(id(node), node)
+            return
+        child = children.get(segments[index])
+        if child is not None:
+            self._collect(child, segments, index + 1, found)
+        single = children.get("*")
+        if single is not None:
+            self._collect(single, segments, index + 1, found)
+
+
+class EventManager:
+    def __init__(self, dispatcher: Dispatcher = None):
+        self._topics = TopicIndex()
+        self.dispatcher = dispatcher or SyncDispatcher()
 
     def subscribe(self, event_type: str, callback: Callable):
-        if event_type not in self._listeners:
-            self._listeners[event_type] = []
-        self._listeners[event_type].append(callback)
+        self._topics.add(event_type, callback)
 
     def unsubscribe(self, event_type: str, callback: Callable):
-        if event_type in self._listeners:
-            self._listeners[event_type].remove(callback)
+        # Отписка от темы без подписок или слушателя, который на неё не подписан, ничего не делает
+        self._topics.remove(event_type, callback)
 
     def publish(self, event_type: str, data: dict):
-        if event_type in self._listeners:
-            for callback in self._listeners[event_type]:
-                callback(data)
+        callbacks = self._topics.match(event_type)
+        if callbacks:
+            self.dispatcher.dispatch(callbacks, event_type, data)
+
+    async def publish_async(self, event_type: str, data: dict):
+        callbacks = self._topics.match(event_type)
+        if callbacks:
+            await self.dispatcher.dispatch_async(callbacks, event_type, data)
+
+    def publish_many(self, events: Iterable[Tuple[str, dict]]):
+        # Пачка передаётся диспетчеру лениво, без промежуточного списка
+        match = self._topics.match
+        self.dispatcher.dispatch_many((match(event_type), event_type, data) for event_type, data in events)
+
+    async def publish_many_async(self, events: Iterable[Tuple[str, dict]]):
+        match = self._topics.match
+        await self.dispatcher.dispatch_many_async((match(event_type), event_type, data) for event_type, data in events)
+
+    def metrics(self) -> Dict[str, dict]:
+        return self.dispatcher.metrics()
 
 
 class UserService:
@@ -48,10 +580,46 @@ def log_user_registration(data):
 
 
 # Использование
-events = EventManager()
-events.subscribe("user_registered", send_welcome_email)
-events.subscribe("user_registered", log_user_registration)
+if __name__ == "__main__":
+    events = EventManager()
+    events.subscribe("user_registered", send_welcome_email)
+    events.subscribe("user_registered", log_user_registration)
+
+    service = UserService(events)
+    service.register_user("Alice")
+
+    # Медленная рассылка не задерживает регистрацию, а её падение — журналирование
+    def flaky_email(data):
+        time.sleep(0.1)
+        raise ConnectionError("SMTP is down")
+
+    dispatcher = ThreadPoolDispatcher(workers=4, queue_size=100, policy=DROP)
+    pooled = EventManager(dispatcher)
+    pooled.subscribe("user_registered", flaky_email)
+    pooled.subscribe("user_registered", log_user_registration)
+    started = time.perf_counter()
+    UserService(pooled).register_user("Bob")
+    print(f"register_user took {(time.perf_counter() - started) * 1000:.2f} ms")
+    dispatcher.close()
+    print(pooled.metrics())
+
+    # Шаблоны тем и пакетная публикация
+    events.subscribe("user.*", lambda data: print(f"user.*: {data}"))
+    events.subscribe("order.#", lambda data: print(f"order.#: {data}"))
+    events.publish_many([("user.created", {"id": 1}), ("order.paid.card", {"id": 2}), ("order", {"id": 3})])
+
+    # asyncio: корутины слушателей выполняются конкурентно
+    async def send_welcome_email_async(data):
+        await asyncio.sleep(0.05)
+        print(f"Sending welcome email to {data['name']} (async)")
 
+    async def demo():
+        async_dispatcher = AsyncioDispatcher(queue_size=10)
+        async_events = EventManager(async_dispatcher)
+        async_events.subscribe("user_registered", send_welcome_email_async)
+        async_events.subscribe("user_registered", log_user_registration)
+        await async_events.publish_async("user_registered", {"name": "Carol"})
+        await async_dispatcher.join()
+        async_dispatcher.close()
 
-service = UserService(events)
-service.register_user("Alice")
+    asyncio.run(demo())
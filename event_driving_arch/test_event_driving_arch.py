@@ -0,0 +1,40 @@
+import importlib.util
+import pathlib
+import sys
+
+
+# main.py загружается по пути: в каждом каталоге репозитория свой модуль main
+_spec = importlib.util.spec_from_file_location("event_driving_arch_main", pathlib.Path(__file__).with_name("main.py"))
+eda = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = eda
+_spec.loader.exec_module(eda)
+
+
+def test_overlapping_patterns_deliver_once_per_listener():
+    events = eda.EventManager()
+    calls = []
+    everything = lambda data: calls.append("everything")  # noqa: E731
+    order = lambda data: calls.append("order")  # noqa: E731
+    events.subscribe("#.#", everything)
+    events.subscribe("#", everything)
+    events.subscribe("order.*", order)
+    events.subscribe("order.#", order)
+    events.publish("order.created", {})
+    assert sorted(calls) == ["everything", "order"]
+
+
+def test_repeated_subscription_to_same_topic_still_repeats():
+    events = eda.EventManager()
+    calls = []
+    listener = lambda data: calls.append(data["n"])  # noqa: E731
+    events.subscribe("user_registered", listener)
+    events.subscribe("user_registered", listener)
+    events.publish("user_registered", {"n": 1})
+    assert calls == [1, 1]
+
+
+def test_unsubscribe_unknown_is_noop():
+    events = eda.EventManager()
+    events.unsubscribe("missing", print)
+    events.subscribe("known", len)
+    events.unsubscribe("known", print)
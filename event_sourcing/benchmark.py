@@ -0,0 +1,52 @@
+import sys
+import time
+
+from main import AccountCreatedEvent, BankAccount, BankAccountRepository, every_n_events
+
+
+# Время загрузки счёта в зависимости от длины истории: полный replay против «снимок + хвост».
+# Снимок делается каждые SNAPSHOT_EVERY событий (проверка при save раз в BATCH событий), хвост короче SNAPSHOT_EVERY.
+# Запуск: python event_sourcing/benchmark.py [максимальная длина истории]
+
+
+SNAPSHOT_EVERY = 1000
+BATCH = 500  # событий между вызовами save()
+
+
+def build(history: int, repository: BankAccountRepository) -> BankAccount:
+    account = BankAccount()
+    account.apply_event(AccountCreatedEvent("acc-1", 0.0))
+    for i in range(1, history):
+        account.deposit(1.0)
+        if i % BATCH == 0:
+            repository.save(account)
+    repository.save(account)
+    return account
+
+
+def timed(func, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{'events':>10} {'full replay':>14} {'snapshot+tail':>14}")
+    history = 1000
+    while history <= limit:
+        plain = BankAccountRepository(policy=lambda account, since: False)
+        snapshotted = BankAccountRepository(policy=every_n_events(SNAPSHOT_EVERY))
+        expected = build(history, plain).balance
+        build(history, snapshotted)
+        assert plain.load("acc-1").balance == snapshotted.load("acc-1").balance == expected
+        repeats = max(1, 100_000 // history)
+        full = timed(lambda: plain.load("acc-1"), repeats)
+        fast = timed(lambda: snapshotted.load("acc-1"), repeats * 10)
+        print(f"{history:>10,} {full * 1000:11.2f} ms {fast * 1000:11.3f} ms")
+        history *= 10
+
+
+if __name__ == "__main__":
+    main()
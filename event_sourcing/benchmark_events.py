@@ -0,0 +1,84 @@
+import sys
+import time
+import tracemalloc
+
+from main import AccountCreatedEvent, BankAccount, MoneyDepositedEvent, StoredEvent, default_upcasters
+
+
+# Байт на событие и скорость replay: прежние события с __dict__ и цепочкой isinstance
+# против событий со __slots__ и таблицы обработчиков; плюс replay журнала v1 через upcaster'ы.
+# Запуск: python event_sourcing/benchmark_events.py [число событий]
+
+
+class LegacyEvent:
+    pass
+
+
+class LegacyAccountCreatedEvent(LegacyEvent):
+    def __init__(self, account_id: str, initial_balance: float):
+        self.account_id = account_id
+        self.initial_balance = initial_balance
+
+
+class LegacyMoneyDepositedEvent(LegacyEvent):
+    def __init__(self, account_id: str, amount: float):
+        self.account_id = account_id
+        self.amount = amount
+
+
+class LegacyBankAccount:
+    def __init__(self):
+        self.account_id = None
+        self.balance = 0.0
+        self.events = []
+
+    def apply_event(self, event):
+        if isinstance(event, LegacyAccountCreatedEvent):
+            self.account_id = event.account_id
+            self.balance = event.initial_balance
+        elif isinstance(event, LegacyMoneyDepositedEvent):
+            self.balance += event.amount
+        self.events.append(event)
+
+    def replay(self, events):
+        self.balance = 0.0
+        for event in events:
+            self.apply_event(event)
+
+
+def build(count: int, created, deposited) -> tuple:
+    tracemalloc.start()
+    events = [created("acc-1", 0.0)] + [deposited("acc-1", float(i % 100)) for i in range(count - 1)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return events, size / count
+
+
+def replay_rate(account_factory, events) -> float:
+    account = account_factory()
+    started = time.perf_counter()
+    account.replay(events)
+    return len(events) / (time.perf_counter() - started)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    legacy, legacy_size = build(count, LegacyAccountCreatedEvent, LegacyMoneyDepositedEvent)
+    slotted, slotted_size = build(count, AccountCreatedEvent, MoneyDepositedEvent)
+    print(f"{count:,} events")
+    print(f"{'legacy':>18}: {legacy_size:5.0f} bytes/event, replay {replay_rate(LegacyBankAccount, legacy):10,.0f} events/s")
+    print(f"{'slotted':>18}: {slotted_size:5.0f} bytes/event, replay {replay_rate(BankAccount, slotted):10,.0f} events/s")
+    del legacy, slotted
+
+    journal = [StoredEvent("AccountCreatedEvent", 1, {"account_id": "acc-1", "initial_balance": 0.0})]
+    journal += [StoredEvent("MoneyDepositedEvent", 1, {"account_id": "acc-1", "amount": float(i % 100)})
+                for i in range(count - 1)]
+    upcasters = default_upcasters()
+    account = BankAccount()
+    started = time.perf_counter()
+    account.replay(upcasters.events(journal))
+    print(f"{'upcast v1 journal':>18}: replay {count / (time.perf_counter() - started):10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
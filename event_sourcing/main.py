@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 # Понимание, что состояние системы формируется из событий.
@@ -9,56 +10,291 @@ from typing import List
 # Полная история изменений сохраняется.
 # Состояние можно восстановить из событий.
 # Подходит для систем с аудитом, транзакциями, откатом состояния.
+# Снимки: агрегат загружается как «последний снимок + хвост событий после него»,
+# а не повтором всей истории.
+# События компактные (__slots__, без __dict__), обработчики выбираются по типу события из таблицы,
+# а сохранённые события старых версий поднимаются до текущей цепочкой upcaster'ов при чтении.
 
 
 class Event(ABC):
-    pass
+    __slots__ = ()
+    version: ClassVar[int] = 1  # версия схемы события
 
 
 class AccountCreatedEvent(Event):
+    __slots__ = ("account_id", "initial_balance")
+
     def __init__(self, account_id: str, initial_balance: float):
         self.account_id = account_id
         self.initial_balance = initial_balance
 
 
 class MoneyDepositedEvent(Event):
-    def __init__(self, account_id: str, amount: float):
+    # v1 не содержала валюту
+    __slots__ = ("account_id", "amount", "currency")
+    version = 2
+
+    def __init__(self, account_id: str, amount: float, currency: str = "RUB"):
         self.account_id = account_id
         self.amount = amount
+        self.currency = currency
 
 
 class BankAccount:
+    # Версия формата снимка: при изменении состояния агрегата увеличиваем, старые снимки игнорируются
+    SNAPSHOT_VERSION = 1
+
     def __init__(self):
         self.account_id = None
         self.balance = 0.0
-        self.events: List[Event] = []
-
-    def apply_event(self, event: Event):
-        if isinstance(event, AccountCreatedEvent):
-            self.account_id = event.account_id
-            self.balance = event.initial_balance
-        elif isinstance(event, MoneyDepositedEvent):
-            self.balance += event.amount
-        self.events.append(event)
-
-    def deposit(self, amount: float):
-        event = MoneyDepositedEvent(self.account_id, amount)
+        self.version = 0  # число применённых событий
+        self.events: List[Event] = []  # новые события, ещё не сохранённые в журнал
+
+    def _on_created(self, event: AccountCreatedEvent):
+        self.account_id = event.account_id
+        self.balance = event.initial_balance
+
+    def _on_deposited(self, event: MoneyDepositedEvent):
+        self.balance += event.amount
+
+    def _ignore(self, event: Event):
+        pass
+
+    # Тип события -> обработчик; подклассы и неизвестные типы дописываются при первой встрече
+    _handlers: Dict[type, Callable] = {AccountCreatedEvent: _on_created, MoneyDepositedEvent: _on_deposited}
+
+    @classmethod
+    def _resolve_handler(cls, event_type: type) -> Callable:
+        for klass in event_type.__mro__:
+            handler = cls._handlers.get(klass)
+            if handler is not None:
+                break
+        else:
+            handler = cls._ignore
+        cls._handlers[event_type] = handler
+        return handler
+
+    def apply_event(self, event: Event, record: bool = True):
+        handler = self._handlers.get(type(event)) or self._resolve_handler(type(event))
+        handler(self, event)
+        self.version += 1
+        if record:
+            self.events.append(event)
+
+    def deposit(self, amount: float, currency: str = "RUB"):
+        # Баланс одновалютный: пополнение в другой валюте отклоняется командой, до появления события.
+        # Уже сохранённые события — факты, replay их не проверяет.
+        if currency != "RUB":
+            raise ValueError(f"Unsupported deposit currency: {currency}")
+        event = MoneyDepositedEvent(self.account_id, amount, currency)
         self.apply_event(event)
 
     def replay(self, events: List[Event]):
+        # История уже сохранена, поэтому в self.events при восстановлении не копируется
         self.balance = 0.0
+        self.version = 0
+        self._apply_all(events)
+
+    def _apply_all(self, events: Iterable[Event]):
+        handlers = self._handlers
+        applied = 0
         for event in events:
-            self.apply_event(event)
+            handler = handlers.get(type(event)) or self._resolve_handler(type(event))
+            handler(self, event)
+            applied += 1
+        self.version += applied
+
+    def snapshot(self) -> "Snapshot":
+        return Snapshot(self.account_id, self.version, self.SNAPSHOT_VERSION,
+                        {"account_id": self.account_id, "balance": self.balance})
+
+    @classmethod
+    def from_snapshot(cls, snapshot: "Snapshot") -> "BankAccount":
+        account = cls()
+        account.account_id = snapshot.state["account_id"]
+        account.balance = snapshot.state["balance"]
+        account.version = snapshot.version
+        return account
+
+
+# =============== Snapshots ===============
+@dataclass(frozen=True)
+class Snapshot:
+    aggregate_id: str
+    version: int  # сколько событий истории уже учтено в state
+    schema_version: int
+    state: Dict[str, Any]
+
+
+class SnapshotStore:
+    # Последний снимок на агрегат; снимок другой версии формата при загрузке считается недействительным
+    def __init__(self):
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    def save(self, snapshot: Snapshot):
+        current = self._snapshots.get(snapshot.aggregate_id)
+        if current is None or current.version <= snapshot.version:
+            self._snapshots[snapshot.aggregate_id] = snapshot
+
+    def load(self, aggregate_id: str, schema_version: int) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(aggregate_id)
+        if snapshot is None or snapshot.schema_version != schema_version:
+            return None
+        return snapshot
+
+    def invalidate(self, aggregate_id: str = None):
+        if aggregate_id is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(aggregate_id, None)
+
+
+SnapshotPolicy = Callable[[BankAccount, int], bool]  # (агрегат, событий после снимка) -> снимать ли
+
+
+def every_n_events(n: int) -> SnapshotPolicy:
+    return lambda account, events_since_snapshot: events_since_snapshot >= n
+
+
+class BankAccountRepository:
+    # Журнал событий по счетам плюс снимки. save() дописывает новые события и по политике делает снимок,
+    # load() восстанавливает счёт из последнего снимка и событий после него.
+    def __init__(self, snapshots: SnapshotStore = None, policy: SnapshotPolicy = None):
+        self.streams: Dict[str, List[Event]] = {}
+        self.snapshots = snapshots or SnapshotStore()
+        self.policy = policy or every_n_events(1000)
+
+    def save(self, account: BankAccount):
+        stream = self.streams.setdefault(account.account_id, [])
+        stream.extend(account.events)
+        account.events.clear()
+        snapshot = self.snapshots.load(account.account_id, BankAccount.SNAPSHOT_VERSION)
+        since = account.version - (snapshot.version if snapshot else 0)
+        if self.policy(account, since):
+            self.snapshots.save(account.snapshot())
+
+    def load(self, account_id: str) -> BankAccount:
+        history = self.streams.get(account_id, [])
+        snapshot = self.snapshots.load(account_id, BankAccount.SNAPSHOT_VERSION)
+        if snapshot is None or snapshot.version > len(history):
+            account = BankAccount()
+            account.replay(history)
+            return account
+        account = BankAccount.from_snapshot(snapshot)
+        account._apply_all(history[snapshot.version:])
+        return account
+
+
+# =============== Stored events and upcasting ===============
+@dataclass(frozen=True)
+class StoredEvent:
+    # Сериализованная форма события в журнале; историю не переписываем, версия остаётся исходной
+    event_type: str
+    version: int
+    data: Dict[str, Any]
+
+
+EVENT_TYPES: Dict[str, type] = {cls.__name__: cls for cls in (AccountCreatedEvent, MoneyDepositedEvent)}
+
+
+_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _fields(event_type: type) -> Tuple[str, ...]:
+    # Поля события — __slots__ всех классов по MRO, включая унаследованные от базового события
+    fields = _FIELDS.get(event_type)
+    if fields is None:
+        fields = []
+        for klass in reversed(event_type.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name not in fields and name not in ("__dict__", "__weakref__"):
+                    fields.append(name)
+        fields = _FIELDS[event_type] = tuple(fields)
+    return fields
+
+
+def serialize(event: Event) -> StoredEvent:
+    return StoredEvent(type(event).__name__, event.version, {name: getattr(event, name) for name in _fields(type(event))})
+
+
+Upcaster = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class UpcasterChain:
+    # Upcaster переводит данные события из версии N в N+1. При чтении старое событие проходит
+    # цепочку до текущей версии класса; собранная цепочка кэшируется по (тип, версия).
+    def __init__(self, event_types: Dict[str, type] = None):
+        self.event_types = event_types or EVENT_TYPES
+        self._upcasters: Dict[Tuple[str, int], Upcaster] = {}
+        self._chains: Dict[Tuple[str, int], List[Upcaster]] = {}
+
+    def register(self, event_type: str, from_version: int, upcaster: Upcaster):
+        self._upcasters[(event_type, from_version)] = upcaster
+        self._chains.clear()
+
+    def _chain(self, event_type: str, version: int) -> List[Upcaster]:
+        key = (event_type, version)
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = []
+            target = self.event_types[event_type].version
+            while version < target:
+                upcaster = self._upcasters.get((event_type, version))
+                if upcaster is None:
+                    raise ValueError(f"No upcaster for {event_type} v{version}")
+                chain.append(upcaster)
+                version += 1
+            self._chains[key] = chain
+        return chain
+
+    def upcast(self, stored: StoredEvent) -> Event:
+        data = stored.data
+        for upcaster in self._chain(stored.event_type, stored.version):
+            data = upcaster(data)
+        return self.event_types[stored.event_type](**data)
+
+    def events(self, stored_events: Iterable[StoredEvent]) -> Iterator[Event]:
+        # Ленивое преобразование: события поднимаются по одному во время replay
+        return map(self.upcast, stored_events)
+
+
+def default_upcasters() -> UpcasterChain:
+    chain = UpcasterChain()
+    chain.register("MoneyDepositedEvent", 1, lambda data: {**data, "currency": "RUB"})
+    return chain
 
 
 # Использование
-account = BankAccount()
-account.apply_event(AccountCreatedEvent("123", 100.0))
-account.deposit(50.0)
-print(account.balance)  # 150.0
+if __name__ == "__main__":
+    account = BankAccount()
+    account.apply_event(AccountCreatedEvent("123", 100.0))
+    account.deposit(50.0)
+    print(account.balance)  # 150.0
+
+    # Восстановление состояния из событий
+    new_account = BankAccount()
+    new_account.replay(account.events)
+    print(new_account.balance)  # 150.0
+
+    # Снимок каждые 2 события: загрузка — снимок плюс хвост
+    repository = BankAccountRepository(policy=every_n_events(2))
+    repository.save(account)
+    account.deposit(25.0)
+    repository.save(account)
+    loaded = repository.load("123")
+    print(loaded.balance, loaded.version)  # 175.0 3
 
+    # Старые события v1 из журнала поднимаются до v2 во время replay, журнал не меняется
+    journal = [StoredEvent("AccountCreatedEvent", 1, {"account_id": "456", "initial_balance": 10.0}),
+               StoredEvent("MoneyDepositedEvent", 1, {"account_id": "456", "amount": 5.0}),
+               serialize(MoneyDepositedEvent("456", 7.0))]
+    migrated = BankAccount()
+    migrated.replay(default_upcasters().events(journal))
+    print(migrated.balance, journal[1].version, journal[2].data["currency"])  # 22.0 1 RUB
 
-# Восстановление состояния из событий
-new_account = BankAccount()
-new_account.replay(account.events)
-print(new_account.balance)  # 150.0
+    # Команда пополнения в другой валюте отклоняется, событие не создаётся
+    try:
+        migrated.deposit(3.0, "USD")
+    except ValueError as e:
+        print(e)
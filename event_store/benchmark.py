@@ -0,0 +1,106 @@
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from main import Event, EventStore, SegmentLogEventStore
+
+
+# Пропускная способность записи и скорость replay: EventStore в памяти против SegmentLogEventStore.
+# Сегментный лог пишется с fsync раз в 1000 событий; отдельно — sync=True (fsync на каждую запись)
+# с несколькими писателями, где одновременные записи делят один fsync.
+# Запуск: python event_store/benchmark.py [число событий] [число потоков событий]
+
+
+REPLAYED_STREAMS = 1000
+SYNC_WRITERS = 8
+SYNC_EVENTS = 2000
+
+
+def make_event(i: int) -> Event:
+    return Event("ItemAdded", {"item": f"sku-{i % 5000}", "quantity": i % 7 + 1, "price": 199})
+
+
+def fill(store, count: int, streams: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        store.append_to_stream(f"cart-{i % streams}", make_event(i))
+    return time.perf_counter() - started
+
+
+def replay(store, names) -> tuple:
+    started = time.perf_counter()
+    events = sum(len(store.replay_stream(name)) for name in names)
+    return events, time.perf_counter() - started
+
+
+def scan_raw(store, names) -> tuple:
+    started = time.perf_counter()
+    size = 0
+    for name in names:
+        for _, data in store.read_raw(name):
+            size += len(data)
+    return size, time.perf_counter() - started
+
+
+def group_commit(directory: str):
+    store = SegmentLogEventStore(directory, sync=True)
+    per_writer = SYNC_EVENTS // SYNC_WRITERS
+
+    def writer(number: int):
+        for i in range(per_writer):
+            store.append_to_stream(f"writer-{number}", make_event(i))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(SYNC_WRITERS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f"sync=True, {SYNC_WRITERS} writers: {store.position / elapsed:9,.0f} events/s, "
+          f"{store.position / store.fsyncs:.1f} events per fsync")
+    store.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    streams = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    names = [f"cart-{n}" for n in random.Random(1).sample(range(streams), min(REPLAYED_STREAMS, streams))]
+    print(f"{count:,} events in {streams:,} streams, replaying {len(names)} streams")
+
+    memory = EventStore()
+    elapsed = fill(memory, count, streams)
+    print(f"{'in-memory':>10}: append {count / elapsed:9,.0f} events/s", end="")
+    events, elapsed = replay(memory, names)
+    print(f", replay {events / elapsed:10,.0f} events/s")
+    del memory
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = SegmentLogEventStore(directory + "/log")
+        elapsed = fill(store, count, streams)
+        store.flush()
+        print(f"{'segments':>10}: append {count / elapsed:9,.0f} events/s", end="")
+        events, elapsed = replay(store, names)
+        print(f", replay {events / elapsed:10,.0f} events/s", end="")
+        size, elapsed = scan_raw(store, names)
+        print(f", raw scan {events / elapsed:10,.0f} events/s ({size / elapsed / 2**20:.0f} MiB/s)")
+        index = sum(pointers.buffer_info()[1] * pointers.itemsize for pointers in store.streams.values())
+        print(f"index: {index / count:.1f} bytes/event in RAM, {store.fsyncs} fsyncs")
+        store.close()
+
+        started = time.perf_counter()
+        reopened = SegmentLogEventStore(directory + "/log")
+        print(f"reopen (index rebuild by scan): {time.perf_counter() - started:.1f} s, {reopened.position:,} events")
+        reopened.close()
+
+        group_commit(directory + "/sync")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import random
+import sys
+import threading
+import time
+
+from main import Event, EventStore, WrongExpectedVersionError
+
+
+# Конкурентная запись агрегатов: каждый писатель читает версию потока, «выполняет команду»
+# и дописывает событие с expected_version, повторяя при конфликте.
+# Сравниваем одну глобальную блокировку (lock_stripes=1) и striping на 64 блокировки
+# при разном числе потоков-писателей и потоков событий (агрегатов).
+# Запуск: python event_store/benchmark_contention.py [записей на писателя]
+
+
+THREADS = (1, 2, 4, 8)
+STREAMS = (1, 16, 1024)
+EVENT = Event("ItemAdded", {"sku": "sku-1", "quantity": 1})
+
+
+def run(stripes: int, threads: int, streams: int, per_thread: int):
+    store = EventStore(lock_stripes=stripes)
+    names = [f"cart-{n}" for n in range(streams)]
+    conflicts = [0] * threads
+
+    def writer(number: int):
+        rnd = random.Random(number)
+        for _ in range(per_thread):
+            name = names[rnd.randrange(streams)]
+            while True:
+                version = store.stream_version(name)
+                try:
+                    store.append_to_stream(name, EVENT, expected_version=version)
+                    break
+                except WrongExpectedVersionError:
+                    conflicts[number] += 1
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    appended = threads * per_thread
+    assert len(store.events) == appended
+    return appended / elapsed, sum(conflicts) / appended
+
+
+def main():
+    per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    print(f"{per_thread} appends per writer; appends/s and conflict retries per append")
+    print(f"{'threads':>7} {'streams':>7} {'global lock':>22} {'64 stripes':>22}")
+    for threads in THREADS:
+        for streams in STREAMS:
+            row = f"{threads:>7} {streams:>7}"
+            for stripes in (1, 64):
+                rate, conflicts = run(stripes, threads, streams, per_thread)
+                row += f" {rate:12,.0f} ({conflicts:6.3f})"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import sys
+import time
+import tracemalloc
+
+from main import Event, EventStore
+
+
+# Пиковая память и скорость обработки длинного потока: get_stream + replay_stream (весь список сразу)
+# против постраничного read_stream и подписки на "$all" с постоянным объёмом памяти.
+# Запуск: python event_store/benchmark_streaming.py [число событий]
+
+
+def measure(label: str, consume):
+    tracemalloc.start()
+    started = time.perf_counter()
+    processed = consume()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>22}: {processed / elapsed:10,.0f} events/s, peak {peak / 2**20:8.2f} MiB")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = EventStore()
+    for i in range(count):
+        store.append_to_stream("orders", Event("OrderPlaced", {"id": i, "total": i % 1000}))
+
+    def materialized():
+        total = 0
+        for event in store.replay_stream("orders"):
+            total += event["data"]["total"]
+        return count
+
+    def paged():
+        total = 0
+        for recorded in store.read_stream("orders", page_size=500):
+            total += recorded.event.data["total"]
+        return count
+
+    def subscription():
+        subscription = store.subscribe(page_size=500)
+        total = 0
+        for recorded in subscription:
+            total += recorded.event.data["total"]
+            if recorded.position == count - 1:
+                subscription.close()
+        return count
+
+    print(f"{count:,} events in one stream")
+    measure("replay_stream (list)", materialized)
+    measure("read_stream (pages)", paged)
+    measure("subscribe $all", subscription)
+
+
+if __name__ == "__main__":
+    main()
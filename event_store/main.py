@@ -1,6 +1,14 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
 from dataclasses import dataclass, asdict
+from array import array
+from bisect import bisect_left
+import asyncio
 import json
+import mmap
+import os
+import struct
+import threading
+import zlib
 
 
 # Понимание, что такое Event Store и зачем он нужен.
@@ -10,6 +18,30 @@ import json
 # Простая реализация Event Store.
 # Подходит для систем с Event Sourcing.
 # Можно расширить: persistence, versioning, snapshots.
+# SegmentLogEventStore — персистентный вариант: append-only сегменты на диске,
+# групповой fsync, индекс смещений по потокам и чтение через mmap.
+# Оптимистичная конкурентность: у потока есть версия (номер последнего события с нуля),
+# запись с expected_version падает с WrongExpectedVersionError, если поток успел измениться.
+# Чтение — страницами через генераторы; "$all" — все события в глобальном порядке;
+# подписки догоняют историю и затем переключаются на уведомления о новых записях.
+
+ANY = -2  # без проверки версии
+NO_STREAM = -1  # поток ещё не должен существовать
+ALL_STREAM = "$all"
+PAGE_SIZE = 500
+
+
+class WrongExpectedVersionError(Exception):
+    def __init__(self, stream_name: str, expected_version: int, actual_version: int):
+        super().__init__(f"Stream {stream_name}: expected version {expected_version}, actual {actual_version}")
+        self.stream_name = stream_name
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+
+def check_version(stream_name: str, expected_version: int, actual_version: int):
+    if expected_version != ANY and expected_version != actual_version:
+        raise WrongExpectedVersionError(stream_name, expected_version, actual_version)
 
 
 @dataclass
@@ -18,16 +50,156 @@ class Event:
     data: Dict[str, Any]
 
 
-class EventStore:
+@dataclass(frozen=True)
+class RecordedEvent:
+    stream_name: str
+    version: int  # номер события в своём потоке
+    position: int  # номер события в "$all"
+    event: Event
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AppendNotifier:
+    # Будит ждущих новых событий читателей: потоки через Condition, корутины через future своего loop.
+    # Пока никто не ждёт, notify() после записи стоит одну проверку счётчика.
     def __init__(self):
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def notify(self):
+        if not self.waiting:
+            return
+        with self._condition:
+            self._condition.notify_all()
+            futures, self._futures = self._futures, []
+        for loop, future in futures:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, ready: Callable[[], bool], timeout: float = None) -> bool:
+        with self._condition:
+            self.waiting += 1
+            try:
+                return self._condition.wait_for(ready, timeout)
+            finally:
+                self.waiting -= 1
+
+    async def wait_async(self, ready: Callable[[], bool]):
+        loop = asyncio.get_running_loop()
+        while not ready():
+            future = loop.create_future()
+            with self._condition:
+                self.waiting += 1
+                self._futures.append((loop, future))
+            try:
+                if not ready():  # запись могла случиться до регистрации
+                    await future
+            finally:
+                with self._condition:
+                    self.waiting -= 1
+
+
+class CatchUpSubscription:
+    # Читает поток (или "$all") с позиции страницами по page_size, а догнав конец,
+    # ждёт уведомления о записи вместо опроса. Память — одна страница, сколько бы ни было истории.
+    # live=False — остановиться, догнав конец. Итерируется и синхронно, и через async for.
+    def __init__(self, store, stream_name: str = ALL_STREAM, from_position: int = 0,
+                 page_size: int = PAGE_SIZE, live: bool = True):
+        self.store = store
+        self.stream_name = stream_name
+        self.position = from_position  # следующая версия потока или позиция в "$all"
+        self.page_size = page_size
+        self.live = live
+        self.closed = False
+
+    def _next_page(self) -> List[RecordedEvent]:
+        return self.store.read_page(self.stream_name, self.position, self.page_size)
+
+    def _advance(self, recorded: RecordedEvent):
+        self.position = (recorded.position if self.stream_name == ALL_STREAM else recorded.version) + 1
+
+    def _has_more(self) -> bool:
+        return self.closed or self.store.head(self.stream_name) > self.position
+
+    def __iter__(self) -> Iterator[RecordedEvent]:
+        while not self.closed:
+            page = self._next_page()
+            for recorded in page:
+                if self.closed:
+                    return
+                self._advance(recorded)
+                yield recorded
+            if not page:
+                if not self.live:
+                    return
+                self.store.notifier.wait(self._has_more)
+
+    def __aiter__(self) -> AsyncIterator[RecordedEvent]:
+        return self._iterate_async()
+
+    async def _iterate_async(self) -> AsyncIterator[RecordedEvent]:
+        while not self.closed:
+            page = self._next_page()
+            for recorded in page:
+                if self.closed:
+                    return
+                self._advance(recorded)
+                yield recorded
+            if not page:
+                if not self.live:
+                    return
+                await self.store.notifier.wait_async(self._has_more)
+
+    def close(self):
+        self.closed = True
+        self.store.notifier.notify()
+
+
+class EventStore:
+    # Потоки распределены по lock_stripes блокировкам: запись в несвязанные потоки не ждёт друг друга.
+    # Глобальный порядок ("$all") держит короткая общая блокировка лога.
+    def __init__(self, lock_stripes: int = 64):
         self.events: List[Event] = []
         self.streams: Dict[str, List[Event]] = {}
+        self.notifier = AppendNotifier()
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._log_lock = threading.Lock()
+        self._stream_of: List[str] = []  # имя потока для каждой позиции "$all"
+        self._positions: Dict[str, array] = {}  # позиции "$all" событий потока
+
+    def append_to_stream(self, stream_name: str, event: Event, expected_version: int = ANY) -> int:
+        return self.append_events(stream_name, [event], expected_version)
+
+    def append_events(self, stream_name: str, events: List[Event], expected_version: int = ANY) -> int:
+        # Пачка ложится в поток целиком или не ложится вовсе; возвращает новую версию потока
+        if stream_name == ALL_STREAM:
+            raise ValueError(f"{ALL_STREAM} is read-only")
+        with self._locks[hash(stream_name) % len(self._locks)]:
+            stream = self.streams.get(stream_name)
+            version = len(stream) - 1 if stream else NO_STREAM
+            check_version(stream_name, expected_version, version)
+            if not events:
+                return version
+            if stream is None:
+                stream = self.streams[stream_name] = []
+                self._positions[stream_name] = array("Q")
+            with self._log_lock:
+                # Порядок важен для читателей без блокировок: границей служат _positions и _stream_of
+                position = len(self.events)
+                stream.extend(events)
+                self._positions[stream_name].extend(range(position, position + len(events)))
+                self.events.extend(events)
+                self._stream_of.extend([stream_name] * len(events))
+        self.notifier.notify()
+        return version + len(events)
 
-    def append_to_stream(self, stream_name: str, event: Event):
-        if stream_name not in self.streams:
-            self.streams[stream_name] = []
-        self.streams[stream_name].append(event)
-        self.events.append(event)
+    def stream_version(self, stream_name: str) -> int:
+        stream = self.streams.get(stream_name)
+        return len(stream) - 1 if stream else NO_STREAM
 
     def get_stream(self, stream_name: str) -> List[Event]:
         return self.streams.get(stream_name, [])
@@ -36,14 +208,384 @@ class EventStore:
         events = self.get_stream(stream_name)
         return [asdict(e) for e in events]
 
+    def head(self, stream_name: str) -> int:
+        # Следующая позиция: для "$all" — глобальная, для потока — версия
+        if stream_name == ALL_STREAM:
+            return len(self._stream_of)
+        positions = self._positions.get(stream_name)
+        return len(positions) if positions is not None else 0
+
+    def read_page(self, stream_name: str, position: int, count: int) -> List[RecordedEvent]:
+        if stream_name == ALL_STREAM:
+            end = min(position + count, len(self._stream_of))
+            page = []
+            versions: Dict[str, int] = {}  # внутри страницы версии потока идут подряд: bisect один раз
+            for at in range(position, end):
+                name = self._stream_of[at]
+                version = versions.get(name)
+                if version is None:
+                    version = bisect_left(self._positions[name], at)
+                versions[name] = version + 1
+                page.append(RecordedEvent(name, version, at, self.events[at]))
+            return page
+        positions = self._positions.get(stream_name)
+        if positions is None:
+            return []
+        stream = self.streams[stream_name]
+        end = min(position + count, len(positions))
+        return [RecordedEvent(stream_name, version, positions[version], stream[version])
+                for version in range(position, end)]
+
+    def read_stream(self, stream_name: str, from_version: int = 0, page_size: int = PAGE_SIZE) -> Iterator[RecordedEvent]:
+        return iter(CatchUpSubscription(self, stream_name, from_version, page_size, live=False))
+
+    def read_all(self, from_position: int = 0, page_size: int = PAGE_SIZE) -> Iterator[RecordedEvent]:
+        return self.read_stream(ALL_STREAM, from_position, page_size)
+
+    def subscribe(self, stream_name: str = ALL_STREAM, from_position: int = 0,
+                  page_size: int = PAGE_SIZE) -> CatchUpSubscription:
+        return CatchUpSubscription(self, stream_name, from_position, page_size)
+
+
+# =============== Segment log ===============
+# Запись: [длина тела u32][crc32 тела u32] + тело: [длина имени потока u16][длина типа u16]
+# [сколько записей пачки идёт следом u16] имя тип данные(JSON)
+RECORD_HEADER = struct.Struct("<IIHHH")
+BODY_HEADER = struct.Struct("<HHH")
+SEGMENT_BITS = 40  # указатель на запись: номер сегмента << 40 | смещение в сегменте
+SEGMENT_MASK = (1 << SEGMENT_BITS) - 1
+MAX_BATCH = 0xFFFF + 1  # "сколько записей идёт следом" — u16
+
+
+def encode_record(stream_name: str, event: Event, remaining: int = 0) -> bytes:
+    stream = stream_name.encode()
+    event_type = event.event_type.encode()
+    data = json.dumps(event.data, separators=(",", ":"), ensure_ascii=False).encode()
+    body = BODY_HEADER.pack(len(stream), len(event_type), remaining) + stream + event_type + data
+    return struct.pack("<II", len(body), zlib.crc32(body)) + body
+
+
+class SegmentLogEventStore:
+    # События пишутся в конец активного сегмента (файл NNNNNNNN.seg в directory); при превышении
+    # segment_size открывается новый. Для каждого потока в памяти хранится только array указателей
+    # на записи, сами события читаются из mmap сегментов без промежуточных копий.
+    #
+    # Долговечность: sync=True — append возвращается после fsync, одновременные писатели делят один fsync
+    # (group commit); sync=False — fsync раз в fsync_every событий, при смене сегмента и в close().
+    # Лог последовательный по природе, поэтому проверка версии и запись идут под одной блокировкой
+    # файла; пачка пишется одним write и при восстановлении принимается только целиком.
+    def __init__(self, directory: str, segment_size: int = 64 * 1024 * 1024, sync: bool = False,
+                 fsync_every: int = 1000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        self.fsync_every = fsync_every
+        self.streams: Dict[str, array] = {}
+        self.position = 0  # число событий в логе
+        self.notifier = AppendNotifier()
+        self._all = array("Q")  # указатели в глобальном порядке
+        self.fsyncs = 0
+        self._durable_position = 0
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._durable = threading.Condition()
+        self._syncing = False
+        self._maps: List[Optional[mmap.mmap]] = []
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        segments = sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+        for number, name in enumerate(segments):
+            if name != self._segment_name(number):
+                raise ValueError(f"Unexpected segment file {name}")
+            self._recover(number, last=number == len(segments) - 1)
+        self._segment = max(len(segments) - 1, 0)
+        if not segments:
+            self._maps.append(None)
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._size = self._file.tell()
+        self._durable_position = self.position
+
+    def _segment_name(self, number: int) -> str:
+        return f"{number:08d}.seg"
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, self._segment_name(number))
+
+    def _recover(self, number: int, last: bool):
+        # Восстанавливаем индекс сканированием; недописанный хвост последнего сегмента
+        # (включая неполную пачку) отрезаем
+        path = self._segment_path(number)
+        size = os.path.getsize(path)
+        self._maps.append(None)
+        if size == 0:
+            return
+        with open(path, "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = 0  # конец последней целой пачки
+        cursor = 0
+        batch = []
+        while cursor + RECORD_HEADER.size <= size:
+            length, crc, stream_length, _, remaining = RECORD_HEADER.unpack_from(view, cursor)
+            end = cursor + 8 + length
+            if end > size or zlib.crc32(view[cursor + 8:end]) != crc:
+                break
+            stream = str(view[cursor + RECORD_HEADER.size:cursor + RECORD_HEADER.size + stream_length], "utf-8")
+            batch.append((stream, number << SEGMENT_BITS | cursor))
+            cursor = end
+            if remaining == 0:
+                for stream, pointer in batch:
+                    self._all.append(pointer)
+                    self._index(stream).append(pointer)
+                self.position += len(batch)
+                batch.clear()
+                offset = cursor
+        view.close()
+        if offset != size:
+            if not last:
+                raise ValueError(f"Corrupted segment {path} at offset {offset}")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def _index(self, stream_name: str) -> array:
+        pointers = self.streams.get(stream_name)
+        if pointers is None:
+            pointers = self.streams[stream_name] = array("Q")
+        return pointers
+
+    def append_to_stream(self, stream_name: str, event: Event, expected_version: int = ANY) -> int:
+        return self.append_events(stream_name, [event], expected_version)
+
+    def append_events(self, stream_name: str, events: List[Event], expected_version: int = ANY) -> int:
+        # Возвращает новую версию потока; пачка не разрывается между сегментами
+        if stream_name == ALL_STREAM:
+            raise ValueError(f"{ALL_STREAM} is read-only")
+        count = len(events)
+        if count > MAX_BATCH:
+            raise ValueError(f"Batch of {count} events exceeds {MAX_BATCH}, split it into several appends")
+        records = [encode_record(stream_name, event, count - 1 - i) for i, event in enumerate(events)]
+        batch = b"".join(records)
+        with self._lock:
+            pointers = self.streams.get(stream_name)
+            version = len(pointers) - 1 if pointers else NO_STREAM
+            check_version(stream_name, expected_version, version)
+            if not events:
+                return version
+            if self._size and self._size + len(batch) > self.segment_size:
+                self._roll()
+            self._file.write(batch)
+            # До публикации указателей: читатель без блокировки, увидевший запись, обязан сделать flush
+            self._dirty = True
+            offset = self._size
+            base = self._segment << SEGMENT_BITS
+            added = array("Q")
+            for record in records:
+                added.append(base | offset)
+                offset += len(record)
+            # Сначала "$all", затем поток, затем position: читатели без блокировки видят согласованный индекс
+            self._all.extend(added)
+            self._index(stream_name).extend(added)
+            self._size = offset
+            self.position += count
+            position = self.position
+            self._unsynced += count
+            if not self.sync and self._unsynced >= self.fsync_every:
+                self._fsync()
+        if self.sync:
+            self._wait_durable(position)
+        self.notifier.notify()
+        return version + count
+
+    def stream_version(self, stream_name: str) -> int:
+        pointers = self.streams.get(stream_name)
+        return len(pointers) - 1 if pointers else NO_STREAM
+
+    def _fsync(self):
+        # Вызывается под self._lock
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self._unsynced = 0
+        self._dirty = False
+        with self._durable:
+            self._durable_position = self.position
+            self._durable.notify_all()
+
+    def _wait_durable(self, position: int):
+        # Group commit: первый дождавшийся становится лидером и делает fsync за всех,
+        # кто успел записать к этому моменту; остальные просто ждут уведомления
+        with self._durable:
+            while self._durable_position < position:
+                if not self._syncing:
+                    self._syncing = True
+                    break
+                self._durable.wait()
+            else:
+                return
+        try:
+            with self._lock:
+                if self._durable_position < position:
+                    self._fsync()
+        finally:
+            with self._durable:
+                self._syncing = False
+                self._durable.notify_all()
+
+    def _roll(self):
+        self._fsync()
+        self._file.close()
+        self._segment += 1
+        self._maps.append(None)
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._size = 0
+
+    def _map(self, number: int, end: int) -> mmap.mmap:
+        # Активный сегмент растёт: переотображаем, когда запись лежит за концом текущего mmap
+        view = self._maps[number]
+        if view is None or len(view) < end:
+            if number == self._segment and self._dirty:
+                with self._lock:
+                    self._file.flush()
+                    self._dirty = False
+            # Старое отображение не закрываем: на него могут ссылаться выданные memoryview
+            with open(self._segment_path(number), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[number] = view
+        return view
+
+    def _record(self, pointer: int) -> Tuple[memoryview, memoryview, memoryview]:
+        # (поток, тип, данные) записи как memoryview поверх mmap
+        number = pointer >> SEGMENT_BITS
+        offset = pointer & SEGMENT_MASK
+        view = self._maps[number]
+        if view is None or len(view) < offset + RECORD_HEADER.size:
+            view = self._map(number, offset + RECORD_HEADER.size)
+        length, _, stream_length, type_length, _ = RECORD_HEADER.unpack_from(view, offset)
+        end = offset + 8 + length
+        if len(view) < end:
+            view = self._map(number, end)
+        memory = memoryview(view)
+        stream_start = offset + RECORD_HEADER.size
+        type_start = stream_start + stream_length
+        data_start = type_start + type_length
+        return memory[stream_start:type_start], memory[type_start:data_start], memory[data_start:end]
+
+    def read_raw(self, stream_name: str) -> Iterator[Tuple[memoryview, memoryview]]:
+        # (тип, данные) как memoryview поверх mmap: без копирования и разбора JSON
+        for pointer in self.streams.get(stream_name, ()):
+            _, event_type, data = self._record(pointer)
+            yield event_type, data
+
+    def head(self, stream_name: str) -> int:
+        if stream_name == ALL_STREAM:
+            return self.position
+        pointers = self.streams.get(stream_name)
+        return len(pointers) if pointers is not None else 0
+
+    def read_page(self, stream_name: str, position: int, count: int) -> List[RecordedEvent]:
+        if stream_name == ALL_STREAM:
+            pointers = self._all[position:min(position + count, self.position)]
+        else:
+            pointers = self.streams.get(stream_name, array("Q"))[position:position + count]
+        page = []
+        versions: Dict[str, int] = {}
+        for at, pointer in enumerate(pointers, position):
+            stream, event_type, data = self._record(pointer)
+            name = str(stream, "utf-8")
+            event = Event(str(event_type, "utf-8"), json.loads(str(data, "utf-8")))
+            if stream_name == ALL_STREAM:
+                version = versions.get(name)
+                if version is None:
+                    version = bisect_left(self.streams[name], pointer)
+                versions[name] = version + 1
+                page.append(RecordedEvent(name, version, at, event))
+            else:
+                page.append(RecordedEvent(name, at, bisect_left(self._all, pointer), event))
+        return page
+
+    def read_stream(self, stream_name: str, from_version: int = 0, page_size: int = PAGE_SIZE) -> Iterator[RecordedEvent]:
+        return iter(CatchUpSubscription(self, stream_name, from_version, page_size, live=False))
+
+    def read_all(self, from_position: int = 0, page_size: int = PAGE_SIZE) -> Iterator[RecordedEvent]:
+        return self.read_stream(ALL_STREAM, from_position, page_size)
+
+    def subscribe(self, stream_name: str = ALL_STREAM, from_position: int = 0,
+                  page_size: int = PAGE_SIZE) -> CatchUpSubscription:
+        return CatchUpSubscription(self, stream_name, from_position, page_size)
+
+    def get_stream(self, stream_name: str) -> List[Event]:
+        return [Event(str(event_type, "utf-8"), json.loads(str(data, "utf-8")))
+                for event_type, data in self.read_raw(stream_name)]
+
+    def replay_stream(self, stream_name: str) -> List[Dict[str, Any]]:
+        return [{"event_type": str(event_type, "utf-8"), "data": json.loads(str(data, "utf-8"))}
+                for event_type, data in self.read_raw(stream_name)]
+
+    def flush(self):
+        with self._lock:
+            self._fsync()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        for view in self._maps:
+            if view is not None:
+                try:
+                    view.close()
+                except BufferError:
+                    pass  # снаружи ещё живы memoryview из read_raw; отображение закроет GC
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
 # Использование
-store = EventStore()
+if __name__ == "__main__":
+    import tempfile
+
+    store = EventStore()
+
+    # Записываем события
+    store.append_to_stream("user-123", Event("UserCreated", {"name": "Alice", "email": "alice@example.com"}))
+    store.append_to_stream("user-123", Event("UserUpdated", {"name": "Alice Cooper"}))
+
+    # Читаем события
+    events = store.replay_stream("user-123")
+    print(json.dumps(events, indent=2))
+
+    # Постраничное чтение "$all" и подписка, которая после истории получает новые события
+    for recorded in store.read_all(page_size=2):
+        print(f"$all[{recorded.position}] {recorded.stream_name}@{recorded.version}: {recorded.event.event_type}")
+
+    async def follow():
+        subscription = store.subscribe("user-123")
+        async for recorded in subscription:
+            print(f"Subscription: {recorded.version} {recorded.event.event_type}")
+            if recorded.version == 2:
+                subscription.close()
+
+    async def demo():
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0.01)  # подписка догнала историю и ждёт
+        await asyncio.to_thread(store.append_to_stream, "user-123", Event("UserDeactivated", {}))
+        await follower
+
+    asyncio.run(demo())
 
-# Записываем события
-store.append_to_stream("user-123", Event("UserCreated", {"name": "Alice", "email": "alice@example.com"}))
-store.append_to_stream("user-123", Event("UserUpdated", {"name": "Alice Cooper"}))
+    # Запись с ожидаемой версией: второй писатель с устаревшей версией получает конфликт
+    version = store.stream_version("user-123")
+    store.append_to_stream("user-123", Event("EmailChanged", {"email": "cooper@example.com"}), expected_version=version)
+    try:
+        store.append_to_stream("user-123", Event("EmailChanged", {"email": "alice@example.org"}), expected_version=version)
+    except WrongExpectedVersionError as e:
+        print(f"Conflict: {e}")
 
-# Читаем события
-events = store.replay_stream("user-123")
-print(json.dumps(events, indent=2))
+    # То же на диске: после переоткрытия события восстанавливаются из сегментов
+    with tempfile.TemporaryDirectory() as directory:
+        with SegmentLogEventStore(directory) as durable:
+            durable.append_to_stream("user-123", Event("UserCreated", {"name": "Alice", "email": "alice@example.com"}))
+            durable.append_to_stream("user-123", Event("UserUpdated", {"name": "Alice Cooper"}))
+        with SegmentLogEventStore(directory) as durable:
+            print(json.dumps(durable.replay_stream("user-123"), indent=2, ensure_ascii=False))
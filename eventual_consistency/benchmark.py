@@ -0,0 +1,91 @@
+import asyncio
+import sys
+import tempfile
+import time
+
+from main import CheckpointStore, Event, EventStore, NotificationService
+
+
+# Стоимость одной синхронизации по мере роста истории: прежний sync_from_events перечитывал
+# весь журнал и пересобирал уведомления, новый читает только хвост после checkpoint.
+# Между синхронизациями добавляется NEW_EVENTS событий; checkpoint пишется в файл с fsync.
+# Стоимость checkpoint — id одной пачки плюс fsync; всё окно id пишется лишь при свёртке журнала.
+# Запуск: python eventual_consistency/benchmark.py [максимальная длина истории]
+
+
+NEW_EVENTS = 100
+
+
+async def full_scan_sync(store: EventStore) -> list:
+    notifications = []
+    for event in store.events:
+        if event.type == "UserCreated":
+            notifications.append({"message": f"Welcome, {event.data['name']}!", "to": event.data['id']})
+    return notifications
+
+
+def append_users(store: EventStore, start: int, count: int):
+    for user_id in range(start, start + count):
+        store.append(Event("UserCreated", {"id": user_id, "name": f"user-{user_id}"}))
+
+
+async def measure(history: int, directory: str) -> tuple:
+    store = EventStore()
+    append_users(store, 0, history)
+    service = NotificationService(store, CheckpointStore(directory), name=f"bench-{history}")
+    await service.sync_from_events()
+    append_users(store, history, NEW_EVENTS)
+
+    started = time.perf_counter()
+    await full_scan_sync(store)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await service.sync_from_events()
+    incremental = time.perf_counter() - started
+    assert service.lag() == 0 and len(service.notifications) == history + NEW_EVENTS
+    return full, incremental
+
+
+async def catch_up(count: int, checkpoints: CheckpointStore) -> float:
+    store = EventStore()
+    append_users(store, 0, count)
+    service = NotificationService(store, checkpoints)
+    started = time.perf_counter()
+    await service.sync_from_events()
+    return time.perf_counter() - started
+
+
+async def wakeup_latency(samples: int) -> float:
+    store = EventStore()
+    service = NotificationService(store)
+    consumer = asyncio.create_task(service.run())
+    await asyncio.sleep(0)
+    total = 0.0
+    for i in range(samples):
+        started = time.perf_counter()
+        append_users(store, i, 1)
+        while service.lag():
+            await asyncio.sleep(0)
+        total += time.perf_counter() - started
+    service.stop()
+    await consumer
+    return total / samples
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [size for size in (10_000, 100_000, 1_000_000, 10_000_000) if size <= largest]
+    print(f"sync after {NEW_EVENTS} new events")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            full, incremental = asyncio.run(measure(size, directory))
+            print(f"history {size:>10,}: full scan {full * 1000:9.2f} ms  checkpointed {incremental * 1000:7.2f} ms")
+        on_disk = asyncio.run(catch_up(100_000, CheckpointStore(directory)))
+    in_memory = asyncio.run(catch_up(100_000, CheckpointStore()))
+    print(f"catch-up of 100,000 events: file checkpoint {on_disk:.3f} s, in-memory {in_memory:.3f} s")
+    print(f"append -> consumer caught up: {asyncio.run(wakeup_latency(1000)) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
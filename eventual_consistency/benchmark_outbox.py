@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from main import Event, EventStore, OutboxRelay, OutboxStore, UserService
+
+
+# Публикация через transactional outbox против прямой записи каждого события.
+# Брокер эмулируется задержкой ROUND_TRIP на вызов (append или append_many), как у сетевого хранилища.
+# Outbox — файл SQLite в WAL; relay переносит события пачками разного размера.
+# Запуск: python eventual_consistency/benchmark_outbox.py [число пользователей]
+
+
+ROUND_TRIP = 0.0002
+
+
+class RemoteEventStore(EventStore):
+    def __init__(self, failures: int = 0):
+        super().__init__()
+        self.failures = failures
+
+    def append(self, event: Event):
+        time.sleep(ROUND_TRIP)
+        super().append(event)
+
+    def append_many(self, events):
+        time.sleep(ROUND_TRIP)
+        if self.failures:  # временный сбой брокера
+            self.failures -= 1
+            raise ConnectionError("broker unavailable")
+        super().append_many(events)
+
+
+def per_event(count: int) -> float:
+    service = UserService(RemoteEventStore())
+    started = time.perf_counter()
+    for user_id in range(count):
+        service.create_user(user_id, f"user-{user_id}")
+    return count / (time.perf_counter() - started)
+
+
+def fill_outbox(count: int, directory: str, name: str) -> tuple:
+    outbox = OutboxStore(os.path.join(directory, f"{name}.db"))
+    service = UserService(EventStore(), outbox)
+    started = time.perf_counter()
+    for user_id in range(count):
+        service.create_user(user_id, f"user-{user_id}")
+    return outbox, count / (time.perf_counter() - started)
+
+
+def relay_rate(outbox: OutboxStore, batch_size: int, failures: int = 0) -> tuple:
+    sink = RemoteEventStore(failures)
+    relay = OutboxRelay(outbox, sink, batch_size=batch_size, backoff=0.001)
+    started = time.perf_counter()
+    moved = asyncio.run(relay.drain())
+    elapsed = time.perf_counter() - started
+    assert len(sink.events) == moved and outbox.pending() == 0
+    return moved / elapsed, relay.metrics()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{count:,} users, broker round trip {ROUND_TRIP * 1e6:.0f} us")
+    print(f"{'per-event append':>24}: {per_event(min(count, 5000)):10,.0f} events/s")
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in (1, 100, 1000):
+            outbox, write_rate = fill_outbox(count, directory, f"outbox-{batch_size}")
+            rate, metrics = relay_rate(outbox, batch_size)
+            print(f"{'outbox, batch ' + str(batch_size):>24}: {rate:10,.0f} events/s relayed  "
+                  f"(create_user {write_rate:,.0f}/s, {metrics['batches']} batches)")
+        outbox, _ = fill_outbox(count, directory, "outbox-failing")
+        rate, metrics = relay_rate(outbox, 1000, failures=3)
+        print(f"{'batch 1000, 3 failures':>24}: {rate:10,.0f} events/s relayed  ({metrics['retries']} retries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import os
+import sys
+import time
+
+from main import ConsumerGroup, Event, PartitionedEventStore
+
+
+# Пропускная способность ConsumerGroup на CPU-bound обработчике в зависимости от числа воркеров.
+# Обработчик — WORK итераций sha256 на событие; журнал из 16 разделов по id пользователя.
+# async — все воркеры в одном процессе (упираются в GIL), processes — у каждого воркера свой процесс.
+# Рост ограничен числом ядер машины (os.cpu_count()).
+# Запуск: python eventual_consistency/benchmark_partitions.py [число событий]
+
+
+PARTITIONS = 16
+WORK = 200
+
+
+def cpu_handler(event: Event) -> str:
+    digest = str(event.data["id"]).encode()
+    for _ in range(WORK):
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()
+
+
+async def measure(count: int, workers: int, processes: bool) -> float:
+    store = PartitionedEventStore(partitions=PARTITIONS)
+    for i in range(count):
+        store.append(Event("UserCreated", {"id": i % 1000, "name": f"user-{i}"}))
+    group = ConsumerGroup(store, cpu_handler, batch_size=200, processes=processes)
+    started = time.perf_counter()
+    await group.start(workers)
+    await group.wait_idle()
+    elapsed = time.perf_counter() - started
+    await group.stop()
+    assert group.metrics()["processed"] == count
+    return count / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{count:,} events, {PARTITIONS} partitions, {WORK} sha256 per event, {os.cpu_count()} CPU")
+    for processes in (False, True):
+        for workers in (1, 2, 4, 8):
+            rate = asyncio.run(measure(count, workers, processes))
+            print(f"{'processes' if processes else 'async':>10} x{workers}: {rate:10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
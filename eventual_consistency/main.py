@@ -1,7 +1,17 @@
 import asyncio
-from typing import List, Dict
+import json
+import logging
+import os
+import sqlite3
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Dict, Tuple
 
 
+logger = logging.getLogger(__name__)
+
 # Понимание, что данные не синхронизируются мгновенно.
 # Как согласованность достигается со временем.
 # Как события могут использоваться для синхронизации между сервисами.
@@ -9,58 +19,558 @@ from typing import List, Dict
 # Состояние синхронизируется асинхронно.
 # Подходит для систем, где мгновенная согласованность не обязательна.
 # Используется в микросервисах, Event Sourcing, CQRS.
+# Потребитель помнит, докуда дочитал (checkpoint), обрабатывает только новые события,
+# пропускает повторы по id события и просыпается от append, а не по таймеру.
 
 
 class Event:
-    def __init__(self, type: str, data: dict):
+    def __init__(self, type: str, data: dict, id: str = None):
         self.type = type
         self.data = data
+        self.id = id or uuid.uuid4().hex
 
 
 class EventStore:
     def __init__(self):
         self.events: List[Event] = []
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
 
     def append(self, event: Event):
         self.events.append(event)
+        self.notify()
+
+    def append_many(self, events: List[Event]):
+        # Пачка одним вызовом: одно пробуждение потребителей вместо len(events)
+        self.events.extend(events)
+        self.notify()
+
+    def notify(self):
+        # Будит всех, кто ждёт в wait_for_append (новые события или остановка потребителя)
+        waiters, self._waiters = self._waiters, []
+        for loop, appended in waiters:
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                appended.set()
+            else:
+                loop.call_soon_threadsafe(appended.set)
+
+    def read(self, offset: int, limit: int) -> List[Event]:
+        return self.events[offset:offset + limit]
+
+    async def wait_for_append(self, offset: int):
+        # Возвращается, когда в журнале есть события с позиции offset или после любого notify
+        # (например, при остановке потребителя) — вызывающий сам перепроверяет условие
+        if len(self.events) > offset:
+            return
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters.append(waiter)
+        try:
+            await waiter[1].wait()
+        finally:
+            if waiter in self._waiters:  # отменённое ожидание не должно копиться в списке
+                self._waiters.remove(waiter)
+
+
+class CheckpointStore:
+    # Позиция потребителя и id последних обработанных событий. На диске на потребителя два файла:
+    # снимок <consumer>.checkpoint.json (позиция + всё окно id, заменяется атомарно) и журнал
+    # <consumer>.checkpoint.log, куда save дописывает строку с позицией и id только что обработанной
+    # пачки. Раз в compact_every записей журнал сворачивается в новый снимок, так что save стоит
+    # O(размер пачки), а не O(окна). Без directory — то же самое в памяти.
+    def __init__(self, directory: str = None, compact_every: int = 100):
+        self.directory = directory
+        self.compact_every = compact_every
+        self._snapshots: Dict[str, dict] = {}
+        self._logs: Dict[str, list] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, consumer: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{consumer}.checkpoint.{suffix}")
+
+    def load(self, consumer: str) -> Tuple[int, List[str]]:
+        snapshot = self._snapshots.get(consumer)
+        log = self._logs.get(consumer)
+        if snapshot is None and log is None and self.directory:
+            log = []
+            if os.path.exists(self._path(consumer, "json")):
+                with open(self._path(consumer, "json")) as f:
+                    snapshot = json.load(f)
+            if os.path.exists(self._path(consumer, "log")):
+                with open(self._path(consumer, "log")) as f:
+                    for line in f:
+                        try:
+                            log.append(json.loads(line))
+                        except ValueError:
+                            break  # недописанная строка после сбоя: пачка будет обработана повторно
+            self._snapshots[consumer] = snapshot
+            self._logs[consumer] = log
+        offset, seen = (snapshot["offset"], list(snapshot["seen"])) if snapshot else (0, [])
+        for entry in log or ():
+            if entry["offset"] > offset:  # записи, уже вошедшие в снимок, пропускаем
+                offset = entry["offset"]
+                seen.extend(entry["ids"])
+        return offset, seen
+
+    def save(self, consumer: str, offset: int, added: List[str], seen=None):
+        # added — id, обработанные с прошлого save; seen — всё окно, нужно только для свёртки
+        log = self._logs.setdefault(consumer, [])
+        entry = {"offset": offset, "ids": added}
+        log.append(entry)
+        if len(log) >= self.compact_every and seen is not None:
+            self._compact(consumer, {"offset": offset, "seen": list(seen)})
+        elif self.directory:
+            with open(self._path(consumer, "log"), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _compact(self, consumer: str, snapshot: dict):
+        self._snapshots[consumer] = snapshot
+        self._logs[consumer] = []
+        if self.directory:
+            path = self._path(consumer, "json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            # Сбой между заменой снимка и очисткой журнала безопасен: load пропустит старые записи
+            open(self._path(consumer, "log"), "w").close()
+
+
+class OutboxStore:
+    # Локальная SQLite-база сервиса: таблица users и таблица outbox с ещё не опубликованными событиями.
+    # Изменение состояния и запись в outbox идут в одной транзакции, поэтому событие не теряется
+    # и не публикуется без изменения. synchronous="FULL" — fsync на каждый commit.
+    def __init__(self, path: str = ":memory:", synchronous: str = "NORMAL"):
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={synchronous}")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "event_id TEXT NOT NULL UNIQUE, type TEXT NOT NULL, data TEXT NOT NULL)")
+
+    def transaction(self):
+        # sqlite3.Connection как контекст: commit при выходе, rollback при исключении
+        self.connection.execute("BEGIN")
+        return self.connection
+
+    def add_event(self, event: Event):
+        self.connection.execute("INSERT INTO outbox (event_id, type, data) VALUES (?, ?, ?)",
+                                (event.id, event.type, json.dumps(event.data)))
+
+    def fetch(self, limit: int) -> List[Tuple[int, Event]]:
+        rows = self.connection.execute(
+            "SELECT seq, event_id, type, data FROM outbox ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(seq, Event(type, json.loads(data), id=event_id)) for seq, event_id, type, data in rows]
+
+    def delete_through(self, seq: int):
+        self.connection.execute("DELETE FROM outbox WHERE seq <= ?", (seq,))
+
+    def pending(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
 
 
 class UserService:
-    def __init__(self, event_store: EventStore):
+    # С outbox пользователь и UserCreated фиксируются одной транзакцией SQLite, а в event_store
+    # событие доставляет OutboxRelay. Без outbox — прежняя прямая запись в event_store.
+    def __init__(self, event_store: EventStore, outbox: OutboxStore = None):
         self.event_store = event_store
+        self.outbox = outbox
         self.users: Dict[int, str] = {}
 
     def create_user(self, user_id: int, name: str):
-        self.users[user_id] = name
         event = Event("UserCreated", {"id": user_id, "name": name})
-        self.event_store.append(event)
+        if self.outbox is None:
+            self.users[user_id] = name
+            self.event_store.append(event)
+            return
+        with self.outbox.transaction() as connection:
+            connection.execute("INSERT INTO users (id, name) VALUES (?, ?)", (user_id, name))
+            self.outbox.add_event(event)
+        self.users[user_id] = name
+
+
+class OutboxRelay:
+    # Переносит события из outbox в sink (EventStore, PartitionedEventStore или брокер с append/append_many)
+    # пачками до batch_size. Запись из outbox удаляется только после успешной отправки: при сбое пачка
+    # повторяется до max_retries раз с экспоненциальной паузой от backoff, так что доставка — at-least-once,
+    # а повторы потребители отсекают по id события. relay_once/drain пробрасывают ошибку после max_retries;
+    # run() её логирует, ждёт (пауза удваивается до max_backoff) и продолжает — долгий простой брокера
+    # не убивает relay. После неполной пачки run() спит idle_interval секунд перед следующим опросом outbox.
+    def __init__(self, outbox: OutboxStore, sink, batch_size: int = 500, idle_interval: float = 0.005,
+                 max_retries: int = 5, backoff: float = 0.01, max_backoff: float = 5.0):
+        self.outbox = outbox
+        self.sink = sink
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.relayed = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+        self._running = False
+
+    def _send(self, events: List[Event]):
+        if hasattr(self.sink, "append_many"):
+            self.sink.append_many(events)
+        else:
+            for event in events:
+                self.sink.append(event)
+
+    async def relay_once(self) -> int:
+        rows = self.outbox.fetch(self.batch_size)
+        if not rows:
+            return 0
+        events = [event for _, event in rows]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._send(events)
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        with self.outbox.transaction():
+            self.outbox.delete_through(rows[-1][0])
+        self.relayed += len(rows)
+        self.batches += 1
+        return len(rows)
+
+    async def drain(self) -> int:
+        moved = 0
+        while True:
+            count = await self.relay_once()
+            moved += count
+            if count == 0:
+                return moved
+
+    async def run(self):
+        self._running = True
+        pause = self.backoff
+        while self._running:
+            try:
+                moved = await self.relay_once()
+            except Exception:
+                self.failures += 1
+                logger.exception("outbox relay failed, retrying in %.2f s", pause)
+                await asyncio.sleep(pause)
+                pause = min(pause * 2, self.max_backoff)
+                continue
+            pause = self.backoff
+            if moved < self.batch_size:
+                await asyncio.sleep(self.idle_interval)
+
+    def stop(self):
+        self._running = False
+
+    def metrics(self) -> dict:
+        return {"relayed": self.relayed, "batches": self.batches, "retries": self.retries,
+                "failures": self.failures, "pending": self.outbox.pending()}
 
 
 class NotificationService:
-    def __init__(self, event_store: EventStore):
+    # sync_from_events догоняет журнал от сохранённой позиции пачками по batch_size и после каждой
+    # пачки сохраняет checkpoint. Повторно доставленное событие (тот же id) не шлёт второе письмо:
+    # id последних dedupe_window событий хранятся вместе с позицией.
+    def __init__(self, event_store: EventStore, checkpoints: CheckpointStore = None,
+                 name: str = "notifications", batch_size: int = 1000, dedupe_window: int = 10_000):
         self.event_store = event_store
+        self.checkpoints = checkpoints or CheckpointStore()
+        self.name = name
+        self.batch_size = batch_size
         self.notifications: List[dict] = []
+        self.offset, seen = self.checkpoints.load(name)
+        self._seen = deque(seen, maxlen=dedupe_window)
+        self._seen_ids = set(self._seen)
+        self.processed = 0
+        self.duplicates = 0
+        self._running = False
+
+    def _remember(self, event_id: str):
+        if len(self._seen) == self._seen.maxlen:
+            self._seen_ids.discard(self._seen[0])
+        self._seen.append(event_id)
+        self._seen_ids.add(event_id)
 
-    async def sync_from_events(self):
-        for event in self.event_store.events:
-            if event.type == "UserCreated":
-                self.notifications.append({
-                    "message": f"Welcome, {event.data['name']}!",
-                    "to": event.data['id']
-                })
+    def _handle(self, event: Event) -> bool:
+        if event.id in self._seen_ids:
+            self.duplicates += 1
+            return False
+        if event.type == "UserCreated":
+            self.notifications.append({
+                "message": f"Welcome, {event.data['name']}!",
+                "to": event.data['id']
+            })
+        self._remember(event.id)
+        self.processed += 1
+        return True
+
+    async def sync_from_events(self) -> int:
+        handled = 0
+        while True:
+            batch = self.event_store.read(self.offset, self.batch_size)
+            if not batch:
+                return handled
+            added = []
+            for event in batch:
+                if self._handle(event):
+                    added.append(event.id)
+            self.offset += len(batch)
+            handled += len(batch)
+            self.checkpoints.save(self.name, self.offset, added, self._seen)
+            await asyncio.sleep(0)  # не держим loop на длинной истории
+
+    async def run(self):
+        # Долгоживущий потребитель: догнать журнал, затем спать до следующего append
+        self._running = True
+        while self._running:
+            await self.sync_from_events()
+            if self._running:
+                await self.event_store.wait_for_append(self.offset)
+
+    def stop(self):
+        self._running = False
+        self.event_store.notify()
+
+    def lag(self) -> int:
+        return len(self.event_store.events) - self.offset
+
+    def metrics(self) -> dict:
+        return {"offset": self.offset, "lag": self.lag(), "processed": self.processed,
+                "duplicates": self.duplicates}
+
+
+class PartitionedEventStore:
+    # Журнал, разбитый на partitions независимых EventStore по ключу события (по умолчанию id пользователя).
+    # Ключ -> раздел через crc32, поэтому события одного ключа всегда в одном разделе и в порядке append;
+    # порядок между разными ключами не гарантируется.
+    def __init__(self, partitions: int = 8, key: Callable[[Event], Any] = lambda event: event.data["id"]):
+        self.partitions: List[EventStore] = [EventStore() for _ in range(partitions)]
+        self.key = key
+
+    def partition_for(self, key: Any) -> int:
+        return zlib.crc32(str(key).encode()) % len(self.partitions)
+
+    def append(self, event: Event):
+        self.partitions[self.partition_for(self.key(event))].append(event)
+
+    def append_many(self, events: List[Event]):
+        routed: Dict[int, List[Event]] = {}
+        for event in events:
+            routed.setdefault(self.partition_for(self.key(event)), []).append(event)
+        for partition, chunk in routed.items():
+            self.partitions[partition].append_many(chunk)
+
+    @property
+    def events(self) -> List[Event]:
+        return [event for partition in self.partitions for event in partition.events]
+
+
+def _handle_batch(handler: Callable[[Event], Any], events: List[Event]) -> list:
+    # Ошибка обработчика изолирована событием: возвращаются пары (результат, исключение)
+    outcomes = []
+    for event in events:
+        try:
+            outcomes.append((handler(event), None))
+        except Exception as error:
+            outcomes.append((None, error))
+    return outcomes
+
+
+class ConsumerGroup:
+    # Группа воркеров, делящих разделы PartitionedEventStore. Каждый раздел в любой момент
+    # обрабатывает ровно один воркер, поэтому порядок по ключу сохраняется. При join/leave разделы
+    # перераспределяются round-robin; воркер дорабатывает текущую пачку, сохраняет позицию
+    # раздела и отдаёт его. Позиции разделов — в CheckpointStore под именем "<name>-p<номер>".
+    # processes=True: пачка уходит в отдельный процесс воркера (CPU-bound handler, обход GIL);
+    # handler и события тогда должны сериализоваться pickle, а результаты приходят в sink(event, result).
+    # Исключение handler'а не останавливает раздел: оно логируется, считается в errors и передаётся
+    # в on_error(event, error), а событие считается обработанным.
+    def __init__(self, store: PartitionedEventStore, handler: Callable[[Event], Any],
+                 checkpoints: CheckpointStore = None, name: str = "group", batch_size: int = 500,
+                 processes: bool = False, sink: Callable[[Event, Any], None] = None,
+                 on_error: Callable[[Event, Exception], None] = None):
+        self.store = store
+        self.handler = handler
+        self.checkpoints = checkpoints or CheckpointStore()
+        self.name = name
+        self.batch_size = batch_size
+        self.processes = processes
+        self.sink = sink
+        self.on_error = on_error
+        count = len(store.partitions)
+        self.offsets = [self.checkpoints.load(f"{name}-p{p}")[0] for p in range(count)]
+        self.processed = [0] * count
+        self.errors = [0] * count
+        self._progress = asyncio.Condition()
+        self._locks = [asyncio.Lock() for _ in range(count)]
+        self._workers: Dict[int, dict] = {}
+        self._next_id = 0
+
+    def assignment(self) -> Dict[int, List[int]]:
+        workers = sorted(self._workers)
+        result = {worker: [] for worker in workers}
+        for partition in range(len(self.store.partitions)):
+            if workers:
+                result[workers[partition % len(workers)]].append(partition)
+        return result
+
+    def _rebalance(self):
+        for worker, partitions in self.assignment().items():
+            state = self._workers[worker]
+            state["partitions"] = partitions
+            state["reassigned"].set()
+
+    async def join(self) -> int:
+        worker = self._next_id
+        self._next_id += 1
+        state = {"partitions": [], "reassigned": asyncio.Event(), "running": True,
+                 "executor": ProcessPoolExecutor(max_workers=1) if self.processes else None}
+        self._workers[worker] = state
+        state["task"] = asyncio.create_task(self._run(worker, state))
+        self._rebalance()
+        return worker
+
+    async def leave(self, worker: int):
+        state = self._workers.pop(worker)
+        state["running"] = False
+        state["reassigned"].set()
+        self._rebalance()
+        await state["task"]
+        if state["executor"]:
+            state["executor"].shutdown()
+
+    async def start(self, workers: int):
+        for _ in range(workers):
+            await self.join()
+
+    async def stop(self):
+        for worker in list(self._workers):
+            await self.leave(worker)
+
+    async def _consume(self, state: dict, partition: int) -> int:
+        # Одна пачка раздела под его замком: новый владелец не начнёт, пока прежний не сохранил позицию
+        async with self._locks[partition]:
+            if partition not in state["partitions"]:
+                return 0
+            batch = self.store.partitions[partition].read(self.offsets[partition], self.batch_size)
+            if not batch:
+                return 0
+            if state["executor"]:
+                loop = asyncio.get_running_loop()
+                outcomes = await loop.run_in_executor(state["executor"], _handle_batch, self.handler, batch)
+            else:
+                outcomes = _handle_batch(self.handler, batch)
+            for event, (result, error) in zip(batch, outcomes):
+                if error is not None:
+                    self._record_error(partition, event, error)
+                elif self.sink:
+                    self.sink(event, result)
+            self.offsets[partition] += len(batch)
+            self.processed[partition] += len(batch)
+            self.checkpoints.save(f"{self.name}-p{partition}", self.offsets[partition], [], ())
+        async with self._progress:
+            self._progress.notify_all()
+        return len(batch)
+
+    def _record_error(self, partition: int, event: Event, error: Exception):
+        self.errors[partition] += 1
+        logger.error("%s: handler failed on event %s in partition %d", self.name, event.id, partition,
+                     exc_info=error)
+        if self.on_error is not None:
+            try:
+                self.on_error(event, error)
+            except Exception:
+                logger.exception("%s: on_error failed", self.name)
+
+    async def _run(self, worker: int, state: dict):
+        while state["running"]:
+            state["reassigned"].clear()
+            handled = 0
+            for partition in list(state["partitions"]):
+                try:
+                    handled += await self._consume(state, partition)
+                except Exception:
+                    # Сбой вне handler'а (sink, checkpoint, процесс воркера): раздел повторится позже
+                    self.errors[partition] += 1
+                    logger.exception("%s: worker %d failed on partition %d", self.name, worker, partition)
+                    await asyncio.sleep(0.1)
+                await asyncio.sleep(0)
+            if handled or not state["running"]:
+                continue
+            # Всё догнано: ждём append в любом своём разделе или перераспределения
+            waits = [asyncio.create_task(self.store.partitions[p].wait_for_append(self.offsets[p]))
+                     for p in state["partitions"]]
+            waits.append(asyncio.create_task(state["reassigned"].wait()))
+            done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def lag(self) -> Dict[int, int]:
+        return {p: len(partition.events) - self.offsets[p] for p, partition in enumerate(self.store.partitions)}
+
+    async def wait_idle(self):
+        # Просыпается после каждой сохранённой пачки, а не опросом
+        async with self._progress:
+            await self._progress.wait_for(lambda: not any(self.lag().values()))
+
+    def metrics(self) -> dict:
+        return {"workers": len(self._workers), "assignment": self.assignment(), "lag": sum(self.lag().values()),
+                "processed": sum(self.processed), "errors": sum(self.errors)}
 
 
 # Использование
-store = EventStore()
-user_service = UserService(store)
-notification_service = NotificationService(store)
+if __name__ == "__main__":
+    store = EventStore()
+    user_service = UserService(store)
+    notification_service = NotificationService(store)
+
+    user_service.create_user(1, "Alice")
 
-user_service.create_user(1, "Alice")
+    async def main():
+        await notification_service.sync_from_events()
+        print(notification_service.notifications)
 
+        # Потребитель в фоне: новые пользователи обрабатываются без опроса, повтор события игнорируется
+        consumer = asyncio.create_task(notification_service.run())
+        user_service.create_user(2, "Bob")
+        store.append(store.events[-1])
+        await asyncio.sleep(0.01)
+        print(notification_service.notifications[-1], notification_service.metrics())
+        notification_service.stop()
+        await consumer
 
-async def main():
-    await notification_service.sync_from_events()
-    print(notification_service.notifications)
+        # Разделы по id пользователя и группа воркеров; третий воркер приходит и уходит на ходу
+        partitioned = PartitionedEventStore(partitions=4)
+        welcome = lambda event: f"Welcome, {event.data['name']}!"
+        group = ConsumerGroup(partitioned, welcome, sink=lambda event, message: print(event.data["id"], message))
+        await group.start(workers=2)
+        for user_id in range(6):
+            partitioned.append(Event("UserCreated", {"id": user_id, "name": f"user-{user_id}"}))
+        extra = await group.join()
+        print(group.assignment())
+        await group.leave(extra)
+        await group.wait_idle()
+        print(group.metrics())
+        await group.stop()
 
+        # Transactional outbox: пользователь и событие коммитятся вместе, relay переносит пачкой
+        outbox_store = EventStore()
+        outbox_users = UserService(outbox_store, OutboxStore())
+        for user_id in range(3):
+            outbox_users.create_user(user_id, f"user-{user_id}")
+        relay = OutboxRelay(outbox_users.outbox, outbox_store)
+        await relay.drain()
+        print([event.data for event in outbox_store.events], relay.metrics())
 
-asyncio.run(main())
+    asyncio.run(main())